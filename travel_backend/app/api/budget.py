@@ -2,14 +2,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from app.models.api_models import ExpenseInputText, ExpenseInputVoice, ExpenseResponse, MessageResponse
 from app.services.expense_service import expense_service
+from app.services.voice_service import voice_service, iter_upload_chunks
 from app.api.auth import get_current_user
 from app.data.trip_repository import get_trip_repository
 from supabase import Client
 from app.data.database import get_db
 from typing import Dict, Any
 import base64
-import os
-import tempfile
 
 router = APIRouter(prefix="/api/v1/budget", tags=["费用管理"])
 
@@ -89,7 +88,7 @@ async def record_expense_voice(
 ):
     """
     语音录入开销
-    接收 WebM 格式音频文件，自动转换为 WAV (PCM) 格式后调用科大讯飞API
+    接收 WebM 等格式的音频文件，经 ffmpeg 流式转码为 16kHz PCM 后调用科大讯飞API（不写临时文件）
     """
     try:
         # 验证行程归属
@@ -106,32 +105,17 @@ async def record_expense_voice(
                 detail="无权操作此行程"
             )
         
-        # 获取文件扩展名
-        file_ext = os.path.splitext(file.filename or "")[1].lower() or ".webm"
+        # 上传的音频经 ffmpeg 流式转码后转写（不写临时文件）
+        text = await voice_service.transcribe_audio_stream(iter_upload_chunks(file))
         
-        # 保存上传的音频文件到临时文件（保持原始格式）
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
+        # 构造文本输入对象
+        expense_input = ExpenseInputText(
+            trip_id=trip_id,
+            text_input=text
+        )
         
-        try:
-            # 使用语音服务转换和转写
-            from app.services.voice_service import voice_service
-            text = await voice_service.transcribe_audio_file(tmp_path)
-            
-            # 构造文本输入对象
-            expense_input = ExpenseInputText(
-                trip_id=trip_id,
-                text_input=text
-            )
-            
-            expense_data = await expense_service.record_expense_text(expense_input)
-            return ExpenseResponse(**expense_data)
-        finally:
-            # 删除临时文件
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+        expense_data = await expense_service.record_expense_text(expense_input)
+        return ExpenseResponse(**expense_data)
     except HTTPException:
         raise
     except Exception as e:
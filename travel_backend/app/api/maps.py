@@ -0,0 +1,36 @@
+"""地图图片路由"""
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from app.data.map_image_store import map_image_store, HASH_PATTERN
+import asyncio
+
+router = APIRouter(prefix="/api/v1/maps", tags=["地图"])
+
+# 图片按内容哈希寻址、内容不可变，可长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/{content_hash}.png")
+async def get_map_image(content_hash: str, request: Request):
+    """
+    获取地图图片
+
+    无需登录（<img> 标签无法携带 Authorization 头），哈希本身不可猜测。
+    支持 If-None-Match，命中时返回 304。
+    """
+    if not HASH_PATTERN.match(content_hash):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="地图不存在")
+
+    etag = f'"{content_hash}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+
+    # 弱比较：代理/CDN 常给 ETag 加上 W/ 前缀
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if etag in tags or if_none_match.strip() == "*":
+        if map_image_store.exists(content_hash):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    image = await asyncio.to_thread(map_image_store.get, content_hash)
+    if image is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="地图不存在")
+    return Response(content=image, media_type="image/png", headers=headers)
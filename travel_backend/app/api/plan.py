@@ -3,13 +3,12 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from app.models.api_models import TripInput, TripInputFromText, MessageResponse
 from app.services.trip_service import trip_service
 from app.services.ai_service import ai_service
+from app.services.voice_service import iter_upload_chunks
 from app.api.auth import get_current_user
 from supabase import Client
 from app.data.database import get_db
 from typing import Dict, Any
 import base64
-import tempfile
-import os
 
 router = APIRouter(prefix="/api/v1/plan", tags=["行程规划"])
 
@@ -45,31 +44,17 @@ async def create_plan_voice(
 ):
     """
     语音输入行程需求
-    接收 WebM 格式音频文件，自动转换为 WAV (PCM) 格式后调用科大讯飞API
+    接收 WebM 等格式的音频文件，经 ffmpeg 流式转码为 16kHz PCM 后调用科大讯飞API（不写临时文件）
     """
     try:
-        # 获取文件扩展名
-        file_ext = os.path.splitext(file.filename or "")[1].lower() or ".webm"
-        
-        # 保存上传的音频文件到临时文件（保持原始格式）
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
-        
-        try:
-            trip_id = await trip_service.process_voice_input(
-                user_id=current_user["user_id"],
-                audio_file_path=tmp_path
-            )
-            return MessageResponse(
-                message="行程生成成功",
-                trip_id=trip_id
-            )
-        finally:
-            # 删除临时文件
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+        trip_id = await trip_service.process_voice_input(
+            user_id=current_user["user_id"],
+            audio=iter_upload_chunks(file)
+        )
+        return MessageResponse(
+            message="行程生成成功",
+            trip_id=trip_id
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,10 +1,12 @@
 """实时语音识别 WebSocket 路由（科大讯飞 IAT 代理）"""
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
-from app.services.voice_service import voice_service
+from app.services.voice_service import voice_service, REALTIME_PROTOCOLS
+from app.services.audio_processing import StreamingResampler, StreamingVAD, create_resampler
 from app.api.auth import get_current_user
+from config import settings
+from typing import Optional
 import asyncio
-import threading
-import queue
+import json
 
 
 router = APIRouter(prefix="/api/v1/voice", tags=["语音-实时"])
@@ -13,42 +15,58 @@ router = APIRouter(prefix="/api/v1/voice", tags=["语音-实时"])
 @router.websocket("/realtime")
 async def realtime_asr(websocket: WebSocket):
     """
-    前端通过 WebSocket 发送音频二进制块（建议16kHz/16bit/单声道 PCM），
+    前端通过 WebSocket 发送音频二进制块（16bit PCM），
     本后端转发到科大讯飞实时识别服务，并将识别文字实时回传给前端。
 
     前端建议流程：
-    - 连接 ws://<host>/api/v1/voice/realtime
-    - 发送二进制音频块（ArrayBuffer）
-    - 接收文本消息（JSON或纯文本）作为识别结果
-    - 结束时关闭WebSocket
+    - 连接 ws://<host>/api/v1/voice/realtime；加 ?protocol=delta 时识别结果以带序号的 JSON 增量推送
+      （append / replace_tail / finalize / snapshot，格式见 RTASRTranscript），默认推送完整文本
+    - （可选）首个消息发送文本帧声明音频格式，如 {"sample_rate": 48000, "channels": 2}，
+      后端负责下混并重采样到 16kHz 单声道；不声明时按 16kHz 单声道处理
+    - 发送二进制音频块（ArrayBuffer，s16le，多声道为交错格式）
+    - 接收文本消息（JSON或纯文本）作为识别结果；delta 协议下发送 {"cmd": "snapshot"} 可请求完整快照
+    - 结束时发送 "stop" 或 {"cmd": "stop"}，或直接关闭WebSocket
     """
     await websocket.accept()
 
-    # 线程安全队列：音频 -> iflytek；结果 <- iflytek
-    audio_queue: "queue.Queue[bytes]" = queue.Queue(maxsize=100)
-    result_queue: "queue.Queue[str]" = queue.Queue(maxsize=100)
-    stop_event = threading.Event()
+    protocol = websocket.query_params.get("protocol", "text")
+    if protocol not in REALTIME_PROTOCOLS:
+        await websocket.send_text(f"[ERROR] 不支持的协议: {protocol}，可选 {', '.join(REALTIME_PROTOCOLS)}")
+        await websocket.close()
+        return
 
-    # 启动子线程连接 iflytek 并进行转发
-    proxy_thread = threading.Thread(
-        target=voice_service.start_realtime_proxy,
-        args=(audio_queue, result_queue, stop_event),
-        daemon=True,
-    )
-    proxy_thread.start()
+    # asyncio 会话：音频 -> iflytek；结果 <- iflytek（不占用线程，结果到达即推送）
+    session = voice_service.create_realtime_session(protocol=protocol)
+    session_task = asyncio.create_task(session.run())
 
     async def pump_results_to_client():
-        # 将识别结果异步推送给前端
-        while not stop_event.is_set():
-            try:
-                text = result_queue.get(timeout=0.1)
-                if text:
-                    await websocket.send_text(text)
-            except Exception:
-                await asyncio.sleep(0.05)
+        # 将识别结果异步推送给前端，会话结束时 results 中放入 None
+        while True:
+            text = await session.results.get()
+            if text is None:
+                break
+            await websocket.send_text(text)
 
     pump_task = asyncio.create_task(pump_results_to_client())
 
+    # 上传前裁掉静音
+    vad = StreamingVAD(
+        aggressiveness=settings.voice_vad_aggressiveness,
+        keepalive_interval_ms=settings.voice_vad_keepalive_ms
+    ) if settings.voice_vad_enabled else None
+
+    async def enqueue_audio(chunk: bytes):
+        if vad:
+            chunk = vad.process(chunk)
+            if not chunk:
+                return
+        # 会话缓冲满时在此等待，暂停读取前端音频（背压）
+        await session.write_audio(chunk)
+
+    # 客户端在首个文本帧中声明非 16kHz 单声道格式时创建
+    resampler: Optional[StreamingResampler] = None
+    first_message = True
+
     try:
         # 接收前端音频数据
         while True:
@@ -57,27 +75,50 @@ async def realtime_asr(websocket: WebSocket):
                 break
             if "bytes" in msg and msg["bytes"] is not None:
                 # 音频二进制块
-                try:
-                    audio_queue.put_nowait(msg["bytes"])
-                except queue.Full:
-                    # 队列满则丢弃最旧，确保实时性
+                first_message = False
+                chunk = resampler.process(msg["bytes"]) if resampler else msg["bytes"]
+                if chunk:
+                    await enqueue_audio(chunk)
+            elif "text" in msg and msg["text"] is not None:
+                text = msg["text"].strip()
+                if first_message and text.startswith("{"):
+                    # 首个文本帧：音频格式声明
+                    first_message = False
                     try:
-                        audio_queue.get_nowait()
-                    except Exception:
-                        pass
+                        audio_format = json.loads(text)
+                        resampler = create_resampler(
+                            audio_format.get("sample_rate", audio_format.get("sampleRate")),
+                            audio_format.get("channels")
+                        )
+                    except (ValueError, TypeError, AttributeError) as e:
+                        # 经结果队列推送，保证 delta 协议的 seq 顺序
+                        session.results.put_nowait(session.transcript.marker("ERROR", f"音频格式声明无效: {e}"))
+                        break
+                    if resampler.passthrough:
+                        resampler = None
+                    continue
+                # 控制指令："stop" / {"cmd": "stop"} 结束，{"cmd": "snapshot"} 请求完整快照
+                command = text.lower()
+                if text.startswith("{"):
                     try:
-                        audio_queue.put_nowait(msg["bytes"])
-                    except Exception:
-                        pass
-            elif "text" in msg and msg["text"] is not None:
-                # 可选择处理控制指令，例如 "{"cmd":"stop"}"
-                if msg["text"].strip().lower() == "stop":
+                        command = str(json.loads(text).get("cmd", "")).lower()
+                    except (ValueError, AttributeError):
+                        command = ""
+                if command == "stop":
                     break
+                if command == "snapshot":
+                    session.request_snapshot()
+        # 输出重采样滤波器中剩余的样本
+        if resampler:
+            tail = resampler.flush()
+            if tail:
+                await enqueue_audio(tail)
     except WebSocketDisconnect:
         pass
     finally:
-        # 通知子线程结束
-        stop_event.set()
+        # 通知会话发送结束标识，等待剩余识别结果推送完毕
+        session.finish()
+        await session_task
         try:
             await pump_task
         except Exception:
@@ -86,6 +127,9 @@ async def realtime_asr(websocket: WebSocket):
             await websocket.close()
         except Exception:
             pass
+        print(f"[RTASR] 实时转写会话: {session.get_stats()}")
+        if vad:
+            print(f"[VAD] 实时转写会话: {vad.get_stats()}")
 
 
 @router.get("/xunfei/ws-url")
@@ -0,0 +1,255 @@
+"""本地缓存存储 - 进程内 LRU + 可选 SQLite 持久层"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# 事件循环中的写入先合并，延迟这么久后在线程中一次提交
+DISK_FLUSH_DELAY_SECONDS = 0.2
+
+
+class CacheStore:
+    """
+    两级缓存：
+    - 内存层：OrderedDict 实现的 LRU，超出 max_entries 时淘汰最久未使用的条目
+    - 磁盘层（可选）：SQLite，每个 namespace 一张表，进程重启后仍可命中
+      在事件循环中使用时，写入合并后在线程中批量提交，读取请用 aget（磁盘查询在线程中执行）
+
+    每个条目有两个时间点：
+    - expires_at: 过期前为新鲜数据
+    - stale_until: 过期后、stale_until 之前仍可返回（由调用方决定是否后台刷新）
+    """
+
+    def __init__(self, namespace: str, max_entries: int = 1000, ttl_seconds: float = 3600,
+                 stale_seconds: float = 0, db_path: str = ""):
+        self.namespace = namespace
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._memory: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # 磁盘层单独加锁，线程中的磁盘读写不会阻塞事件循环上的内存访问
+        self._db_lock = threading.Lock()
+        # 尚未提交到磁盘层的写入 {键: (序列化的值, expires_at, stale_until)}
+        self._pending: Dict[str, Tuple[str, float, float]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "stale_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0
+        }
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        """打开 SQLite 持久层"""
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{self._table}" ('
+            "cache_key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, stale_until REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @property
+    def _table(self) -> str:
+        return f"cache_{self.namespace}"
+
+    @staticmethod
+    def make_key(key: Hashable) -> str:
+        """将元组等键序列化为字符串"""
+        if isinstance(key, str):
+            return key
+        return json.dumps(list(key) if isinstance(key, tuple) else key, ensure_ascii=False)
+
+    def get(self, key: Hashable, allow_expired: bool = False) -> Tuple[Optional[Any], bool]:
+        """
+        读取缓存（内存未命中时同步读取磁盘层，事件循环中请使用 aget）
+
+        Args:
+            key: 缓存键
+            allow_expired: 为 True 时超过 stale_until 的条目也返回（服务降级时使用）
+
+        Returns:
+            (value, is_stale): 未命中时 value 为 None
+        """
+        cache_key = self.make_key(key)
+        entry = self._get_memory(cache_key)
+        disk_entry = None
+        if entry is None and self._conn is not None:
+            disk_entry = self._load_from_disk(cache_key)
+        return self._resolve(cache_key, entry, disk_entry, allow_expired)
+
+    async def aget(self, key: Hashable, allow_expired: bool = False) -> Tuple[Optional[Any], bool]:
+        """读取缓存，内存未命中时在线程中读取磁盘层，不阻塞事件循环；参数和返回值同 get"""
+        cache_key = self.make_key(key)
+        entry = self._get_memory(cache_key)
+        disk_entry = None
+        if entry is None and self._conn is not None:
+            disk_entry = await asyncio.to_thread(self._load_from_disk, cache_key)
+        return self._resolve(cache_key, entry, disk_entry, allow_expired)
+
+    def _get_memory(self, cache_key: str) -> Optional[Tuple[Any, float, float]]:
+        with self._lock:
+            entry = self._memory.get(cache_key)
+            if entry is None and cache_key in self._pending:
+                # 已被淘汰出内存、但还未提交到磁盘层的写入
+                value, expires_at, stale_until = self._pending[cache_key]
+                entry = (json.loads(value), expires_at, stale_until)
+            return entry
+
+    def _resolve(self, cache_key: str, entry: Optional[Tuple[Any, float, float]],
+                 disk_entry: Optional[Tuple[Any, float, float]],
+                 allow_expired: bool) -> Tuple[Optional[Any], bool]:
+        """按条目的过期时间返回 (value, is_stale)，磁盘命中的条目放回内存层"""
+        now = time.time()
+        with self._lock:
+            if entry is None and disk_entry is not None:
+                # 读磁盘期间可能已有新的写入，以内存中的为准
+                entry = self._memory.get(cache_key)
+                if entry is None:
+                    entry = disk_entry
+                    self.stats["disk_hits"] += 1
+                    self._put_memory(cache_key, entry)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None, False
+
+            value, expires_at, stale_until = entry
+            if now < expires_at:
+                if cache_key in self._memory:
+                    self._memory.move_to_end(cache_key)
+                self.stats["hits"] += 1
+                return value, False
+            if now < stale_until or allow_expired:
+                if cache_key in self._memory:
+                    self._memory.move_to_end(cache_key)
+                self.stats["stale_hits"] += 1
+                return value, True
+
+            # 彻底过期的条目保留到被覆盖或淘汰，服务降级时仍可使用
+            self.stats["misses"] += 1
+            return None, False
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """
+        写入缓存
+
+        有磁盘层时：在事件循环中调用，写入合并后延迟 DISK_FLUSH_DELAY_SECONDS 在线程中批量提交；
+        没有运行中的事件循环（脚本）时立即提交
+        """
+        cache_key = self.make_key(key)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.time() + ttl
+        entry = (value, expires_at, expires_at + self.stale_seconds)
+        with self._lock:
+            self._put_memory(cache_key, entry)
+            self.stats["sets"] += 1
+            if self._conn is None:
+                return
+            # 写入时序列化，之后调用方修改该对象不影响磁盘层
+            self._pending[cache_key] = (json.dumps(value, ensure_ascii=False), entry[1], entry[2])
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        task = self._flush_task
+        # 任务属于已关闭的事件循环（脚本多次 asyncio.run）时不会再完成，需要重新创建
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(DISK_FLUSH_DELAY_SECONDS)
+        await asyncio.to_thread(self.flush)
+
+    def flush(self):
+        """把尚未提交的写入一次提交到磁盘层"""
+        # 先取磁盘锁再取出待写条目，多个线程同时提交时按写入顺序落盘
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending or self._conn is None:
+                return
+            try:
+                self._conn.executemany(
+                    f'INSERT OR REPLACE INTO "{self._table}" VALUES (?, ?, ?, ?)',
+                    [(cache_key, *row) for cache_key, row in pending.items()]
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"[Cache:{self.namespace}] 写入磁盘失败: {e}")
+
+    def _put_memory(self, cache_key: str, entry: Tuple[Any, float, float]):
+        self._memory[cache_key] = entry
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _load_from_disk(self, cache_key: str) -> Optional[Tuple[Any, float, float]]:
+        with self._db_lock:
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    f'SELECT value, expires_at, stale_until FROM "{self._table}" WHERE cache_key = ?',
+                    (cache_key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[Cache:{self.namespace}] 读取磁盘失败: {e}")
+                return None
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """遍历所有未过期的条目 (序列化后的键, 值)，有磁盘层时以磁盘层为准（同步读取，用于启动和脚本）"""
+        now = time.time()
+        if self._conn is not None:
+            self.flush()
+            with self._db_lock:
+                try:
+                    rows = self._conn.execute(
+                        f'SELECT cache_key, value FROM "{self._table}" WHERE expires_at > ?', (now,)
+                    ).fetchall()
+                except sqlite3.Error as e:
+                    print(f"[Cache:{self.namespace}] 读取磁盘失败: {e}")
+                    rows = []
+            return iter([(key, json.loads(value)) for key, value in rows])
+        with self._lock:
+            entries = [(key, entry[0]) for key, entry in self._memory.items() if entry[1] > now]
+        return iter(entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def close(self):
+        """提交剩余的写入并关闭磁盘层连接"""
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
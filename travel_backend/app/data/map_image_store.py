@@ -0,0 +1,71 @@
+"""地图图片存储 - 按内容哈希寻址，相同参数的地图只生成、保存一次"""
+from config import settings
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+
+# 内容哈希：sha256 十六进制
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def compute_map_hash(params: Dict[str, Any]) -> str:
+    """
+    根据地图生成参数（渲染方式、尺寸、缩放、标注点、路径等）计算内容哈希
+
+    参数完全相同的两天（即使属于不同行程）得到同一个哈希，共用一张图片
+    """
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MapImageStore:
+    """
+    本地磁盘上的地图图片存储（对象存储的替代实现）
+    - 路径为 <root>/<哈希前2位>/<哈希>.png，避免单个目录下文件过多
+    - 先写临时文件再原子替换，并发写入同一哈希不会读到半张图片
+    - 内容不可变：同一哈希只写一次
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def path_for(self, content_hash: str) -> str:
+        if not HASH_PATTERN.match(content_hash):
+            raise ValueError(f"无效的地图哈希: {content_hash}")
+        return os.path.join(self.root_dir, content_hash[:2], f"{content_hash}.png")
+
+    def exists(self, content_hash: str) -> bool:
+        return os.path.exists(self.path_for(content_hash))
+
+    def get(self, content_hash: str) -> Optional[bytes]:
+        """读取图片，不存在时返回 None"""
+        try:
+            with open(self.path_for(content_hash), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, content_hash: str, data: bytes):
+        """保存图片（已存在则跳过）"""
+        path = self.path_for(content_hash)
+        if os.path.exists(path):
+            return
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# 全局地图图片存储实例
+map_image_store = MapImageStore(settings.map_image_store_dir)
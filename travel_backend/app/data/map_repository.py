@@ -13,8 +13,9 @@ class MapRepository:
     def __init__(self, db: Client):
         self.db = db
     
-    def save_map(self, trip_id: str, day_number: int, map_url: str) -> TripMap:
-        """保存地图图片URL（如果已存在则更新）"""
+    def save_map(self, trip_id: str, day_number: int, map_url: str,
+                 map_hash: Optional[str] = None) -> TripMap:
+        """保存地图图片URL及内容哈希（如果已存在则更新）"""
         # 先检查是否已存在
         existing = self.get_map_by_trip_and_day(trip_id, day_number)
         
@@ -22,6 +23,7 @@ class MapRepository:
             # 更新现有地图
             data = {
                 "map_url": map_url,
+                "map_hash": map_hash,
                 "updated_at": datetime.now().isoformat()
             }
             result = self.db.table("trip_maps").update(data).eq("map_id", existing.map_id).execute()
@@ -35,6 +37,7 @@ class MapRepository:
                 "trip_id": trip_id,
                 "day_number": day_number,
                 "map_url": map_url,
+                "map_hash": map_hash,
                 "created_at": datetime.now().isoformat(),
                 "updated_at": datetime.now().isoformat()
             }
@@ -84,6 +84,13 @@ class TripRepository:
             return [TripHeader(**item) for item in result.data]
         return []
     
+    def get_recent_destinations(self, limit: int = 5000) -> List[str]:
+        """获取最近创建的行程的目的地（用于统计热门城市）"""
+        result = self.db.table("trip_headers").select("destination").order("created_at", desc=True).limit(limit).execute()
+        if result.data:
+            return [item["destination"] for item in result.data if item.get("destination")]
+        return []
+    
     def update_trip_header(self, trip_id: str, **kwargs) -> bool:
         """更新行程头"""
         kwargs["updated_at"] = datetime.now().isoformat()
@@ -1,5 +1,5 @@
 from .api_models import *
 from .db_models import *
 from .llm_models import *
-
+from .map_models import *
 
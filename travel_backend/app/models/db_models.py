@@ -67,7 +67,8 @@ class TripMap(BaseModel):
     map_id: str
     trip_id: str
     day_number: int
-    map_url: str  # 高德静态地图API返回的图片URL
+    map_url: str  # 地图图片地址（/api/v1/maps/<哈希>.png；旧数据为高德静态地图URL）
+    map_hash: Optional[str] = None  # 地图图片内容哈希
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -0,0 +1,18 @@
+"""地图服务数据结构"""
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+
+class DistanceMatrix(BaseModel):
+    """多点之间的耗时/距离矩阵，matrix[i][j] 表示从 points[i] 到 points[j]"""
+    mode: str  # 交通方式: driving/walking/transit
+    points: List[Dict[str, float]]  # [{"lat": float, "lng": float}, ...]
+    duration_minutes: List[List[Optional[int]]]  # 无法获取时为 None
+    distance_meters: List[List[Optional[int]]]
+
+    def get(self, i: int, j: int) -> Optional[Dict[str, int]]:
+        """获取 points[i] -> points[j] 的耗时和距离"""
+        duration = self.duration_minutes[i][j]
+        if duration is None:
+            return None
+        return {"duration_minutes": duration, "distance_meters": self.distance_meters[i][j] or 0}
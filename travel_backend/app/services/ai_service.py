@@ -5,6 +5,7 @@ from langchain_core.output_parsers import JsonOutputParser
 from config import settings
 from app.models.llm_models import UserIntent, ItineraryResponse, TripBudget, BudgetCategory
 from app.models.api_models import TripInput
+from app.services.singleflight import singleflight, normalize_key
 from typing import List, Dict, Any, Optional
 import json
 
@@ -325,7 +326,16 @@ class AIService:
         - 理解语义；
         - 每个类别仅提取1-2个最核心关键词；
         - 仅返回JSON数组字符串。
+        相同偏好文本的并发调用只请求一次LLM。
         """
+        keywords = await singleflight.do(
+            normalize_key("ai.poi_keywords", preference_text),
+            lambda: self._extract_poi_keywords(preference_text)
+        )
+        return list(keywords)
+    
+    async def _extract_poi_keywords(self, preference_text: str) -> List[str]:
+        """调用LLM提取POI关键词"""
         prompt_template = (
             "你是一个旅行偏好分析助手。请从用户的偏好描述中，智能提取出最核心、适合用于地图 POI 搜索的关键词列表。\n"
             "要求：\n"
@@ -0,0 +1,333 @@
+"""音频处理 - 实时语音流的下混和重采样（16bit PCM）"""
+from math import gcd
+from typing import Dict, List, Optional
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+# 讯飞实时转写要求的输入格式：16kHz、16bit、单声道
+TARGET_SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# 允许客户端声明的输入格式（浏览器 AudioContext 常见的采样率）
+SUPPORTED_SAMPLE_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000, 88200, 96000)
+MAX_CHANNELS = 8
+
+# 每个相位的滤波器抽头数；越大过渡带越窄，计算量线性增加
+DEFAULT_TAPS_PER_PHASE = 32
+# 截止频率相对于输出（或输入）奈奎斯特频率的比例，留出过渡带
+DEFAULT_ROLLOFF = 0.9
+DEFAULT_KAISER_BETA = 8.0
+
+
+def design_polyphase_filter(up: int, down: int, taps_per_phase: int = DEFAULT_TAPS_PER_PHASE,
+                            rolloff: float = DEFAULT_ROLLOFF, beta: float = DEFAULT_KAISER_BETA) -> np.ndarray:
+    """
+    设计 up/down 重采样的低通原型滤波器（Kaiser 窗 sinc），并拆成多相形式
+
+    Returns:
+        形状 (up, taps_per_phase) 的系数矩阵，第 p 行为相位 p 的抽头，
+        phases[p, k] 作用于当前输入样本之前第 k 个样本
+    """
+    length = up * taps_per_phase
+    # 在上采样后的采样率下归一化的截止频率（周期/样本）
+    cutoff = 0.5 * rolloff / max(up, down)
+    n = np.arange(length) - (length - 1) / 2
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta) * up
+    return prototype.reshape(taps_per_phase, up).T
+
+
+def design_cycle_matrix(up: int, down: int, taps_per_phase: int = DEFAULT_TAPS_PER_PHASE) -> np.ndarray:
+    """
+    把多相滤波器展开成一个输出周期的矩阵
+
+    每消耗 down 个输入样本产生 up 个输出样本，且各输出使用的相位每个周期重复一次，
+    因此第 q 个周期的 up 个输出 = 从第 q*down 个样本开始、长 down+taps-1 的输入窗口 @ 矩阵.T
+
+    Returns:
+        形状 (up, down + taps_per_phase - 1) 的 float32 矩阵
+    """
+    phases = design_polyphase_filter(up, down, taps_per_phase)
+    matrix = np.zeros((up, down + taps_per_phase - 1), dtype=np.float64)
+    for r in range(up):
+        # 第 r 个输出对应的最新输入样本（窗口内下标）和相位
+        newest = (r * down) // up + taps_per_phase - 1
+        phase = (r * down) % up
+        matrix[r, newest - taps_per_phase + 1:newest + 1] = phases[phase, ::-1]
+    return matrix.astype(np.float32)
+
+
+class StreamingResampler:
+    """
+    流式下混 + 多相 FIR 重采样：常见采样率、任意声道数的 s16le PCM -> 16kHz 单声道 s16le
+
+    - 跨块保留滤波器历史样本和不足一帧的尾部字节，块的切分方式不影响输出
+    - 按完整的输出周期计算，每块只做一次滑动窗口视图 @ 周期矩阵（BLAS），不逐样本循环；
+      不足一个周期的输出留到下一块，额外延迟不超过一个周期（44.1kHz 为 10ms）
+    - 输入已经是 16kHz 单声道时直接透传
+    """
+
+    def __init__(self, input_rate: int, channels: int = 1, output_rate: int = TARGET_SAMPLE_RATE,
+                 taps_per_phase: int = DEFAULT_TAPS_PER_PHASE):
+        if input_rate not in SUPPORTED_SAMPLE_RATES:
+            raise ValueError(f"不支持的采样率: {input_rate}（支持 {', '.join(map(str, SUPPORTED_SAMPLE_RATES))}）")
+        if not 1 <= channels <= MAX_CHANNELS:
+            raise ValueError(f"不支持的声道数: {channels}（支持 1-{MAX_CHANNELS}）")
+        self.input_rate = input_rate
+        self.channels = channels
+        self.output_rate = output_rate
+        self.passthrough = input_rate == output_rate and channels == 1
+        self.frame_bytes = SAMPLE_WIDTH * channels
+
+        divisor = gcd(output_rate, input_rate)
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.taps = taps_per_phase
+        self._matrix_t = np.ascontiguousarray(design_cycle_matrix(self.up, self.down, taps_per_phase).T)
+        self._window = self.down + taps_per_phase - 1
+        # 缓冲区开头为上一块留下的样本；初始为 taps-1 个静音样本作为滤波器历史
+        self._history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self._pending = b""
+
+    def process(self, chunk: bytes) -> bytes:
+        """喂入一块 s16le 交错 PCM，返回本块能产生的 16kHz 单声道 s16le PCM"""
+        data = self._pending + chunk
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        if not usable:
+            return b""
+        if self.passthrough:
+            return data[:usable]
+        interleaved = np.frombuffer(data, dtype="<i2", count=usable // SAMPLE_WIDTH)
+        # 下混：各声道求平均（按声道切片相加，比 reshape 后沿短轴求和快得多）
+        samples = interleaved[0::self.channels].astype(np.float32)
+        for channel in range(1, self.channels):
+            samples += interleaved[channel::self.channels]
+        if self.channels > 1:
+            samples *= 1.0 / self.channels
+        return self._resample(samples)
+
+    def flush(self) -> bytes:
+        """流结束：补足滤波器延迟和最后一个周期对应的静音，输出剩余样本"""
+        self._pending = b""
+        if self.passthrough:
+            return b""
+        return self._resample(np.zeros(self.taps // 2 + self.down, dtype=np.float32))
+
+    def _resample(self, samples: np.ndarray) -> bytes:
+        buffer = np.concatenate((self._history, samples))
+        cycles = (len(buffer) - self._window) // self.down + 1 if len(buffer) >= self._window else 0
+        if not cycles:
+            self._history = buffer
+            return b""
+        # 第 q 行为第 q 个周期的输入窗口（步长 down 的重叠视图），拷贝成连续内存后矩阵乘法更快
+        itemsize = buffer.itemsize
+        windows = as_strided(buffer, shape=(cycles, self._window),
+                             strides=(self.down * itemsize, itemsize), writeable=False)
+        output = (np.ascontiguousarray(windows) @ self._matrix_t).ravel()
+        # 之后的周期从第 cycles*down 个样本开始
+        self._history = buffer[cycles * self.down:]
+        np.rint(output, out=output)
+        return output.clip(-32768, 32767).astype("<i2").tobytes()
+
+
+# 语音活动检测的帧长和起音前保留的时长
+VAD_FRAME_MS = 20
+VAD_PREROLL_MS = 100
+# 低于此能量（dBFS）的帧一律视为静音
+VAD_MIN_ENERGY_DB = -55.0
+# 清辅音（s、sh、f 等）能量低但过零率高，过零率超过此值时能量门限减半
+VAD_FRICATIVE_ZCR = 0.25
+# 激进程度 0-3：越高要求的能量高出噪声底越多、语音结束后保留的尾音越短，裁掉的音频越多
+VAD_AGGRESSIVENESS = {
+    0: {"margin_db": 6.0, "hangover_ms": 600},
+    1: {"margin_db": 9.0, "hangover_ms": 450},
+    2: {"margin_db": 12.0, "hangover_ms": 300},
+    3: {"margin_db": 15.0, "hangover_ms": 200},
+}
+
+
+class StreamingVAD:
+    """
+    流式语音活动检测：16bit 单声道 PCM 按 20ms 分帧，丢弃静音帧后再上传给转写服务
+
+    - 每块的帧能量和过零率一次向量化计算，逐帧只做阈值比较和状态更新
+    - 能量门限相对于自适应的噪声底；语音结束后保留 hangover 时长的尾音（让转写服务仍能断句），
+      语音开始前补回 100ms 的起音
+    - keepalive_interval_ms > 0 时，长静音期间每隔该时长插入一帧数字静音，避免转写连接因长时间无音频被断开
+    """
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, aggressiveness: int = 2,
+                 keepalive_interval_ms: int = 0):
+        if aggressiveness not in VAD_AGGRESSIVENESS:
+            raise ValueError(f"不支持的 VAD 激进程度: {aggressiveness}（支持 0-3）")
+        profile = VAD_AGGRESSIVENESS[aggressiveness]
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * VAD_FRAME_MS // 1000
+        self.frame_bytes = self.frame_samples * SAMPLE_WIDTH
+        self.margin_db = profile["margin_db"]
+        self.hangover_frames = profile["hangover_ms"] // VAD_FRAME_MS
+        self.preroll_frames = VAD_PREROLL_MS // VAD_FRAME_MS
+        self.keepalive_frames = keepalive_interval_ms // VAD_FRAME_MS if keepalive_interval_ms > 0 else 0
+        self._silence_frame = bytes(self.frame_bytes)
+
+        self._pending = b""
+        # 第一帧（会话通常以背景声开始）的能量作为初始噪声底
+        self._noise_floor_db: Optional[float] = None
+        self._hangover_left = 0
+        self._preroll: List[bytes] = []
+        self._dropped_since_keepalive = 0
+        self.stats = {"input_frames": 0, "speech_frames": 0, "output_frames": 0, "keepalive_frames": 0}
+
+    def process(self, chunk: bytes) -> bytes:
+        """喂入一块 PCM，返回应当上传的部分（语音帧、尾音、起音和保活帧）"""
+        data = self._pending + chunk
+        count = len(data) // self.frame_bytes
+        self._pending = data[count * self.frame_bytes:]
+        if not count:
+            return b""
+        frames = np.frombuffer(data, dtype="<i2", count=count * self.frame_samples) \
+            .reshape(count, self.frame_samples).astype(np.float32)
+        energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) / (32768.0 * 32768.0) + 1e-10)
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+
+        output: List[bytes] = []
+        for idx, (energy, crossing) in enumerate(zip(energy_db.tolist(), zcr.tolist())):
+            frame = data[idx * self.frame_bytes:(idx + 1) * self.frame_bytes]
+            self.stats["input_frames"] += 1
+            if self._noise_floor_db is None:
+                self._noise_floor_db = energy
+            margin = self.margin_db / 2 if crossing > VAD_FRICATIVE_ZCR else self.margin_db
+            is_speech = energy > VAD_MIN_ENERGY_DB and energy > self._noise_floor_db + margin
+
+            # 噪声底：下降时立即跟随，上升时缓慢跟随（语音帧更慢，持续的背景噪声最终也会被计入噪声底）
+            if energy < self._noise_floor_db:
+                self._noise_floor_db = energy
+            else:
+                self._noise_floor_db += (0.01 if is_speech else 0.05) * (energy - self._noise_floor_db)
+
+            if is_speech:
+                self.stats["speech_frames"] += 1
+                if not self._hangover_left:
+                    # 语音开始：补回起音
+                    output.extend(self._preroll)
+                self._preroll = []
+                self._hangover_left = self.hangover_frames
+                self._dropped_since_keepalive = 0
+                output.append(frame)
+                continue
+
+            if self._hangover_left:
+                self._hangover_left -= 1
+                output.append(frame)
+                continue
+
+            self._preroll.append(frame)
+            if len(self._preroll) > self.preroll_frames:
+                self._preroll.pop(0)
+                self._dropped_since_keepalive += 1
+                if self.keepalive_frames and self._dropped_since_keepalive >= self.keepalive_frames:
+                    self._dropped_since_keepalive = 0
+                    self.stats["keepalive_frames"] += 1
+                    output.append(self._silence_frame)
+
+        self.stats["output_frames"] += len(output)
+        return b"".join(output)
+
+    def get_stats(self) -> Dict[str, float]:
+        """输入/上传/节省的音频秒数"""
+        seconds_per_frame = VAD_FRAME_MS / 1000
+        input_seconds = self.stats["input_frames"] * seconds_per_frame
+        output_seconds = self.stats["output_frames"] * seconds_per_frame
+        return {
+            "input_seconds": round(input_seconds, 2),
+            "output_seconds": round(output_seconds, 2),
+            "saved_seconds": round(input_seconds - output_seconds, 2),
+            "speech_seconds": round(self.stats["speech_frames"] * seconds_per_frame, 2),
+            "keepalive_frames": self.stats["keepalive_frames"]
+        }
+
+
+def create_resampler(sample_rate: Optional[int], channels: Optional[int]) -> StreamingResampler:
+    """按客户端声明的格式创建重采样器，未声明的字段按 16kHz 单声道处理"""
+    return StreamingResampler(int(sample_rate or TARGET_SAMPLE_RATE), int(channels or 1))
+
+
+# 讯飞建议的上行帧：每 40ms 发送 1280 字节（16kHz、16bit、单声道）
+UPSTREAM_FRAME_BYTES = 1280
+
+
+class AudioFrameRing:
+    """
+    单个会话的上行音频环形缓冲：写入任意大小的音频块，按固定帧长读出
+
+    - 底层为一块预分配的 bytearray，写入时只做一次拷贝（进入缓冲），读出的帧是缓冲上的 memoryview，不再拷贝
+    - 容量是帧长的整数倍，读位置始终按帧对齐，因此读出的帧不会跨越缓冲末尾
+    - 缓冲满时 write 只写入能放下的部分并返回写入字节数，由调用方决定等待（背压）还是丢弃
+    - peek_frame 返回的帧在调用 advance 之前不会被覆盖，可以直接交给异步发送
+    """
+
+    def __init__(self, capacity_bytes: int, frame_bytes: int = UPSTREAM_FRAME_BYTES):
+        frames = max(2, -(-capacity_bytes // frame_bytes))
+        self.frame_bytes = frame_bytes
+        self.capacity = frames * frame_bytes
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        self._read = 0
+        self._size = 0
+        self.stats = {"bytes_written": 0, "bytes_dropped": 0, "frames_read": 0}
+
+    @property
+    def buffered(self) -> int:
+        """缓冲中尚未读出的字节数"""
+        return self._size
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    def write(self, data) -> int:
+        """写入尽可能多的数据（bytes/bytearray/memoryview），返回写入的字节数"""
+        source = memoryview(data).cast("B")
+        count = min(len(source), self.free)
+        if count:
+            start = (self._read + self._size) % self.capacity
+            first = min(count, self.capacity - start)
+            self._view[start:start + first] = source[:first]
+            if count > first:
+                self._view[:count - first] = source[first:count]
+            self._size += count
+            self.stats["bytes_written"] += count
+        return count
+
+    def drop(self, count: int):
+        """记录因无法写入而丢弃的字节数"""
+        self.stats["bytes_dropped"] += count
+
+    def discard(self):
+        """丢弃缓冲中的全部数据（计入丢弃字节数）"""
+        self.stats["bytes_dropped"] += self._size
+        self._read = 0
+        self._size = 0
+
+    def peek_frame(self) -> Optional[memoryview]:
+        """缓冲中的下一个完整帧（不移动读位置），不足一帧时返回 None"""
+        if self._size < self.frame_bytes:
+            return None
+        return self._view[self._read:self._read + self.frame_bytes]
+
+    def peek_tail(self) -> Optional[memoryview]:
+        """剩余不足一帧的数据（音频结束时发送），没有时返回 None"""
+        if not self._size:
+            return None
+        return self._view[self._read:self._read + min(self._size, self.frame_bytes)]
+
+    def advance(self, count: Optional[int] = None):
+        """释放 peek 出的数据，默认一个完整帧"""
+        count = min(self.frame_bytes if count is None else count, self._size)
+        self._read = (self._read + count) % self.capacity
+        self._size -= count
+        if self._size == 0:
+            # 缓冲已空，读位置回到起点（保持帧对齐）
+            self._read = 0
+        self.stats["frames_read"] += 1
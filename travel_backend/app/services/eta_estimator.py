@@ -0,0 +1,133 @@
+"""离线路线耗时估算 - 基于球面距离和各交通方式的速度模型"""
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+import copy
+import numpy as np
+
+
+EARTH_RADIUS_METERS = 6371008.8
+
+# 各交通方式的默认参数：
+# speed_kmh: 平均速度；detour: 实际路程 / 直线距离；overhead_minutes: 固定耗时（候车、停车等）
+DEFAULT_SPEED_PROFILES: Dict[str, Dict[str, float]] = {
+    "walking": {"speed_kmh": 4.5, "detour": 1.25, "overhead_minutes": 0.0},
+    "driving": {"speed_kmh": 25.0, "detour": 1.4, "overhead_minutes": 3.0},
+    "transit": {"speed_kmh": 18.0, "detour": 1.3, "overhead_minutes": 8.0},
+}
+
+
+def haversine_meters(lat1: Any, lng1: Any, lat2: Any, lng2: Any) -> np.ndarray:
+    """计算球面距离（米），参数可以是标量或等长数组"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class ETAEstimator:
+    """
+    本地耗时估算器
+
+    - estimate_many 一次向量化计算整天的路段
+    - observe 记录地图API返回的真实耗时，calibrate 据此拟合各交通方式的速度和绕路系数
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, Dict[str, float]]] = None,
+                 max_samples: int = 1000, min_samples: int = 20):
+        self.profiles = copy.deepcopy(profiles or DEFAULT_SPEED_PROFILES)
+        self.min_samples = min_samples
+        # 每种交通方式的样本：(直线距离米, 实际距离米, 实际耗时分钟)
+        self._samples: Dict[str, Deque[Tuple[float, float, float]]] = {
+            mode: deque(maxlen=max_samples) for mode in self.profiles
+        }
+
+    def _profile(self, mode: str) -> Dict[str, float]:
+        return self.profiles.get(mode) or self.profiles["driving"]
+
+    def straight_distances(self, legs: Sequence[Tuple[Dict[str, float], Dict[str, float], str]]) -> np.ndarray:
+        """批量计算路段的直线距离（米）"""
+        if not legs:
+            return np.zeros(0)
+        coords = np.array(
+            [(a["lat"], a["lng"], b["lat"], b["lng"]) for a, b, _ in legs],
+            dtype=np.float64
+        )
+        return haversine_meters(coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3])
+
+    def estimate_many(self, legs: Sequence[Tuple[Dict[str, float], Dict[str, float], str]]
+                      ) -> List[Dict[str, Any]]:
+        """
+        批量估算路段耗时
+
+        Args:
+            legs: [(point_a, point_b, mode), ...]
+
+        Returns:
+            与 legs 顺序一致的 {"duration_minutes": int, "distance_meters": int, "estimated": True}
+        """
+        if not legs:
+            return []
+        straight = self.straight_distances(legs)
+        speed_kmh = np.array([self._profile(mode)["speed_kmh"] for _, _, mode in legs])
+        detour = np.array([self._profile(mode)["detour"] for _, _, mode in legs])
+        overhead = np.array([self._profile(mode)["overhead_minutes"] for _, _, mode in legs])
+
+        road_meters = straight * detour
+        minutes = road_meters / (speed_kmh * 1000.0 / 60.0)
+        # 距离很近时不加固定耗时（例如同一商圈内步行）
+        minutes = np.where(road_meters > 0, minutes + overhead, 0.0)
+        # 有距离的路段至少1分钟
+        minutes = np.where(road_meters > 0, np.maximum(np.rint(minutes), 1), 0)
+
+        return [
+            {"duration_minutes": int(m), "distance_meters": int(round(d)), "estimated": True}
+            for m, d in zip(minutes, road_meters)
+        ]
+
+    def estimate(self, point_a: Dict[str, float], point_b: Dict[str, float], mode: str) -> Dict[str, Any]:
+        """估算单个路段耗时"""
+        return self.estimate_many([(point_a, point_b, mode)])[0]
+
+    def observe(self, point_a: Dict[str, float], point_b: Dict[str, float], mode: str,
+                eta: Dict[str, Any]):
+        """记录一条地图API返回的真实耗时，用于校准"""
+        if mode not in self._samples:
+            return
+        duration = eta.get("duration_minutes") or 0
+        distance = eta.get("distance_meters") or 0
+        if duration <= 0 or distance <= 0:
+            return
+        straight = float(haversine_meters(point_a["lat"], point_a["lng"], point_b["lat"], point_b["lng"]))
+        if straight < 50:
+            # 直线距离过短时比值噪声太大
+            return
+        self._samples[mode].append((straight, float(distance), float(duration)))
+
+    def sample_count(self) -> int:
+        return sum(len(samples) for samples in self._samples.values())
+
+    def calibrate(self) -> Dict[str, Dict[str, float]]:
+        """
+        根据已记录的真实耗时重新拟合各交通方式的参数
+        - detour 取 实际距离/直线距离 的中位数
+        - 耗时按 overhead + 实际距离/速度 做线性拟合，斜率不合理时只更新速度中位数
+
+        Returns:
+            校准后的参数
+        """
+        for mode, samples in self._samples.items():
+            if len(samples) < self.min_samples:
+                continue
+            data = np.array(samples, dtype=np.float64)
+            straight, road, minutes = data[:, 0], data[:, 1], data[:, 2]
+            profile = self.profiles[mode]
+
+            profile["detour"] = float(np.clip(np.median(road / straight), 1.0, 3.0))
+
+            slope, intercept = np.polyfit(road / 1000.0, minutes, 1)
+            if slope > 0 and intercept >= 0:
+                profile["speed_kmh"] = float(60.0 / slope)
+                profile["overhead_minutes"] = float(intercept)
+            else:
+                moving = np.maximum(minutes - profile["overhead_minutes"], 1.0)
+                profile["speed_kmh"] = float(np.median(road / 1000.0 / (moving / 60.0)))
+        return copy.deepcopy(self.profiles)
@@ -4,9 +4,7 @@ from app.services.voice_service import voice_service
 from app.data.expense_repository import get_expense_repository, ExpenseRepository
 from app.models.api_models import ExpenseInputText, ExpenseInputVoice
 from typing import Dict, Any, List
-import tempfile
 import base64
-import os
 
 
 class ExpenseService:
@@ -47,21 +45,10 @@ class ExpenseService:
         """
         expense_repo = get_expense_repository()
         
-        # 1. 语音转文本（需要先保存base64音频为临时文件）
+        # 1. 语音转文本（base64 解码后直接经 ffmpeg 流式转码）
         if expense_input.audio_base64:
-            # 解码base64音频
             audio_data = base64.b64decode(expense_input.audio_base64)
-            
-            # 保存到临时文件
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-                tmp_file.write(audio_data)
-                tmp_path = tmp_file.name
-            
-            try:
-                text = await self.voice_service.transcribe_audio_file(tmp_path)
-            finally:
-                # 删除临时文件
-                os.unlink(tmp_path)
+            text = await self.voice_service.transcribe_audio_stream(audio_data)
         else:
             raise ValueError("音频数据为空")
         
@@ -0,0 +1,162 @@
+"""地图几何工具 - Web 墨卡托投影和视野计算"""
+from typing import Dict, List, Tuple
+import math
+
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.05112878
+
+
+def project(lat: float, lng: float) -> Tuple[float, float]:
+    """经纬度 -> Web 墨卡托世界坐标，取值范围 [0, 1)"""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = (lng + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def unproject(x: float, y: float) -> Tuple[float, float]:
+    """Web 墨卡托世界坐标 -> 经纬度"""
+    lng = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lng
+
+
+def fit_viewport(points: List[Dict[str, float]], width: int, height: int,
+                 padding: int = 64, max_zoom: float = 17.0, min_zoom: float = 1.0) -> Tuple[float, float, float]:
+    """
+    计算能容纳所有点的视野
+
+    Args:
+        points: [{"lat": float, "lng": float}, ...]
+        width, height: 画布像素尺寸
+        padding: 四周留白像素
+        max_zoom, min_zoom: 缩放级别范围
+
+    Returns:
+        (center_lat, center_lng, zoom)，zoom 为小数，需要整数级别时由调用方取整
+    """
+    projected = [project(p["lat"], p["lng"]) for p in points]
+    xs = [x for x, _ in projected]
+    ys = [y for _, y in projected]
+    min_x, max_x, min_y, max_y = min(xs), max(xs), min(ys), max(ys)
+    center_lat, center_lng = unproject((min_x + max_x) / 2, (min_y + max_y) / 2)
+
+    usable_w = max(width - 2 * padding, 1)
+    usable_h = max(height - 2 * padding, 1)
+    span_x = max_x - min_x
+    span_y = max_y - min_y
+    zoom = max_zoom
+    if span_x > 0:
+        zoom = min(zoom, math.log2(usable_w / (span_x * TILE_SIZE)))
+    if span_y > 0:
+        zoom = min(zoom, math.log2(usable_h / (span_y * TILE_SIZE)))
+    return center_lat, center_lng, max(min_zoom, zoom)
+
+
+def to_pixel(lat: float, lng: float, center_lat: float, center_lng: float, zoom: float,
+             width: int, height: int) -> Tuple[float, float]:
+    """经纬度 -> 以给定中心和缩放级别渲染的画布像素坐标"""
+    scale = TILE_SIZE * (2 ** zoom)
+    x, y = project(lat, lng)
+    cx, cy = project(center_lat, center_lng)
+    return (x - cx) * scale + width / 2, (y - cy) * scale + height / 2
+
+
+def fit_zoom_level(points: List[Dict[str, float]], width: int, height: int, padding: int = 64,
+                   max_zoom: int = 17, min_zoom: int = 1) -> Tuple[float, float, int]:
+    """
+    计算能容纳所有点的整数缩放级别（静态地图服务只接受整数 zoom）
+
+    Returns:
+        (center_lat, center_lng, zoom)，中心为投影后包围盒的中心
+    """
+    center_lat, center_lng, zoom = fit_viewport(points, width, height, padding, max_zoom, min_zoom)
+    return center_lat, center_lng, int(max(min_zoom, min(max_zoom, math.floor(zoom))))
+
+
+def _point_segment_distance(p: Tuple[float, float], a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """点 p 到线段 ab 的距离"""
+    ax, ay = a
+    dx, dy = b[0] - ax, b[1] - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(p[0] - ax, p[1] - ay)
+    t = max(0.0, min(1.0, ((p[0] - ax) * dx + (p[1] - ay) * dy) / length_sq))
+    return math.hypot(p[0] - (ax + t * dx), p[1] - (ay + t * dy))
+
+
+def simplify_path(points: List[Dict[str, float]], tolerance_pixels: float, zoom: float) -> List[Dict[str, float]]:
+    """
+    Douglas–Peucker 折线简化（在给定缩放级别的像素坐标下计算偏差）
+
+    Args:
+        points: [{"lat": float, "lng": float}, ...]
+        tolerance_pixels: 允许的最大偏差（像素）
+        zoom: 缩放级别
+
+    Returns:
+        保留的点（首尾点总是保留，顺序不变）
+    """
+    if len(points) <= 2 or tolerance_pixels <= 0:
+        return list(points)
+    scale = TILE_SIZE * (2 ** zoom)
+    projected = [(x * scale, y * scale) for x, y in (project(p["lat"], p["lng"]) for p in points)]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    # 用栈代替递归，点数多时不会触发递归深度限制
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        max_distance, index = 0.0, -1
+        for i in range(start + 1, end):
+            distance = _point_segment_distance(projected[i], projected[start], projected[end])
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if index != -1 and max_distance > tolerance_pixels:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return [p for p, kept in zip(points, keep) if kept]
+
+
+def cluster_centers(points: List[Dict[str, float]], k: int, iterations: int = 20) -> List[Dict[str, float]]:
+    """
+    把点聚成最多 k 簇，返回各簇中心（在墨卡托坐标中做 k-means，结果确定）
+
+    初始中心取离整体中心最近的点，其余依次取离已有中心最远的点；空簇直接丢弃
+    """
+    if not points or k <= 0:
+        return []
+    projected = [project(p["lat"], p["lng"]) for p in points]
+    mean_x = sum(x for x, _ in projected) / len(projected)
+    mean_y = sum(y for _, y in projected) / len(projected)
+    first = min(projected, key=lambda p: (p[0] - mean_x) ** 2 + (p[1] - mean_y) ** 2)
+    centers = [first]
+    while len(centers) < min(k, len(projected)):
+        farthest = max(projected, key=lambda p: min((p[0] - c[0]) ** 2 + (p[1] - c[1]) ** 2 for c in centers))
+        if farthest in centers:
+            break
+        centers.append(farthest)
+
+    for _ in range(iterations):
+        members: List[List[Tuple[float, float]]] = [[] for _ in centers]
+        for p in projected:
+            nearest = min(range(len(centers)),
+                          key=lambda i: (p[0] - centers[i][0]) ** 2 + (p[1] - centers[i][1]) ** 2)
+            members[nearest].append(p)
+        updated = [
+            (sum(x for x, _ in group) / len(group), sum(y for _, y in group) / len(group))
+            for group in members if group
+        ]
+        if updated == centers:
+            break
+        centers = updated
+
+    result = []
+    for x, y in centers:
+        lat, lng = unproject(x, y)
+        result.append({"lat": lat, "lng": lng})
+    return result
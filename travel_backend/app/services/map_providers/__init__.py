@@ -0,0 +1,35 @@
+"""地图服务商实现"""
+from config import settings
+from app.services.map_providers.base import MapProvider, HttpMapProvider, POIPage
+from app.services.map_providers.amap import AmapProvider
+from app.services.map_providers.baidu import BaiduProvider
+from app.services.map_providers.local import LocalMapProvider
+from app.services.rate_limiter import OutboundLimiter
+from typing import Callable, Dict
+import httpx
+
+
+def create_provider(api_type: str, limiters: Dict[str, OutboundLimiter],
+                    client_factory: Callable[[], httpx.AsyncClient]) -> MapProvider:
+    """按配置的 map_api_type 创建服务商"""
+    if api_type == "amap":
+        return AmapProvider(limiters, client_factory, api_key=settings.amap_api_key)
+    if api_type == "baidu":
+        return BaiduProvider(limiters, client_factory, api_key=settings.baidu_api_key)
+    if api_type == "local":
+        return LocalMapProvider(
+            limiters,
+            fixture_path=settings.map_fixture_path,
+            latency_ms=settings.map_fixture_latency_ms,
+            latency_jitter_ms=settings.map_fixture_latency_jitter_ms,
+            error_rate=settings.map_fixture_error_rate,
+            throttle_rate=settings.map_fixture_throttle_rate,
+            seed=settings.map_fixture_seed,
+            coord_precision=settings.eta_cache_coord_precision
+        )
+    raise ValueError(f"不支持的地图服务商: {api_type}")
+
+
+__all__ = [
+    "MapProvider", "HttpMapProvider", "POIPage", "AmapProvider", "BaiduProvider", "LocalMapProvider", "create_provider"
+]
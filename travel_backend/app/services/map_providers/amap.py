@@ -0,0 +1,366 @@
+"""高德地图服务商"""
+from config import settings
+from app.services.map_providers.base import HttpMapProvider, POIPage
+from app.services.map_geometry import fit_zoom_level, simplify_path
+from app.services.map_renderer import label_priority, label_text, parse_size
+from app.services.rate_limiter import OutboundLimiter
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+import httpx
+
+
+AMAP_STATIC_MAP_URL = "https://restapi.amap.com/v3/staticmap"
+AMAP_DISTANCE_URL = "https://restapi.amap.com/v3/distance"
+AMAP_GEOCODE_URL = "https://restapi.amap.com/v3/geocode/geo"
+# 静态地图四周为标注点和标签预留的像素
+STATIC_MAP_PADDING = 80
+
+# POI检索只用到的字段，精简模式下只解析这些字段
+AMAP_POI_FIELDS = ("id", "name", "location", "type", "address")
+
+# 地理编码只匹配到行政区一级（名称无法精确匹配时高德返回所在行政区的中心点），视为未找到
+AMAP_COARSE_GEOCODE_LEVELS = {"国家", "省", "市", "区县", "开发区", "未知"}
+
+# 高德表示限流/配额超限的 infocode
+AMAP_THROTTLE_INFOCODES = {"10003", "10004", "10014", "10019", "10020", "10021", "10044"}
+
+
+class AmapProvider(HttpMapProvider):
+    """高德地图 Web 服务API"""
+    
+    name = "amap"
+    supports_distance_matrix = True
+    supports_nearby_search = True
+    supports_geocode = True
+    # 批量地理编码单次最多10个地址
+    geocode_max_batch = 10
+    # 距离测量接口单次请求最多支持的起点数
+    distance_max_origins = 100
+    
+    def __init__(self, limiters: Dict[str, OutboundLimiter], client_factory: Callable[[], httpx.AsyncClient],
+                 api_key: str):
+        super().__init__(limiters, client_factory)
+        self.api_key = api_key
+    
+    @property
+    def supports_static_map(self) -> bool:
+        return bool(self.api_key)
+    
+    def _is_throttled(self, data: Dict[str, Any]) -> bool:
+        return str(data.get("infocode", "")) in AMAP_THROTTLE_INFOCODES
+    
+    async def search_poi(self, city: str, keyword: str, page: int = 1) -> POIPage:
+        """使用高德地图API搜索POI"""
+        url = "https://restapi.amap.com/v3/place/text"
+        params = {
+            "key": self.api_key,
+            "keywords": keyword,
+            "city": city,
+            "output": "json",
+            "offset": self.poi_page_size,  # 每页记录数
+            "page": page,
+            # 精简模式只请求基础字段（不含图片、商圈、室内等扩展信息），并流式解析需要的字段
+            "extensions": "base" if settings.amap_poi_lean_mode else "all"
+        }
+        
+        try:
+            return await self._request_pois(url, params, keyword)
+        except Exception as e:
+            print(f"高德地图POI搜索失败: {e}")
+            return POIPage()
+    
+    async def search_poi_nearby(self, center: Dict[str, float], keyword: str, radius_meters: int,
+                                page: int = 1) -> POIPage:
+        """使用高德地图周边搜索（v3/place/around），结果按距离排序"""
+        url = "https://restapi.amap.com/v3/place/around"
+        params = {
+            "key": self.api_key,
+            "keywords": keyword,
+            "location": f"{center['lng']:.6f},{center['lat']:.6f}",
+            "radius": radius_meters,
+            "sortrule": "distance",
+            "output": "json",
+            "offset": self.poi_page_size,
+            "page": page,
+            "extensions": "base" if settings.amap_poi_lean_mode else "all"
+        }
+        
+        try:
+            return await self._request_pois(url, params, keyword)
+        except Exception as e:
+            print(f"高德地图周边POI搜索失败: {e}")
+            return POIPage()
+    
+    async def _request_pois(self, url: str, params: Dict[str, Any], keyword: str) -> POIPage:
+        """请求POI检索接口（关键字搜索和周边搜索的响应结构相同）并转换为统一格式，跳过没有有效坐标的记录"""
+        if settings.amap_poi_lean_mode:
+            data, raw_pois = await self._stream_json_array("place", url, params, "pois", AMAP_POI_FIELDS)
+        else:
+            data = await self._get_json("place", url, params)
+            raw_pois = data.get("pois") or []
+        
+        pois = []
+        if data.get("status") == "1" and raw_pois:
+            for poi in raw_pois:
+                location = poi.get("location", "")
+                location = location.split(",") if isinstance(location, str) else []
+                if len(location) == 2:
+                    # 处理 type 字段，可能是字符串或列表
+                    poi_type = poi.get("type", "")
+                    if isinstance(poi_type, list):
+                        poi_type = ", ".join(poi_type)
+                    # 高德对空字段返回 []
+                    poi_address = poi.get("address", "")
+                    if isinstance(poi_address, list):
+                        poi_address = ", ".join(poi_address)
+                    description = f"{poi_type} | {poi_address}" if poi_type else poi_address
+                    
+                    pois.append({
+                        "source_id": f"amap:{poi['id']}" if poi.get("id") else "",
+                        "name": poi.get("name", ""),
+                        "category": keyword,
+                        "lat": float(location[1]),
+                        "lng": float(location[0]),
+                        "description": description
+                    })
+        return POIPage(pois, raw_count=len(raw_pois) if data.get("status") == "1" else 0)
+    
+    async def geocode(self, city: str, names: List[str]) -> Optional[List[Optional[Dict[str, float]]]]:
+        """使用高德地理编码（batch=true 时一次最多10个地址，结果与地址一一对应）"""
+        params = {
+            "key": self.api_key,
+            # 地址之间以 | 分隔
+            "address": "|".join(name.replace("|", " ") for name in names),
+            "city": city,
+            "batch": "true" if len(names) > 1 else "false",
+            "output": "json"
+        }
+        
+        try:
+            data = await self._get_json("place", AMAP_GEOCODE_URL, params)
+        except Exception as e:
+            print(f"高德地理编码失败: {e}")
+            return None
+        if data.get("status") != "1":
+            print(f"高德地理编码失败: {data.get('info', '未知错误')}")
+            return None
+        
+        geocodes = data.get("geocodes") or []
+        if len(names) > 1 and len(geocodes) != len(names):
+            # 批量结果无法与地址对应，不使用
+            print(f"高德地理编码返回 {len(geocodes)} 条结果，请求了 {len(names)} 个地址")
+            return None
+        
+        locations: List[Optional[Dict[str, float]]] = []
+        for idx in range(len(names)):
+            geo = geocodes[idx] if idx < len(geocodes) else {}
+            location = geo.get("location")
+            location = location.split(",") if isinstance(location, str) else []
+            if len(location) != 2 or geo.get("level") in AMAP_COARSE_GEOCODE_LEVELS:
+                locations.append(None)
+            else:
+                locations.append({"lat": float(location[1]), "lng": float(location[0])})
+        return locations
+    
+    async def get_eta(self, point_a: Dict[str, float], point_b: Dict[str, float],
+                      mode: str) -> Dict[str, Any]:
+        """使用高德地图API获取路线规划"""
+        # 根据交通方式选择不同的API端点
+        mode_map = {
+            "driving": "driving",
+            "walking": "walking",
+            "transit": "transit"
+        }
+        amap_mode = mode_map.get(mode, "driving")
+        
+        # 构建正确的API URL
+        url = f"https://restapi.amap.com/v3/direction/{amap_mode}"
+        
+        origin = f"{point_a['lng']},{point_a['lat']}"
+        destination = f"{point_b['lng']},{point_b['lat']}"
+        
+        params = {
+            "key": self.api_key,
+            "origin": origin,
+            "destination": destination,
+            "output": "json"
+        }
+        
+        try:
+            data = await self._get_json("direction", url, params)
+            
+            if data.get("status") == "1" and data.get("route"):
+                route = data["route"]
+                
+                # 根据不同交通方式，数据结构不同
+                if amap_mode == "transit":
+                    # 公交路线：返回 transits 数组
+                    transits = route.get("transits", [])
+                    if not transits:
+                        return {"duration_minutes": 0, "distance_meters": 0}
+                    transit = transits[0]
+                    duration_seconds = transit.get("duration", 0)
+                    distance_meters = transit.get("distance", 0)
+                else:
+                    # 步行和驾车：返回 paths 数组
+                    paths = route.get("paths", [])
+                    if not paths:
+                        return {"duration_minutes": 0, "distance_meters": 0}
+                    path = paths[0]
+                    duration_seconds = path.get("duration", 0)
+                    distance_meters = path.get("distance", 0)
+                
+                # 转换为数字（如果是字符串则先转浮点数再转整数）
+                try:
+                    duration_seconds = float(duration_seconds) if duration_seconds else 0
+                    distance_meters = float(distance_meters) if distance_meters else 0
+                except (ValueError, TypeError) as e:
+                    print(f"高德地图路线规划数据转换失败: {e}, duration={duration_seconds}, distance={distance_meters}")
+                    duration_seconds = 0
+                    distance_meters = 0
+                
+                return {
+                    "duration_minutes": int(duration_seconds / 60) if duration_seconds > 0 else 0,
+                    "distance_meters": int(distance_meters) if distance_meters > 0 else 0
+                }
+            else:
+                # API返回错误，记录详细信息
+                print(f"高德地图路线规划API返回错误: status={data.get('status')}, info={data.get('info', '')}")
+            return {"duration_minutes": 0, "distance_meters": 0}
+        except Exception as e:
+            print(f"高德地图路线规划失败: {e}")
+            return {"duration_minutes": 0, "distance_meters": 0}
+    
+    async def get_distance(self, origins: List[Dict[str, float]], destination: Dict[str, float],
+                           mode: str) -> List[Optional[Dict[str, Any]]]:
+        """
+        使用高德距离测量接口计算多个起点到同一终点的耗时（一次请求）
+        
+        Returns:
+            与 origins 顺序一致的列表，失败的起点为 None
+        """
+        url = AMAP_DISTANCE_URL
+        params = {
+            "key": self.api_key,
+            "origins": "|".join(f"{p['lng']},{p['lat']}" for p in origins),
+            "destination": f"{destination['lng']},{destination['lat']}",
+            "type": 3 if mode == "walking" else 1,  # 1:驾车导航距离 3:步行规划距离
+            "output": "json"
+        }
+        
+        etas: List[Optional[Dict[str, Any]]] = [None] * len(origins)
+        try:
+            data = await self._get_json("direction", url, params)
+            
+            if data.get("status") != "1":
+                print(f"高德地图距离测量API返回错误: status={data.get('status')}, info={data.get('info', '')}")
+                return etas
+            
+            for result in data.get("results", []):
+                try:
+                    # origin_id 从1开始，对应 origins 中的顺序
+                    idx = int(result.get("origin_id", 0)) - 1
+                    duration_seconds = float(result.get("duration") or 0)
+                    distance_meters = float(result.get("distance") or 0)
+                except (ValueError, TypeError):
+                    continue
+                if 0 <= idx < len(origins) and duration_seconds > 0:
+                    etas[idx] = {
+                        "duration_minutes": int(duration_seconds / 60),
+                        "distance_meters": int(distance_meters)
+                    }
+            return etas
+        except Exception as e:
+            print(f"高德地图距离测量失败: {e}")
+            return etas
+    
+    def static_map_params(self, points: List[Dict[str, Any]], zoom: Optional[int],
+                          size: str) -> Dict[str, Any]:
+        """
+        构建高德静态地图的请求参数（不含key），也用于计算地图内容哈希
+        
+        - 中心和缩放级别由所有点投影后的包围盒决定，保证标注点都在图内
+        - 地点名标签按优先级最多保留 map_static_max_labels 个
+        - 请求URL超过 map_static_url_max_bytes 时，依次简化路径（Douglas–Peucker）、
+          按优先级减少标签、进一步简化路径、降低坐标精度、按优先级减少标注点，直到满足长度限制
+        
+        Raises:
+            ValueError: 只保留一个标注点和首尾两点的路径仍超出长度限制（调用方改为本地渲染）
+        """
+        width, height = parse_size(size)
+        center_lat, center_lng, auto_zoom = fit_zoom_level(points, width, height, padding=STATIC_MAP_PADDING)
+        if zoom is None:
+            zoom = auto_zoom
+        
+        # 标签按优先级排序，减少标签时从末尾（优先级最低）去掉
+        labelled = [point for point in sorted(points, key=label_priority)[:settings.map_static_max_labels]
+                    if point.get("name")]
+        
+        def build(path_points: List[Dict[str, Any]], label_count: int,
+                  marker_indices: List[int], precision: int = 6) -> Dict[str, Any]:
+            def location(point: Dict[str, Any]) -> str:
+                return f"{point['lng']:.{precision}f},{point['lat']:.{precision}f}"
+            
+            # 构建 markers 参数（标注点）- 使用large放大标记
+            # 格式: markers=large,0xFF0000,A:lng1,lat1|large,0xFF0000,B:lng2,lat2
+            # 每个点按游览顺序使用字母标签：A, B, C... Z（高德只支持单个字符，超过26个循环），去掉部分点时字母不变
+            markers = "|".join(
+                f"large,0xFF0000,{chr(65 + (idx % 26))}:{location(points[idx])}" for idx in marker_indices
+            )
+            # 构建 paths 参数（路径，连接各个点）
+            # 格式: paths=weight,color,transparency,,:lng1,lat1;lng2,lat2;lng3,lat3
+            candidate = {
+                "location": f"{center_lng:.{precision}f},{center_lat:.{precision}f}",
+                "zoom": zoom,
+                "size": size,
+                "markers": markers,
+                "paths": "2,0x0000ff,1,,:" + ";".join(location(p) for p in path_points)
+            }
+            # 构建 labels 参数（地点名称标签）
+            # 格式: labels=content,font,bold,fontSize,fontColor,background:location
+            # 使用较大字体(14)，白色字体，蓝色背景
+            if label_count > 0:
+                candidate["labels"] = "|".join(
+                    f"{label_text(point['name'])},0,1,14,0xFFFFFF,0x5288d8:{location(point)}"
+                    for point in labelled[:label_count]
+                )
+            return candidate
+        
+        def fits(candidate: Dict[str, Any]) -> bool:
+            return len(AMAP_STATIC_MAP_URL) + len(f"?key={self.api_key}&") \
+                + len(urlencode(candidate)) <= settings.map_static_url_max_bytes
+        
+        all_markers = list(range(len(points)))
+        # 1. 先做肉眼不可见的路径简化（偏差不超过 2 像素）
+        path_points = simplify_path(points, 2.0, zoom)
+        candidate = build(path_points, len(labelled), all_markers)
+        if fits(candidate):
+            return candidate
+        # 2. 按优先级从低到高去掉标签
+        for label_count in range(len(labelled) - 1, -1, -1):
+            candidate = build(path_points, label_count, all_markers)
+            if fits(candidate):
+                return candidate
+        # 3. 逐步放宽路径简化的容差，最坏情况只保留首尾两点
+        tolerance = 4.0
+        while len(path_points) > 2:
+            path_points = simplify_path(points, tolerance, zoom)
+            candidate = build(path_points, 0, all_markers)
+            if fits(candidate):
+                return candidate
+            tolerance *= 2
+        # 4. 降低坐标精度：5位小数约1米、4位约10米，静态地图的缩放级别下看不出差别
+        for precision in (5, 4):
+            candidate = build(path_points, 0, all_markers, precision)
+            if fits(candidate):
+                return candidate
+        # 5. 按优先级从低到高去掉标注点（保留优先级最高的一个）
+        ranked = sorted(all_markers, key=lambda idx: label_priority(points[idx]))
+        for marker_count in range(len(ranked) - 1, 0, -1):
+            candidate = build(path_points, 0, sorted(ranked[:marker_count]), 4)
+            if fits(candidate):
+                return candidate
+        raise ValueError(f"静态地图请求超出 {settings.map_static_url_max_bytes} 字节限制")
+    
+    async def fetch_static_map(self, params: Dict[str, Any]) -> bytes:
+        return await self._get_image("staticmap", AMAP_STATIC_MAP_URL, {"key": self.api_key, **params})
@@ -0,0 +1,153 @@
+"""百度地图服务商"""
+from app.services.map_providers.base import HttpMapProvider, POIPage
+from app.services.rate_limiter import OutboundLimiter
+from typing import Any, Callable, Dict, List, Optional
+import httpx
+
+
+# 百度表示配额/并发超限的 status
+BAIDU_THROTTLE_STATUSES = {302, 401, 402}
+
+BAIDU_GEOCODE_URL = "https://api.map.baidu.com/geocoding/v3/"
+# 地理编码只匹配到行政区一级，视为未找到
+BAIDU_COARSE_GEOCODE_LEVELS = {"国家", "省", "城市", "区县", "乡镇", "UNKNOWN"}
+
+
+class BaiduProvider(HttpMapProvider):
+    """百度地图 Web 服务API（不支持批量距离测量和静态地图）"""
+    
+    name = "baidu"
+    supports_nearby_search = True
+    # 地理编码每次请求一个地址
+    supports_geocode = True
+    
+    def __init__(self, limiters: Dict[str, OutboundLimiter], client_factory: Callable[[], httpx.AsyncClient],
+                 api_key: str):
+        super().__init__(limiters, client_factory)
+        self.api_key = api_key
+    
+    def _is_throttled(self, data: Dict[str, Any]) -> bool:
+        return data.get("status") in BAIDU_THROTTLE_STATUSES
+    
+    async def search_poi(self, city: str, keyword: str, page: int = 1) -> POIPage:
+        """使用百度地图API搜索POI"""
+        url = "https://api.map.baidu.com/place/v2/search"
+        params = {
+            "ak": self.api_key,
+            "query": keyword,
+            "region": city,
+            "output": "json",
+            "page_size": self.poi_page_size,
+            "page_num": page - 1  # 百度页码从0开始
+        }
+        
+        try:
+            return await self._request_pois(url, params, keyword)
+        except Exception as e:
+            print(f"百度地图POI搜索失败: {e}")
+            return POIPage()
+    
+    async def search_poi_nearby(self, center: Dict[str, float], keyword: str, radius_meters: int,
+                                page: int = 1) -> POIPage:
+        """使用百度地图圆形区域检索"""
+        url = "https://api.map.baidu.com/place/v2/search"
+        params = {
+            "ak": self.api_key,
+            "query": keyword,
+            "location": f"{center['lat']:.6f},{center['lng']:.6f}",
+            "radius": radius_meters,
+            "radius_limit": "true",  # 只返回半径内的结果
+            "output": "json",
+            "page_size": self.poi_page_size,
+            "page_num": page - 1
+        }
+        
+        try:
+            return await self._request_pois(url, params, keyword)
+        except Exception as e:
+            print(f"百度地图周边POI搜索失败: {e}")
+            return POIPage()
+    
+    async def _request_pois(self, url: str, params: Dict[str, Any], keyword: str) -> POIPage:
+        """请求地点检索接口并转换为统一格式，跳过没有坐标的记录"""
+        data = await self._get_json("place", url, params)
+        
+        pois = []
+        raw_pois = (data.get("results") or []) if data.get("status") == 0 else []
+        if raw_pois:
+            for poi in raw_pois:
+                location = poi.get("location", {})
+                if location:
+                    pois.append({
+                        "source_id": f"baidu:{poi['uid']}" if poi.get("uid") else "",
+                        "name": poi.get("name", ""),
+                        "category": keyword,
+                        "lat": location.get("lat", 0),
+                        "lng": location.get("lng", 0),
+                        "description": poi.get("detail_info", {}).get("tag", "")
+                    })
+        return POIPage(pois, raw_count=len(raw_pois))
+    
+    async def geocode(self, city: str, names: List[str]) -> Optional[List[Optional[Dict[str, float]]]]:
+        """使用百度地理编码（每次请求只解析一个地址）"""
+        locations: List[Optional[Dict[str, float]]] = []
+        for name in names:
+            params = {
+                "ak": self.api_key,
+                "address": name,
+                "city": city,
+                "output": "json"
+            }
+            try:
+                data = await self._get_json("place", BAIDU_GEOCODE_URL, params)
+            except Exception as e:
+                print(f"百度地理编码失败: {e}")
+                return None
+            status = data.get("status")
+            if status == 0 and data.get("result"):
+                result = data["result"]
+                location = result.get("location") or {}
+                if location and result.get("level") not in BAIDU_COARSE_GEOCODE_LEVELS:
+                    locations.append({"lat": location["lat"], "lng": location["lng"]})
+                else:
+                    locations.append(None)
+            elif status == 1:
+                # 无相关结果
+                locations.append(None)
+            else:
+                print(f"百度地理编码失败: {data.get('message', '未知错误')}")
+                return None
+        return locations
+    
+    async def get_eta(self, point_a: Dict[str, float], point_b: Dict[str, float],
+                      mode: str) -> Dict[str, Any]:
+        """使用百度地图API获取路线规划"""
+        url = "https://api.map.baidu.com/direction/v2/driving"
+        
+        origin = f"{point_a['lat']},{point_a['lng']}"
+        destination = f"{point_b['lat']},{point_b['lng']}"
+        
+        params = {
+            "ak": self.api_key,
+            "origin": origin,
+            "destination": destination,
+            "tactics": 11,  # 最短时间
+            "output": "json"
+        }
+        
+        try:
+            data = await self._get_json("direction", url, params)
+            
+            if data.get("status") == 0 and data.get("result"):
+                route = data["result"]["routes"][0]
+                duration_seconds = route.get("duration", {}).get("value", 0)
+                distance_meters = route.get("distance", {}).get("value", 0)
+                
+                return {
+                    "duration_minutes": int(duration_seconds / 60),
+                    "distance_meters": int(distance_meters)
+                }
+            return {"duration_minutes": 0, "distance_meters": 0}
+        except Exception as e:
+            print(f"百度地图路线规划失败: {e}")
+            return {"duration_minutes": 0, "distance_meters": 0}
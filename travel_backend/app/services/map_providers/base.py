@@ -0,0 +1,162 @@
+"""地图服务商接口 - POI检索、路线耗时、静态地图"""
+from app.services.rate_limiter import OutboundLimiter
+from app.services.map_providers.streaming_json import StreamingArrayParser
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import httpx
+
+
+class POIPage(list):
+    """
+    一页POI检索结果：列表为转换后的POI，raw_count 为服务商本页返回的原始记录数
+
+    坐标无效等记录在转换时被过滤，是否还有下一页要按 raw_count 判断，不能按过滤后的条数
+    """
+
+    def __init__(self, pois: Iterable[Dict[str, Any]] = (), raw_count: Optional[int] = None):
+        super().__init__(pois)
+        self.raw_count = len(self) if raw_count is None else raw_count
+
+
+class MapProvider(ABC):
+    """
+    地图服务商接口
+
+    - 所有请求都经过 MapService 创建的分类限流器（place / direction / staticmap）
+    - search_poi / search_poi_nearby / get_eta / get_distance 失败时不抛异常，分别返回空列表、空列表、耗时为0、None
+    """
+
+    name = ""
+    # 是否支持多起点一终点的批量距离测量
+    supports_distance_matrix = False
+    # 单次距离测量请求最多的起点数
+    distance_max_origins = 1
+    # 是否支持按中心点和半径的周边检索
+    supports_nearby_search = False
+    # 是否支持地点名称的地理编码，以及单次请求最多的名称数
+    supports_geocode = False
+    geocode_max_batch = 1
+    # POI检索每页记录数，服务商返回的原始记录不足一页说明已是最后一页
+    poi_page_size = 20
+
+    def __init__(self, limiters: Dict[str, OutboundLimiter]):
+        self.limiters = limiters
+
+    @property
+    def supports_static_map(self) -> bool:
+        """是否能生成静态地图图片"""
+        return False
+
+    @abstractmethod
+    async def search_poi(self, city: str, keyword: str, page: int = 1) -> POIPage:
+        """
+        检索单个关键词的一页POI（页码从1开始，每页 poi_page_size 条）
+
+        Returns:
+            POIPage([{"source_id", "name", "category", "lat", "lng", "description"}, ...], raw_count)
+        """
+
+    @abstractmethod
+    async def get_eta(self, point_a: Dict[str, float], point_b: Dict[str, float],
+                      mode: str) -> Dict[str, Any]:
+        """
+        两点间路线耗时
+
+        Returns:
+            {"duration_minutes": int, "distance_meters": int}，失败时均为0
+        """
+
+    async def search_poi_nearby(self, center: Dict[str, float], keyword: str, radius_meters: int,
+                                page: int = 1) -> POIPage:
+        """检索中心点 radius_meters 范围内单个关键词的一页POI，返回格式同 search_poi"""
+        raise NotImplementedError(f"{self.name} 不支持周边检索")
+
+    async def geocode(self, city: str, names: List[str]) -> Optional[List[Optional[Dict[str, float]]]]:
+        """
+        在 city 内解析最多 geocode_max_batch 个地点名称的坐标（一次请求）
+
+        Returns:
+            与 names 等长的 [{"lat", "lng"} 或 None（未找到）, ...]；请求失败时返回 None
+        """
+        raise NotImplementedError(f"{self.name} 不支持地理编码")
+
+    async def get_distance(self, origins: List[Dict[str, float]], destination: Dict[str, float],
+                           mode: str) -> List[Optional[Dict[str, Any]]]:
+        """多个起点到同一终点的耗时（一次请求），失败的起点为 None"""
+        raise NotImplementedError(f"{self.name} 不支持批量距离测量")
+
+    def static_map_params(self, points: List[Dict[str, Any]], zoom: Optional[int],
+                          size: str) -> Dict[str, Any]:
+        """静态地图请求参数（不含密钥），同时用于计算地图内容哈希"""
+        raise NotImplementedError(f"{self.name} 不支持静态地图")
+
+    async def fetch_static_map(self, params: Dict[str, Any]) -> bytes:
+        """获取静态地图图片字节"""
+        raise NotImplementedError(f"{self.name} 不支持静态地图")
+
+
+class HttpMapProvider(MapProvider):
+    """通过 HTTP API 访问的服务商，共用 MapService 的连接池"""
+
+    def __init__(self, limiters: Dict[str, OutboundLimiter], client_factory: Callable[[], httpx.AsyncClient]):
+        super().__init__(limiters)
+        self._client_factory = client_factory
+
+    def _is_throttled(self, data: Dict[str, Any]) -> bool:
+        """响应是否表示限流/配额超限"""
+        return False
+
+    async def _get_json(self, family: str, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        经过限流和熔断的地图API GET请求
+
+        Raises:
+            ProviderUnavailableError: 该类接口熔断中
+        """
+        async with self.limiters[family].slot() as outcome:
+            response = await self._client_factory().get(url, params=params)
+            response.raise_for_status()
+            data = response.json()
+            if self._is_throttled(data):
+                outcome.throttled = True
+            return data
+
+    async def _stream_json_array(self, family: str, url: str, params: Dict[str, Any], array_key: str,
+                                 fields: Iterable[str]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        经过限流和熔断的GET请求，边接收边解析响应中的对象数组，每个元素只保留 fields 中的字段
+
+        Returns:
+            (顶层其他字段, 投影后的数组元素)
+
+        Raises:
+            ProviderUnavailableError: 该类接口熔断中
+        """
+        parser = StreamingArrayParser(array_key, fields)
+        items: List[Dict[str, Any]] = []
+        async with self.limiters[family].slot() as outcome:
+            async with self._client_factory().stream("GET", url, params=params) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    items.extend(parser.feed(chunk))
+            items.extend(parser.close())
+            if self._is_throttled(parser.header):
+                outcome.throttled = True
+        return parser.header, items
+
+    async def _get_image(self, family: str, url: str, params: Dict[str, Any]) -> bytes:
+        """
+        经过限流和熔断的图片GET请求，服务商返回错误JSON而不是图片时抛出异常
+
+        Raises:
+            ProviderUnavailableError: 该类接口熔断中
+        """
+        async with self.limiters[family].slot() as outcome:
+            response = await self._client_factory().get(url, params=params)
+            response.raise_for_status()
+            if response.headers.get("content-type", "").startswith("image/"):
+                return response.content
+            data = response.json()
+            if self._is_throttled(data):
+                outcome.throttled = True
+            raise ValueError(f"静态地图生成失败: {data.get('info', '未知错误')}")
@@ -0,0 +1,278 @@
+"""本地地图服务商 - 使用录制或合成的数据，不访问网络，用于压测和离线开发"""
+from app.services.map_providers.base import MapProvider, POIPage
+from app.services.eta_estimator import ETAEstimator, haversine_meters
+from app.services.map_renderer import map_renderer
+from app.services.rate_limiter import OutboundLimiter
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import math
+import random
+
+
+# 合成数据使用的城市中心（其余城市按名称哈希到国内的一个位置）
+CITY_CENTERS: Dict[str, Tuple[float, float]] = {
+    "北京": (39.9042, 116.4074),
+    "上海": (31.2304, 121.4737),
+    "广州": (23.1291, 113.2644),
+    "深圳": (22.5431, 114.0579),
+    "成都": (30.5728, 104.0668),
+    "杭州": (30.2741, 120.1551),
+    "西安": (34.3416, 108.9398),
+    "重庆": (29.5630, 106.5516),
+    "南京": (32.0603, 118.7969),
+    "武汉": (30.5928, 114.3055),
+    "厦门": (24.4798, 118.0894),
+    "三亚": (18.2528, 109.5119),
+}
+
+# 每个关键词合成的POI总数（按 poi_page_size 分页返回）
+SYNTHETIC_POIS_PER_KEYWORD = 100
+
+
+class SimulatedProviderError(Exception):
+    """错误注入产生的模拟请求失败"""
+
+
+def _stable_seed(*parts: Any) -> int:
+    """由参数得到稳定的随机种子，同样的请求总是得到同样的合成数据"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+class LocalMapProvider(MapProvider):
+    """
+    本地地图服务商
+
+    - POI 与路线优先使用夹具文件中录制的数据，没有命中时按请求参数确定性地合成
+    - 每次请求模拟网络延迟，并按配置的比例注入失败和限流，经过与真实服务商相同的限流器和熔断器
+    - 静态地图由本地渲染器生成
+
+    夹具文件格式（JSON）:
+        {
+          "pois": [{"city": "成都", "keyword": "景点", "results": [{"source_id", "name", "category",
+                                                               "lat", "lng", "description"}, ...]}],
+          "routes": [{"mode": "driving", "from": [lat, lng], "to": [lat, lng],
+                      "duration_minutes": 25, "distance_meters": 8000}]
+        }
+    """
+
+    name = "local"
+    supports_distance_matrix = True
+    supports_nearby_search = True
+    supports_geocode = True
+    geocode_max_batch = 10
+    distance_max_origins = 100
+
+    def __init__(self, limiters: Dict[str, OutboundLimiter], fixture_path: str = "",
+                 latency_ms: float = 50, latency_jitter_ms: float = 20,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 seed: int = 0, coord_precision: int = 3):
+        super().__init__(limiters)
+        self.latency_seconds = max(latency_ms, 0) / 1000
+        self.latency_jitter_seconds = max(latency_jitter_ms, 0) / 1000
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.coord_precision = coord_precision
+        self._random = random.Random(seed)
+        self._estimator = ETAEstimator()
+        self._pois: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._routes: Dict[Tuple[Any, ...], Dict[str, int]] = {}
+        if fixture_path:
+            self.load_fixtures(fixture_path)
+
+    @property
+    def supports_static_map(self) -> bool:
+        return True
+
+    def load_fixtures(self, path: str):
+        """加载录制的 POI 和路线数据"""
+        with open(path, "r", encoding="utf-8") as f:
+            fixtures = json.load(f)
+        for entry in fixtures.get("pois", []):
+            self._pois[(entry["city"], entry["keyword"])] = entry.get("results", [])
+        for route in fixtures.get("routes", []):
+            key = self._route_key(route["from"], route["to"], route["mode"])
+            self._routes[key] = {
+                "duration_minutes": int(route["duration_minutes"]),
+                "distance_meters": int(route.get("distance_meters", 0))
+            }
+        print(f"本地地图服务商已加载夹具: {len(self._pois)} 组POI, {len(self._routes)} 条路线")
+
+    def _route_key(self, point_a: Any, point_b: Any, mode: str) -> Tuple[Any, ...]:
+        if isinstance(point_a, dict):
+            point_a = (point_a["lat"], point_a["lng"])
+        if isinstance(point_b, dict):
+            point_b = (point_b["lat"], point_b["lng"])
+        precision = self.coord_precision
+        return (
+            mode,
+            round(float(point_a[0]), precision), round(float(point_a[1]), precision),
+            round(float(point_b[0]), precision), round(float(point_b[1]), precision)
+        )
+
+    async def _simulate(self, family: str):
+        """
+        占用一个限流名额并模拟一次请求：等待延迟，按比例注入失败或限流
+
+        Raises:
+            ProviderUnavailableError: 该类接口熔断中
+            SimulatedProviderError: 注入的请求失败
+        """
+        async with self.limiters[family].slot() as outcome:
+            jitter = self._random.uniform(-self.latency_jitter_seconds, self.latency_jitter_seconds)
+            await asyncio.sleep(max(0.0, self.latency_seconds + jitter))
+            roll = self._random.random()
+            if roll < self.error_rate:
+                raise SimulatedProviderError(f"模拟 {family} 请求失败")
+            if roll < self.error_rate + self.throttle_rate:
+                outcome.throttled = True
+                raise SimulatedProviderError(f"模拟 {family} 请求被限流")
+
+    @staticmethod
+    def _city_center(city: str) -> Tuple[float, float]:
+        center = CITY_CENTERS.get(city)
+        if center is None:
+            city_rng = random.Random(_stable_seed("city", city))
+            center = (city_rng.uniform(22.0, 40.0), city_rng.uniform(102.0, 121.0))
+        return center
+
+    def _geocode_name(self, city: str, name: str) -> Dict[str, float]:
+        """录制的同名POI（优先同城市），没有时在城市中心约 8 公里范围内确定性地合成"""
+        fallback = None
+        for (recorded_city, _), pois in self._pois.items():
+            for poi in pois:
+                if poi.get("name") == name:
+                    if recorded_city == city:
+                        return {"lat": poi["lat"], "lng": poi["lng"]}
+                    fallback = fallback or {"lat": poi["lat"], "lng": poi["lng"]}
+        if fallback:
+            return fallback
+        rng = random.Random(_stable_seed("geocode", city, name))
+        center = self._city_center(city)
+        radius_km = 8 * math.sqrt(rng.random())
+        angle = rng.uniform(0, 2 * math.pi)
+        return {
+            "lat": round(center[0] + radius_km / 111.0 * math.sin(angle), 6),
+            "lng": round(center[1] + radius_km / (111.0 * math.cos(math.radians(center[0]))) * math.cos(angle), 6)
+        }
+
+    def _synthetic_pois(self, city: str, keyword: str) -> List[Dict[str, Any]]:
+        """以城市中心为圆心，在约 8 公里范围内确定性地生成POI"""
+        rng = random.Random(_stable_seed("poi", city, keyword))
+        center = self._city_center(city)
+        pois = []
+        for idx in range(SYNTHETIC_POIS_PER_KEYWORD):
+            radius_km = 8 * math.sqrt(rng.random())
+            angle = rng.uniform(0, 2 * math.pi)
+            lat = center[0] + radius_km / 111.0 * math.sin(angle)
+            lng = center[1] + radius_km / (111.0 * math.cos(math.radians(center[0]))) * math.cos(angle)
+            pois.append({
+                "source_id": f"local:{_stable_seed(city, keyword, idx):016x}",
+                "name": f"{city}{keyword}{idx + 1}号",
+                "category": keyword,
+                "lat": round(lat, 6),
+                "lng": round(lng, 6),
+                "description": f"{keyword} | 模拟数据"
+            })
+        return pois
+
+    def _nearby_pois(self, center: Dict[str, float], keyword: str, radius_meters: int) -> List[Dict[str, Any]]:
+        """录制的同关键词POI中位于半径内的（按距离排序），没有时在半径内确定性地合成"""
+        recorded = [
+            poi for (_, recorded_keyword), pois in self._pois.items() if recorded_keyword == keyword
+            for poi in pois
+        ]
+        if recorded:
+            distances = haversine_meters(center["lat"], center["lng"],
+                                         [p["lat"] for p in recorded], [p["lng"] for p in recorded])
+            nearby = sorted((float(d), idx) for idx, d in enumerate(distances) if d <= radius_meters)
+            if nearby:
+                return [recorded[idx] for _, idx in nearby]
+        anchor = (round(center["lat"], 3), round(center["lng"], 3))
+        rng = random.Random(_stable_seed("nearby", *anchor, keyword, radius_meters))
+        pois = []
+        for idx in range(SYNTHETIC_POIS_PER_KEYWORD):
+            distance = radius_meters * math.sqrt(rng.random())
+            angle = rng.uniform(0, 2 * math.pi)
+            lat = center["lat"] + distance / 111000.0 * math.sin(angle)
+            lng = center["lng"] + distance / (111000.0 * math.cos(math.radians(center["lat"]))) * math.cos(angle)
+            pois.append({
+                "source_id": f"local:{_stable_seed(*anchor, keyword, radius_meters, idx):016x}",
+                "name": f"{keyword}({anchor[0]},{anchor[1]}){idx + 1}号",
+                "category": keyword,
+                "lat": round(lat, 6),
+                "lng": round(lng, 6),
+                "description": f"{keyword} | 模拟数据"
+            })
+        return pois
+
+    def _route(self, point_a: Dict[str, float], point_b: Dict[str, float], mode: str) -> Dict[str, int]:
+        """录制的路线，没有时按本地估算模型加 ±20% 的确定性扰动合成"""
+        key = self._route_key(point_a, point_b, mode)
+        recorded = self._routes.get(key)
+        if recorded is not None:
+            return dict(recorded)
+        estimate = self._estimator.estimate(point_a, point_b, mode)
+        factor = random.Random(_stable_seed("route", *key)).uniform(0.8, 1.2)
+        return {
+            "duration_minutes": max(1, int(estimate["duration_minutes"] * factor)),
+            "distance_meters": int(estimate["distance_meters"] * factor)
+        }
+
+    async def search_poi(self, city: str, keyword: str, page: int = 1) -> POIPage:
+        try:
+            await self._simulate("place")
+        except Exception as e:
+            print(f"本地地图POI搜索失败: {e}")
+            return POIPage()
+        recorded = self._pois.get((city, keyword))
+        pois = recorded if recorded is not None else self._synthetic_pois(city, keyword)
+        start = (page - 1) * self.poi_page_size
+        return POIPage(dict(poi) for poi in pois[start:start + self.poi_page_size])
+
+    async def search_poi_nearby(self, center: Dict[str, float], keyword: str, radius_meters: int,
+                                page: int = 1) -> POIPage:
+        try:
+            await self._simulate("place")
+        except Exception as e:
+            print(f"本地地图周边POI搜索失败: {e}")
+            return POIPage()
+        pois = self._nearby_pois(center, keyword, radius_meters)
+        start = (page - 1) * self.poi_page_size
+        return POIPage(dict(poi) for poi in pois[start:start + self.poi_page_size])
+
+    async def geocode(self, city: str, names: List[str]) -> Optional[List[Optional[Dict[str, float]]]]:
+        try:
+            await self._simulate("place")
+        except Exception as e:
+            print(f"本地地图地理编码失败: {e}")
+            return None
+        return [self._geocode_name(city, name) for name in names]
+
+    async def get_eta(self, point_a: Dict[str, float], point_b: Dict[str, float],
+                      mode: str) -> Dict[str, Any]:
+        try:
+            await self._simulate("direction")
+        except Exception as e:
+            print(f"本地地图路线规划失败: {e}")
+            return {"duration_minutes": 0, "distance_meters": 0}
+        return self._route(point_a, point_b, mode)
+
+    async def get_distance(self, origins: List[Dict[str, float]], destination: Dict[str, float],
+                           mode: str) -> List[Optional[Dict[str, Any]]]:
+        try:
+            await self._simulate("direction")
+        except Exception as e:
+            print(f"本地地图距离测量失败: {e}")
+            return [None] * len(origins)
+        return [self._route(origin, destination, mode) for origin in origins]
+
+    def static_map_params(self, points: List[Dict[str, Any]], zoom: Optional[int],
+                          size: str) -> Dict[str, Any]:
+        return map_renderer.render_params(points, size)
+
+    async def fetch_static_map(self, params: Dict[str, Any]) -> bytes:
+        await self._simulate("staticmap")
+        return await asyncio.to_thread(map_renderer.render_from_params, params)
@@ -0,0 +1,158 @@
+"""流式 JSON 解析 - 边接收边解析响应中的对象数组，只保留需要的字段"""
+from typing import Any, Dict, Iterable, List, Optional
+import codecs
+import json
+import re
+
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+
+
+class StreamingArrayParser:
+    """
+    解析形如 {"status": "1", ..., "<array_key>": [{...}, {...}], ...} 的响应
+
+    - 数据按块喂入（feed），每解析出数组中的一个完整元素就按 fields 投影后返回，
+      已处理的文本随即丢弃，任何时候只保留一个元素大小的缓冲
+    - 顶层其他成员（status、info、infocode 等）保存在 header 中
+    - 单个 token 的解析交给标准库 C 实现的 raw_decode，不在 Python 中逐字符扫描
+    """
+
+    def __init__(self, array_key: str, fields: Optional[Iterable[str]] = None):
+        self.array_key = array_key
+        self.fields = tuple(fields) if fields is not None else None
+        self.header: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        # start -> object(等待键) -> colon -> value -> comma，进入数组后为 array_item，结束为 done
+        self._state = "start"
+        self._key: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """喂入一块原始字节，返回本块中解析完成的数组元素"""
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(chunk)
+        self._pos = 0
+        return self._parse(final=False)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """数据结束，返回剩余的元素；文档不完整时抛出 ValueError"""
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(b"", final=True)
+        self._pos = 0
+        items = self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("JSON 响应不完整")
+        return items
+
+    def _skip_whitespace(self) -> bool:
+        """跳过空白，返回缓冲区中是否还有字符"""
+        self._pos = _WHITESPACE_RE.match(self._buffer, self._pos).end()
+        return self._pos < len(self._buffer)
+
+    def _decode_value(self, final: bool) -> Any:
+        """
+        解析当前位置的一个 JSON 值，数据不足时返回 _INCOMPLETE
+
+        非最后一块时要求值之后还有字符，避免把被截断的数字（如 "12" 之于 "123"）当成完整的值
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError("JSON 响应格式错误")
+            return _INCOMPLETE
+        if end >= len(self._buffer) and not final:
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def _expect(self, char: str):
+        if self._buffer[self._pos] != char:
+            raise ValueError(f"JSON 响应格式错误: 位置 {self._pos} 处应为 {char!r}")
+        self._pos += 1
+
+    def _project(self, item: Any) -> Any:
+        if self.fields is None or not isinstance(item, dict):
+            return item
+        return {field: item[field] for field in self.fields if field in item}
+
+    def _parse_array_items(self, items: List[Dict[str, Any]], final: bool) -> bool:
+        """连续解析数组元素（热路径，不经过状态机），遇到 "]" 返回 True，数据不足返回 False"""
+        buffer, decode, match_ws = self._buffer, self._decoder.raw_decode, _WHITESPACE_RE.match
+        pos, length = self._pos, len(self._buffer)
+        while True:
+            try:
+                item, end = decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise ValueError("JSON 响应格式错误")
+                self._pos = pos
+                return False
+            sep = match_ws(buffer, end).end()
+            if sep >= length:
+                # 元素后面还没有分隔符：可能被截断（如数字），等待更多数据
+                if final:
+                    raise ValueError("JSON 响应不完整")
+                self._pos = pos
+                return False
+            items.append(self._project(item))
+            if buffer[sep] == ",":
+                pos = match_ws(buffer, sep + 1).end()
+            elif buffer[sep] == "]":
+                self._pos = sep + 1
+                self._state = "comma"
+                return True
+            else:
+                raise ValueError(f"JSON 响应格式错误: 位置 {sep} 处应为 ',' 或 ']'")
+
+    def _parse(self, final: bool) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        while self._state != "done" and self._skip_whitespace():
+            char = self._buffer[self._pos]
+            state = self._state
+            if state == "start":
+                self._expect("{")
+                self._state = "object"
+            elif state == "object":
+                if char == "}":
+                    self._pos += 1
+                    self._state = "done"
+                    continue
+                key = self._decode_value(final)
+                if key is _INCOMPLETE:
+                    break
+                self._key = key
+                self._state = "colon"
+            elif state == "colon":
+                self._expect(":")
+                self._state = "value"
+            elif state == "value":
+                if self._key == self.array_key and char == "[":
+                    self._pos += 1
+                    self._state = "array_item"
+                    continue
+                value = self._decode_value(final)
+                if value is _INCOMPLETE:
+                    break
+                self.header[self._key] = value
+                self._state = "comma"
+            elif state == "comma":
+                if char == ",":
+                    self._pos += 1
+                    self._state = "object"
+                else:
+                    self._expect("}")
+                    self._state = "done"
+            elif state == "array_item":
+                if char == "]":
+                    self._pos += 1
+                    self._state = "comma"
+                    continue
+                if not self._parse_array_items(items, final):
+                    break
+        return items
+
+
+# 数据不足的标记（与合法的 JSON 值 null 区分）
+_INCOMPLETE = object()
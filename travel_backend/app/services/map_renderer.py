@@ -0,0 +1,356 @@
+"""本地静态地图渲染 - 纯 Python 绘制标注点、路线并输出 PNG，不依赖瓦片服务"""
+from config import settings
+from app.data.cache_store import CacheStore
+from app.services.map_geometry import fit_viewport, to_pixel
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import math
+import os
+import struct
+import zlib
+
+try:
+    # 可选：用于光栅化地点名标签的 TrueType 字体（中文需要），未安装时只绘制序号
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = ImageDraw = ImageFont = None
+
+
+Color = Tuple[int, int, int]
+
+BACKGROUND: Color = (0xF2, 0xEF, 0xE9)
+GRID: Color = (0xE2, 0xDE, 0xD6)
+PATH: Color = (0x00, 0x00, 0xFF)
+MARKER: Color = (0xFF, 0x00, 0x00)
+MARKER_BORDER: Color = (0xFF, 0xFF, 0xFF)
+LABEL_TEXT: Color = (0xFF, 0xFF, 0xFF)
+LABEL_BACKGROUND: Color = (0x52, 0x88, 0xD8)
+
+# 地点名标签最多显示的字数（与高德静态地图的标签一致）
+LABEL_MAX_CHARS = 15
+
+# 5x7 点阵字体（0-9、A-Z），用于标注点上的序号
+GLYPHS: Dict[str, Tuple[str, ...]] = {
+    "0": ("01110", "10001", "10011", "10101", "11001", "10001", "01110"),
+    "1": ("00100", "01100", "00100", "00100", "00100", "00100", "01110"),
+    "2": ("01110", "10001", "00001", "00010", "00100", "01000", "11111"),
+    "3": ("11111", "00010", "00100", "00010", "00001", "10001", "01110"),
+    "4": ("00010", "00110", "01010", "10010", "11111", "00010", "00010"),
+    "5": ("11111", "10000", "11110", "00001", "00001", "10001", "01110"),
+    "6": ("00110", "01000", "10000", "11110", "10001", "10001", "01110"),
+    "7": ("11111", "00001", "00010", "00100", "01000", "01000", "01000"),
+    "8": ("01110", "10001", "10001", "01110", "10001", "10001", "01110"),
+    "9": ("01110", "10001", "10001", "01111", "00001", "00010", "01100"),
+    "A": ("01110", "10001", "10001", "11111", "10001", "10001", "10001"),
+    "B": ("11110", "10001", "10001", "11110", "10001", "10001", "11110"),
+    "C": ("01110", "10001", "10000", "10000", "10000", "10001", "01110"),
+    "D": ("11110", "10001", "10001", "10001", "10001", "10001", "11110"),
+    "E": ("11111", "10000", "10000", "11110", "10000", "10000", "11111"),
+    "F": ("11111", "10000", "10000", "11110", "10000", "10000", "10000"),
+    "G": ("01110", "10001", "10000", "10111", "10001", "10001", "01111"),
+    "H": ("10001", "10001", "10001", "11111", "10001", "10001", "10001"),
+    "I": ("01110", "00100", "00100", "00100", "00100", "00100", "01110"),
+    "J": ("00111", "00010", "00010", "00010", "00010", "10010", "01100"),
+    "K": ("10001", "10010", "10100", "11000", "10100", "10010", "10001"),
+    "L": ("10000", "10000", "10000", "10000", "10000", "10000", "11111"),
+    "M": ("10001", "11011", "10101", "10101", "10001", "10001", "10001"),
+    "N": ("10001", "10001", "11001", "10101", "10011", "10001", "10001"),
+    "O": ("01110", "10001", "10001", "10001", "10001", "10001", "01110"),
+    "P": ("11110", "10001", "10001", "11110", "10000", "10000", "10000"),
+    "Q": ("01110", "10001", "10001", "10001", "10101", "10010", "01101"),
+    "R": ("11110", "10001", "10001", "11110", "10100", "10010", "10001"),
+    "S": ("01111", "10000", "10000", "01110", "00001", "00001", "11110"),
+    "T": ("11111", "00100", "00100", "00100", "00100", "00100", "00100"),
+    "U": ("10001", "10001", "10001", "10001", "10001", "10001", "01110"),
+    "V": ("10001", "10001", "10001", "10001", "10001", "01010", "00100"),
+    "W": ("10001", "10001", "10001", "10101", "10101", "10101", "01010"),
+    "X": ("10001", "10001", "01010", "00100", "01010", "10001", "10001"),
+    "Y": ("10001", "10001", "01010", "00100", "00100", "00100", "00100"),
+    "Z": ("11111", "00001", "00010", "00100", "01000", "10000", "11111"),
+}
+
+
+def parse_size(size: str) -> Tuple[int, int]:
+    """解析 "宽度*高度" 格式的尺寸"""
+    width, height = (int(v) for v in size.lower().replace("x", "*").split("*"))
+    return width, height
+
+
+def label_priority(point: Dict[str, Any]) -> Tuple[int, int]:
+    """地点名标签的优先级（越小越优先）：景点 > 酒店 > 其他 > 餐饮，同级停留越久越优先"""
+    activity_type = point.get("activity_type") or ""
+    if activity_type == "Attraction":
+        rank = 0
+    elif activity_type == "Hotel":
+        rank = 1
+    elif activity_type.startswith("Meal"):
+        rank = 3
+    else:
+        rank = 2
+    return rank, -(point.get("duration_minutes") or 0)
+
+
+def label_text(name: str) -> str:
+    """标签内容：超过 LABEL_MAX_CHARS 个字时截断"""
+    return name if len(name) <= LABEL_MAX_CHARS else name[:LABEL_MAX_CHARS - 3] + "..."
+
+
+class Canvas:
+    """RGB 画布，像素保存在一个 bytearray 中，按行整段写入以减少 Python 循环"""
+
+    def __init__(self, width: int, height: int, background: Color):
+        self.width = width
+        self.height = height
+        self.stride = width * 3
+        self.pixels = bytearray(bytes(background) * (width * height))
+
+    def copy(self) -> "Canvas":
+        canvas = Canvas.__new__(Canvas)
+        canvas.width, canvas.height, canvas.stride = self.width, self.height, self.stride
+        canvas.pixels = bytearray(self.pixels)
+        return canvas
+
+    def hline(self, x0: int, x1: int, y: int, color: Color):
+        """水平线段 [x0, x1]"""
+        if y < 0 or y >= self.height:
+            return
+        x0 = max(x0, 0)
+        x1 = min(x1, self.width - 1)
+        if x0 > x1:
+            return
+        start = y * self.stride + x0 * 3
+        self.pixels[start:start + (x1 - x0 + 1) * 3] = bytes(color) * (x1 - x0 + 1)
+
+    def vline(self, x: int, y0: int, y1: int, color: Color):
+        """竖直线段 [y0, y1]"""
+        if x < 0 or x >= self.width:
+            return
+        c = bytes(color)
+        for y in range(max(y0, 0), min(y1, self.height - 1) + 1):
+            start = y * self.stride + x * 3
+            self.pixels[start:start + 3] = c
+
+    def fill_rect(self, x: int, y: int, w: int, h: int, color: Color):
+        for row in range(y, y + h):
+            self.hline(x, x + w - 1, row, color)
+
+    def fill_circle(self, cx: int, cy: int, radius: int, color: Color):
+        for dy in range(-radius, radius + 1):
+            dx = int(math.sqrt(radius * radius - dy * dy))
+            self.hline(cx - dx, cx + dx, cy + dy, color)
+
+    def line(self, x0: float, y0: float, x1: float, y1: float, width: int, color: Color):
+        """粗线段：按行合并连续像素，每段只做一次切片写入"""
+        half = max(width // 2, 0)
+        dx, dy = x1 - x0, y1 - y0
+        if abs(dx) >= abs(dy):
+            # 接近水平：沿 x 步进，同一行的连续像素合并为一段，再上下加粗
+            if x0 > x1:
+                x0, y0, x1, y1 = x1, y1, x0, y0
+            start_x, end_x = int(round(x0)), int(round(x1))
+            slope = (y1 - y0) / (x1 - x0) if x1 != x0 else 0.0
+            run_start = start_x
+            run_y = int(round(y0))
+            for x in range(start_x + 1, end_x + 2):
+                y = int(round(y0 + (x - x0) * slope)) if x <= end_x else None
+                if y != run_y:
+                    for offset in range(-half, half + 1):
+                        self.hline(run_start, x - 1, run_y + offset, color)
+                    run_start, run_y = x, y
+        else:
+            # 接近竖直：沿 y 步进，每行画一段宽度为 width 的水平跨度
+            if y0 > y1:
+                x0, y0, x1, y1 = x1, y1, x0, y0
+            slope = (x1 - x0) / (y1 - y0)
+            for y in range(int(round(y0)), int(round(y1)) + 1):
+                x = int(round(x0 + (y - y0) * slope))
+                self.hline(x - half, x + half, y, color)
+
+    def text(self, x: int, y: int, content: str, scale: int, color: Color):
+        """使用内置点阵字体绘制文字（仅支持 0-9、A-Z）"""
+        for idx, char in enumerate(content.upper()):
+            glyph = GLYPHS.get(char)
+            if glyph is None:
+                continue
+            origin_x = x + idx * 6 * scale
+            for row, bits in enumerate(glyph):
+                for col, bit in enumerate(bits):
+                    if bit == "1":
+                        self.fill_rect(origin_x + col * scale, y + row * scale, scale, scale, color)
+
+    def blend_mask(self, x: int, y: int, width: int, mask: bytes, color: Color):
+        """按 8 位灰度遮罩（每行 width 字节）把颜色混合到画布上，用于抗锯齿文字"""
+        for row in range(len(mask) // width):
+            py = y + row
+            if py < 0 or py >= self.height:
+                continue
+            for col in range(width):
+                alpha = mask[row * width + col]
+                px = x + col
+                if not alpha or px < 0 or px >= self.width:
+                    continue
+                start = py * self.stride + px * 3
+                if alpha == 255:
+                    self.pixels[start:start + 3] = bytes(color)
+                else:
+                    for channel in range(3):
+                        old = self.pixels[start + channel]
+                        self.pixels[start + channel] = old + (color[channel] - old) * alpha // 255
+
+    def to_png(self, compress_level: int = 3) -> bytes:
+        """编码为 PNG（8位 RGB，无滤波）"""
+        raw = b"".join(
+            b"\x00" + bytes(self.pixels[row * self.stride:(row + 1) * self.stride])
+            for row in range(self.height)
+        )
+
+        def chunk(tag: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+        return (
+            b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw, compress_level))
+            + chunk(b"IEND", b"")
+        )
+
+
+class MapRenderer:
+    """
+    静态地图本地渲染器
+    - 按所有点的投影范围自动确定视野，绘制浅色底图和经纬网格、路线折线和带序号（1、2、3…）的标注点
+    - 按优先级最多为 map_static_max_labels 个点绘制地点名标签（需要 Pillow 和 map_label_font_path 指向的字体）
+    - 相同参数的渲染结果缓存为 PNG 字节
+    """
+
+    def __init__(self, cache_entries: int = 256, font_path: str = "", font_size: int = 16):
+        self.cache = CacheStore(namespace="map_png", max_entries=cache_entries, ttl_seconds=86400)
+        self._backgrounds: Dict[Tuple[int, int], Canvas] = {}
+        self.font_path = font_path
+        self.font_size = font_size
+        self._font: Optional[Any] = None
+        self._font_loaded = False
+
+    @property
+    def font(self) -> Optional[Any]:
+        """地点名标签字体（懒加载），Pillow 未安装或字体文件不存在时为 None"""
+        if not self._font_loaded:
+            self._font_loaded = True
+            if ImageFont is None:
+                print("未安装 Pillow，本地地图只绘制序号，不绘制地点名标签")
+            elif not self.font_path or not os.path.exists(self.font_path):
+                print(f"地点名标签字体不存在: {self.font_path or '(未配置)'}，本地地图只绘制序号")
+            else:
+                self._font = ImageFont.truetype(self.font_path, self.font_size)
+        return self._font
+
+    def _background(self, width: int, height: int) -> Canvas:
+        """底图（纯色 + 网格），按尺寸缓存，每次渲染复制一份"""
+        base = self._backgrounds.get((width, height))
+        if base is None:
+            base = Canvas(width, height, BACKGROUND)
+            for offset in range(0, max(width, height), 128):
+                base.hline(0, width - 1, offset, GRID)
+                base.vline(offset, 0, height - 1, GRID)
+            self._backgrounds[(width, height)] = base
+        return base.copy()
+
+    def render_params(self, points: List[Dict[str, Any]], size: str = "1024*1024") -> Dict[str, Any]:
+        """
+        渲染参数：尺寸、坐标、要显示的地点名标签 [[点序号, 标签], ...] 和字体
+
+        参数决定渲染结果，同时用于计算地图内容哈希和渲染缓存键
+        """
+        labels = []
+        if self.font is not None:
+            ranked = sorted(range(len(points)), key=lambda i: label_priority(points[i]))
+            for idx in ranked[:max(0, settings.map_static_max_labels)]:
+                name = (points[idx].get("name") or "").strip()
+                if name:
+                    labels.append([idx, label_text(name)])
+            labels.sort()
+        return {
+            "size": size,
+            "points": [[round(p["lat"], 6), round(p["lng"], 6)] for p in points],
+            "labels": labels,
+            "font": [os.path.basename(self.font_path), self.font_size] if labels else None
+        }
+
+    def render(self, points: List[Dict[str, Any]], size: str = "1024*1024") -> bytes:
+        """
+        渲染一天的路线图
+
+        Args:
+            points: [{"lat": float, "lng": float, "name": str, "activity_type": str,
+                      "duration_minutes": int}, ...]，按游览顺序
+            size: 图片尺寸 "宽度*高度"
+
+        Returns:
+            PNG 图片字节
+        """
+        if not points:
+            raise ValueError("没有有效的坐标点")
+        return self.render_from_params(self.render_params(points, size))
+
+    def render_from_params(self, params: Dict[str, Any]) -> bytes:
+        """按 render_params 的结果渲染"""
+        if not params["points"]:
+            raise ValueError("没有有效的坐标点")
+        key = hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        cached, _ = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        width, height = parse_size(params["size"])
+        canvas = self._background(width, height)
+
+        points = [{"lat": lat, "lng": lng} for lat, lng in params["points"]]
+        center_lat, center_lng, zoom = fit_viewport(points, width, height, padding=64, max_zoom=16)
+        pixels = [to_pixel(p["lat"], p["lng"], center_lat, center_lng, zoom, width, height) for p in points]
+
+        for (x0, y0), (x1, y1) in zip(pixels, pixels[1:]):
+            canvas.line(x0, y0, x1, y1, width=3, color=PATH)
+
+        # 先画标签再画标注点，标签不会盖住其他点的序号
+        radius = 14
+        labels = params.get("labels") or []
+        if labels and self.font is not None:
+            for idx, content in labels:
+                x, y = pixels[idx]
+                self._draw_label(canvas, int(round(x)), int(round(y)), radius, content)
+
+        for idx, (x, y) in enumerate(pixels):
+            cx, cy = int(round(x)), int(round(y))
+            canvas.fill_circle(cx, cy, radius + 2, MARKER_BORDER)
+            canvas.fill_circle(cx, cy, radius, MARKER)
+            # 序号从 1 开始，三位数时缩小字号，保证每个点的序号都不同
+            number = str(idx + 1)
+            scale = 2 if len(number) <= 2 else 1
+            text_width = len(number) * 6 * scale - scale
+            canvas.text(cx - text_width // 2, cy - 7 * scale // 2, number, scale, LABEL_TEXT)
+
+        png = canvas.to_png()
+        self.cache.set(key, png)
+        return png
+
+    def _draw_label(self, canvas: Canvas, cx: int, cy: int, radius: int, content: str):
+        """在标注点右侧（超出画布时放在左侧）绘制蓝底白字的地点名标签"""
+        left, top, right, bottom = self.font.getbbox(content)
+        text_w, text_h = max(right - left, 1), max(bottom - top, 1)
+        mask_image = Image.new("L", (text_w, text_h), 0)
+        ImageDraw.Draw(mask_image).text((-left, -top), content, font=self.font, fill=255)
+
+        pad = 4
+        box_w, box_h = text_w + 2 * pad, text_h + 2 * pad
+        x = cx + radius + 4
+        if x + box_w > canvas.width:
+            x = cx - radius - 4 - box_w
+        y = cy - box_h // 2
+        canvas.fill_rect(x, y, box_w, box_h, LABEL_BACKGROUND)
+        canvas.blend_mask(x + pad, y + pad, text_w, mask_image.tobytes(), LABEL_TEXT)
+
+
+# 全局渲染器实例
+map_renderer = MapRenderer(font_path=settings.map_label_font_path)
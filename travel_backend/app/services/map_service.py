@@ -1,20 +1,166 @@
 """地图服务 - POI检索和路线规划"""
 from config import settings
+from app.data.cache_store import CacheStore
+from app.models.map_models import DistanceMatrix
+from app.services.eta_estimator import ETAEstimator
+from app.services.poi_registry import POIRegistry
+from app.services.singleflight import singleflight, normalize_key
+from app.services.rate_limiter import OutboundLimiter
+from app.services.map_renderer import map_renderer
+from app.services.map_geometry import cluster_centers
+from app.services.map_providers import MapProvider, POIPage, create_provider
+from app.data.map_image_store import map_image_store, compute_map_hash
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Awaitable, Callable, Optional, Tuple
+import asyncio
 import json
+import math
+import time
+
+
+# 每个行程都会检索的基础关键词
+BASE_POI_KEYWORDS = ["景点", "餐厅", "连锁酒店"]
+
+# 关键词的检索深度权重：每天都要安排多个的类别随行程天数翻页，住宿只需要一页
+# 未列出的关键词（LLM 从偏好中提取的）按 DEFAULT_POI_PAGE_WEIGHT 计
+POI_KEYWORD_PAGE_WEIGHTS = {"景点": 1.0, "餐厅": 1.0, "连锁酒店": 0.0}
+DEFAULT_POI_PAGE_WEIGHT = 0.5
+
+# 锚点模式下仍全城检索、并据其结果聚类出锚点的关键词
+ANCHOR_POI_KEYWORDS = ["景点"]
+# 锚点模式下围绕所有景点的中心检索（只住一处）的关键词，其余关键词围绕每个锚点检索
+HOTEL_POI_KEYWORDS = {"连锁酒店", "酒店"}
 
 
 class MapService:
-    """地图服务类，支持高德和百度地图API"""
+    """地图服务类，具体请求由服务商实现（高德、百度、本地夹具），缓存、限流和降级在这一层统一处理"""
     
     def __init__(self):
         self.api_type = settings.map_api_type
-        self.amap_key = settings.amap_api_key
-        self.baidu_key = settings.baidu_api_key
+        # 所有地图API请求共用一个长连接池，避免每次请求重新握手
+        self._client: Optional[httpx.AsyncClient] = None
+        # POI缓存，键为 (服务商, 城市, 关键词)，第2页起为 (服务商, 城市, 关键词, 页码)，切换服务商不会命中其他服务商的数据
+        self.poi_cache = CacheStore(
+            namespace="poi",
+            max_entries=settings.poi_cache_max_entries,
+            ttl_seconds=settings.poi_cache_ttl_seconds,
+            stale_seconds=settings.poi_cache_stale_seconds,
+            db_path=settings.map_cache_db_path
+        )
+        self._poi_refresh_tasks: Dict[Tuple[Any, ...], asyncio.Task] = {}
+        # 周边检索缓存，键为 (服务商, 中心纬度, 中心经度, 关键词, 半径)，中心坐标保留3位小数
+        self.nearby_poi_cache = CacheStore(
+            namespace="poi_nearby",
+            max_entries=settings.poi_cache_max_entries,
+            ttl_seconds=settings.poi_cache_ttl_seconds,
+            db_path=settings.map_cache_db_path
+        )
+        # LLM 从用户偏好中提取的关键词使用次数，供预热任务挑选常用关键词
+        self.keyword_usage = CacheStore(
+            namespace="poi_keyword_usage",
+            max_entries=5000,
+            ttl_seconds=settings.poi_keyword_usage_ttl_seconds,
+            db_path=settings.map_cache_db_path
+        )
+        # 地点名称坐标缓存，键为 (服务商, 城市, 名称)，值为 {"lat", "lng"}，未找到的名称记为 {}
+        self.geocode_cache = CacheStore(
+            namespace="geocode",
+            max_entries=settings.geocode_cache_max_entries,
+            ttl_seconds=settings.geocode_cache_ttl_seconds,
+            db_path=settings.map_cache_db_path
+        )
+        # 路线耗时缓存，键为 (服务商, 交通方式, 量化后的起点, 量化后的终点)
+        self.eta_cache = CacheStore(
+            namespace="eta",
+            max_entries=settings.eta_cache_max_entries,
+            ttl_seconds=settings.eta_cache_ttl_seconds,
+            db_path=settings.map_cache_db_path
+        )
+        # 本地耗时估算：短距离路段直接估算，地图API失败时兜底
+        self.eta_estimator = ETAEstimator()
+        self._observed_since_calibration = 0
+        # 按接口类别限流：POI检索、路线规划、静态地图
+        self.limiters = {
+            family: OutboundLimiter(
+                name=family,
+                qps=qps,
+                max_concurrency=settings.map_limiter_max_concurrency,
+                latency_target_seconds=settings.map_limiter_latency_target_ms / 1000,
+                failure_threshold=settings.map_breaker_failure_threshold,
+                reset_seconds=settings.map_breaker_reset_seconds
+            )
+            for family, qps in (
+                ("place", settings.map_place_qps),
+                ("direction", settings.map_direction_qps),
+                ("staticmap", settings.map_staticmap_qps)
+            )
+        }
+        self.provider: MapProvider = create_provider(self.api_type, self.limiters, self._get_client)
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取共享的 HTTP 客户端（懒加载）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=settings.map_http_timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=settings.map_http_max_connections,
+                    max_keepalive_connections=settings.map_http_max_keepalive
+                )
+            )
+        return self._client
+    
+    def is_degraded(self, family: str) -> bool:
+        """该类接口是否处于熔断状态"""
+        return self.limiters[family].breaker.is_open()
+    
+    async def aclose(self):
+        """关闭共享连接池（应用关闭时调用）"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self.poi_cache.close()
+        self.nearby_poi_cache.close()
+        self.geocode_cache.close()
+        self.eta_cache.close()
+        self.keyword_usage.close()
+    
+    def calibrate_eta_estimator(self) -> Dict[str, Dict[str, float]]:
+        """用缓存中的真实路线耗时校准本地估算参数"""
+        for cache_key, eta in self.eta_cache.items():
+            try:
+                provider, mode, lat_a, lng_a, lat_b, lng_b = json.loads(cache_key)
+            except (ValueError, TypeError):
+                continue
+            if provider == self.api_type:
+                self.eta_estimator.observe({"lat": lat_a, "lng": lng_a}, {"lat": lat_b, "lng": lng_b}, mode, eta)
+        return self.eta_estimator.calibrate()
+    
+    def _record_real_eta(self, point_a: Dict[str, float], point_b: Dict[str, float], mode: str,
+                         eta: Dict[str, Any]):
+        """记录地图API返回的真实耗时：写入缓存并积累估算器的校准样本"""
+        self.eta_cache.set(self._eta_cache_key(point_a, point_b, mode), eta)
+        self.eta_estimator.observe(point_a, point_b, mode, eta)
+        self._observed_since_calibration += 1
+        if self._observed_since_calibration >= settings.eta_estimator_calibrate_every:
+            self._observed_since_calibration = 0
+            self.eta_estimator.calibrate()
+    
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各缓存的命中统计"""
+        return {
+            "poi": self.poi_cache.get_stats(),
+            "poi_nearby": self.nearby_poi_cache.get_stats(),
+            "geocode": self.geocode_cache.get_stats(),
+            "eta": self.eta_cache.get_stats()
+        }
+    
+    def get_limiter_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各类接口的限流、并发上限和熔断状态"""
+        return {family: limiter.get_stats() for family, limiter in self.limiters.items()}
     
     async def search_poi(self, destination: str, preference: str = "", 
-                        keywords: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+                        keywords: Optional[List[str]] = None, days: int = 1,
+                        transport_profile: str = "transit") -> List[Dict[str, Any]]:
         """
         搜索POI（兴趣点）
         
@@ -22,113 +168,296 @@ class MapService:
             destination: 目的地城市
             preference: 用户偏好描述
             keywords: 搜索关键词列表（如：["景点", "餐厅", "酒店"]）
+            days: 行程天数，决定每个关键词检索的页数（见 poi_page_count）和锚点数
+            transport_profile: 主要交通方式 walking/transit/driving，锚点模式下决定周边检索半径
         
         Returns:
-            POI列表，每个POI包含：id, name, category, lat, lng, description
+            POI列表，每个POI包含：id, source_id, name, category, lat, lng, description
+            id 由服务商ID生成，跨关键词、跨请求稳定且不重复
         """
         if keywords is None:
             keywords = ["景点", "餐厅", "酒店"]
         
-        all_pois = []
+        async def search_city(keyword: str) -> List[Dict[str, Any]]:
+            return await self._search_poi_keyword_pages(destination, keyword, self.poi_page_count(keyword, days))
+        
+        by_keyword: Dict[str, List[Dict[str, Any]]] = {}
+        anchors: List[Dict[str, float]] = []
+        if settings.map_poi_anchor_mode and self.provider.supports_nearby_search:
+            # 锚点模式：先全城检索景点，按天数聚类出锚点
+            anchor_keywords = [k for k in keywords if k in ANCHOR_POI_KEYWORDS]
+            by_keyword.update(zip(anchor_keywords, await self._gather_keywords(anchor_keywords, search_city)))
+            anchor_pois = [poi for k in anchor_keywords for poi in by_keyword[k]]
+            anchors = cluster_centers(anchor_pois, min(max(1, days), max(1, settings.map_poi_max_anchors)))
+        
+        if anchors:
+            # 其余关键词改为锚点周边检索：酒店围绕所有景点的中心，其余围绕每个锚点
+            hotel_anchor = cluster_centers(anchor_pois, 1)
+            radius = self.nearby_radius(transport_profile)
+            
+            async def search_nearby(keyword: str) -> List[Dict[str, Any]]:
+                centers = hotel_anchor if keyword in HOTEL_POI_KEYWORDS else anchors
+                results = await asyncio.gather(*(self._search_poi_nearby(c, keyword, radius) for c in centers))
+                return [poi for pois in results for poi in pois]
+            
+            rest = [k for k in keywords if k not in by_keyword]
+            by_keyword.update(zip(rest, await self._gather_keywords(rest, search_nearby)))
+            results = [by_keyword[k] for k in keywords]
+        else:
+            # 未开启锚点模式、服务商不支持周边检索或景点无结果时，全部全城检索
+            results = await self._gather_keywords(keywords, search_city)
         
-        for keyword in keywords:
-            if self.api_type == "amap":
-                pois = await self._search_poi_amap(destination, keyword)
-            else:
-                pois = await self._search_poi_baidu(destination, keyword)
+        all_pois = []
+        for pois in results:
             all_pois.extend(pois)
         
         # 去重（基于名称和坐标）
         unique_pois = []
         seen = set()
         for poi in all_pois:
-            key = (poi["name"], round(poi["lat"], 4), round(poi["lng"], 4))
+            key = self._poi_dedupe_key(poi)
             if key not in seen:
                 seen.add(key)
                 unique_pois.append(poi)
         
-        return unique_pois
-    
-    async def _search_poi_amap(self, city: str, keyword: str) -> List[Dict[str, Any]]:
-        """使用高德地图API搜索POI"""
-        url = "https://restapi.amap.com/v3/place/text"
-        params = {
-            "key": self.amap_key,
-            "keywords": keyword,
-            "city": city,
-            "output": "json",
-            "offset": 20,  # 每页记录数
-            "page": 1,
-            "extensions": "all"
+        return POIRegistry.assign_ids(unique_pois)
+    
+    async def _gather_keywords(self, keywords: List[str],
+                               search: Callable[[str], Awaitable[List[Dict[str, Any]]]]) -> List[List[Dict[str, Any]]]:
+        """按关键词检索，返回与 keywords 顺序一致的结果"""
+        if settings.map_poi_concurrent_search and len(keywords) > 1:
+            # 并发检索所有关键词，gather 按关键词顺序返回，合并顺序与串行一致
+            semaphore = asyncio.Semaphore(max(1, settings.map_poi_search_concurrency))
+            
+            async def search_with_limit(keyword: str) -> List[Dict[str, Any]]:
+                async with semaphore:
+                    return await search(keyword)
+            
+            return list(await asyncio.gather(*(search_with_limit(k) for k in keywords)))
+        return [await search(k) for k in keywords]
+    
+    @staticmethod
+    def nearby_radius(transport_profile: str) -> int:
+        """周边检索半径（米），未知交通方式按公共交通"""
+        radius = {
+            "walking": settings.map_poi_nearby_radius_walking,
+            "transit": settings.map_poi_nearby_radius_transit,
+            "driving": settings.map_poi_nearby_radius_driving
         }
+        return radius.get(transport_profile, settings.map_poi_nearby_radius_transit)
+    
+    async def _search_poi_nearby(self, center: Dict[str, float], keyword: str,
+                                 radius: int) -> List[Dict[str, Any]]:
+        """锚点周边检索一页（优先读缓存，请求失败或熔断时退回已过期的缓存）"""
+        center = {"lat": round(center["lat"], 3), "lng": round(center["lng"], 3)}
+        cache_key = (self.api_type, center["lat"], center["lng"], keyword, radius)
+        cached, _ = await self.nearby_poi_cache.aget(cache_key)
+        if cached is None:
+            if not self.is_degraded("place"):
+                cached = await singleflight.do(
+                    normalize_key("map.poi_nearby", *cache_key),
+                    lambda: self._fetch_poi_nearby(cache_key, center, keyword, radius)
+                )
+            if not cached:
+                cached, _ = await self.nearby_poi_cache.aget(cache_key, allow_expired=True)
+                cached = cached or []
+        return [dict(poi) for poi in cached]
+    
+    async def _fetch_poi_nearby(self, cache_key: Tuple[Any, ...], center: Dict[str, float], keyword: str,
+                                radius: int) -> List[Dict[str, Any]]:
+        pois = await self.provider.search_poi_nearby(center, keyword, radius)
+        # 空结果可能是请求失败，不缓存
+        if pois:
+            self.nearby_poi_cache.set(cache_key, pois)
+        return pois
+    
+    @staticmethod
+    def poi_page_count(keyword: str, days: int) -> int:
+        """
+        单个关键词检索的页数：按行程天数和关键词权重线性增加，至少1页，最多 MAP_POI_MAX_PAGES 页
         
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                pois = []
-                if data.get("status") == "1" and data.get("pois"):
-                    for idx, poi in enumerate(data["pois"], 1):
-                        location = poi.get("location", "").split(",")
-                        if len(location) == 2:
-                            poi_id = f"P{idx:03d}"
-                            # 处理 type 字段，可能是字符串或列表
-                            poi_type = poi.get("type", "")
-                            if isinstance(poi_type, list):
-                                poi_type = ", ".join(poi_type)
-                            poi_address = poi.get("address", "")
-                            description = f"{poi_type} | {poi_address}" if poi_type else poi_address
-                            
-                            pois.append({
-                                "id": poi_id,
-                                "name": poi.get("name", ""),
-                                "category": keyword,
-                                "lat": float(location[1]),
-                                "lng": float(location[0]),
-                                "description": description
-                            })
-                return pois
-        except Exception as e:
-            print(f"高德地图POI搜索失败: {e}")
-            return []
-    
-    async def _search_poi_baidu(self, city: str, keyword: str) -> List[Dict[str, Any]]:
-        """使用百度地图API搜索POI"""
-        url = "https://api.map.baidu.com/place/v2/search"
-        params = {
-            "ak": self.baidu_key,
-            "query": keyword,
-            "region": city,
-            "output": "json",
-            "page_size": 20
-        }
+        默认配置下景点、餐厅 1-2 天1页、3-4 天2页、7 天4页；提取的关键词减半；连锁酒店始终1页
+        """
+        weight = POI_KEYWORD_PAGE_WEIGHTS.get(keyword, DEFAULT_POI_PAGE_WEIGHT)
+        pages = math.ceil(max(1, days) * weight / max(1, settings.map_poi_days_per_page))
+        return min(max(1, pages), max(1, settings.map_poi_max_pages))
+    
+    @staticmethod
+    def _poi_dedupe_key(poi: Dict[str, Any]) -> Tuple[str, float, float]:
+        """POI去重键（名称和坐标）"""
+        return (poi["name"], round(poi["lat"], 4), round(poi["lng"], 4))
+    
+    async def _search_poi_keyword_pages(self, city: str, keyword: str, pages: int) -> List[Dict[str, Any]]:
+        """
+        检索单个关键词的前 pages 页
+        
+        第1页单独请求（通常命中缓存），之后每批并发请求 MAP_POI_PAGE_CONCURRENCY 页；
+        某页服务商返回的原始记录不足一页（含没有结果），或全部与前面的页重复时，不再请求后面的页。
+        按原始记录数而不是过滤掉无效坐标后的条数判断，满页中有无效记录时仍继续翻页
+        """
+        first_page = await self._search_poi_keyword(city, keyword)
+        results = list(first_page)
+        if pages <= 1 or first_page.raw_count < self.provider.poi_page_size:
+            return results
+        seen = {self._poi_dedupe_key(poi) for poi in results}
+        batch_size = max(1, settings.map_poi_page_concurrency)
+        page = 2
+        while page <= pages:
+            batch = list(range(page, min(pages, page + batch_size - 1) + 1))
+            batch_results = await asyncio.gather(
+                *(self._search_poi_keyword(city, keyword, p) for p in batch))
+            for page_pois in batch_results:
+                new_pois = [poi for poi in page_pois if self._poi_dedupe_key(poi) not in seen]
+                seen.update(self._poi_dedupe_key(poi) for poi in new_pois)
+                results.extend(new_pois)
+                if page_pois.raw_count < self.provider.poi_page_size or (page_pois and not new_pois):
+                    return results
+            page += len(batch)
+        return results
+    
+    def _poi_cache_key(self, city: str, keyword: str, page: int = 1) -> Tuple[Any, ...]:
+        """第1页沿用 (服务商, 城市, 关键词)，与预热任务和已有缓存兼容"""
+        if page == 1:
+            return (self.api_type, city, keyword)
+        return (self.api_type, city, keyword, page)
+    
+    @staticmethod
+    def _poi_page_from_cache(cached: Any) -> POIPage:
+        """
+        POI缓存值 {"pois": [...], "raw_count": n} 转为 POIPage（副本，避免调用方修改缓存）
+        
+        旧格式的缓存值是POI列表，原始记录数按列表长度计
+        """
+        if isinstance(cached, dict):
+            return POIPage((dict(poi) for poi in cached["pois"]), cached.get("raw_count"))
+        return POIPage(dict(poi) for poi in cached or [])
+    
+    async def _search_poi_keyword(self, city: str, keyword: str, page: int = 1) -> POIPage:
+        """检索单个关键词的一页（优先读缓存，过期数据先返回并在后台刷新）"""
+        cache_key = self._poi_cache_key(city, keyword, page)
+        cached, is_stale = await self.poi_cache.aget(cache_key)
+        if cached is not None:
+            if is_stale and not self.is_degraded("place"):
+                self._schedule_poi_refresh(city, keyword, page)
+            return self._poi_page_from_cache(cached)
+        if not self.is_degraded("place"):
+            # 相同的并发检索只请求一次
+            fetched = await singleflight.do(
+                normalize_key("map.poi", *cache_key),
+                lambda: self._fetch_poi_keyword(city, keyword, page)
+            )
+            if fetched:
+                # 返回副本，避免修改其他请求共享的结果
+                return POIPage((dict(poi) for poi in fetched), fetched.raw_count)
+        # 请求失败或服务商熔断中：退回已过期的缓存（没有则返回空）
+        cached, _ = await self.poi_cache.aget(cache_key, allow_expired=True)
+        return self._poi_page_from_cache(cached)
+    
+    async def _fetch_poi_keyword(self, city: str, keyword: str, page: int = 1) -> POIPage:
+        """按当前地图服务商检索单个关键词的一页并写入缓存（连同原始记录数，用于判断是否还有下一页）"""
+        pois = await self.provider.search_poi(city, keyword, page)
+        # 空结果可能是请求失败，不缓存
+        if pois:
+            self.poi_cache.set(self._poi_cache_key(city, keyword, page),
+                               {"pois": list(pois), "raw_count": pois.raw_count})
+        return pois
+    
+    async def prefetch_poi(self, city: str, keyword: str, force: bool = False) -> Tuple[str, int]:
+        """
+        预热单个关键词的POI缓存
+        
+        Args:
+            force: 缓存仍新鲜时也重新检索
+        
+        Returns:
+            (状态, POI数量)，状态为 "cached"（缓存新鲜，未请求）、"fetched"、"empty"（无结果或请求失败）
+        """
+        cached, is_stale = await self.poi_cache.aget((self.api_type, city, keyword))
+        if cached is not None and not is_stale and not force:
+            return "cached", len(self._poi_page_from_cache(cached))
+        pois = await singleflight.do(
+            normalize_key("map.poi", self.api_type, city, keyword),
+            lambda: self._fetch_poi_keyword(city, keyword)
+        )
+        return ("fetched" if pois else "empty"), len(pois)
+    
+    async def geocode_batch(self, city: str, names: List[str]) -> Dict[str, Optional[Dict[str, float]]]:
+        """
+        批量解析城市内地点名称（商圈、美食街等未匹配到POI的活动）的坐标
+        
+        结果按 (服务商, 城市, 名称) 持久缓存，未找到的名称也会缓存，同一名称不会重复请求；
+        未缓存的名称按服务商的批量上限分批并发请求
+        
+        Returns:
+            {名称: {"lat", "lng"} 或 None（未找到、请求失败或服务商不支持）}
+        """
+        results: Dict[str, Optional[Dict[str, float]]] = {}
+        pending: List[str] = []
+        for name in names:
+            name = (name or "").strip()
+            if not name or name in results or name in pending:
+                continue
+            cached, _ = await self.geocode_cache.aget((self.api_type, city, name))
+            if cached is not None:
+                results[name] = dict(cached) if cached else None
+            else:
+                pending.append(name)
+        
+        if pending and self.provider.supports_geocode and not self.is_degraded("place"):
+            batch_size = max(1, self.provider.geocode_max_batch)
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            outcomes = await asyncio.gather(*(self.provider.geocode(city, batch) for batch in batches))
+            for batch, locations in zip(batches, outcomes):
+                # 请求失败的批次不缓存，下次重试
+                if locations is None:
+                    continue
+                for name, location in zip(batch, locations):
+                    self.geocode_cache.set((self.api_type, city, name), location or {})
+                    results[name] = location
+        
+        for name in pending:
+            results.setdefault(name, None)
+        return results
+    
+    @staticmethod
+    def _decayed_keyword_usage(value: Any, now: float) -> float:
+        """按半衰期衰减到 now 的关键词使用次数（旧版本记录的整数次数视为刚刚更新）"""
+        if not isinstance(value, dict):
+            return float(value or 0)
+        elapsed = max(0.0, now - value.get("updated_at", now))
+        return value.get("count", 0.0) * 0.5 ** (elapsed / settings.poi_keyword_usage_half_life_seconds)
+    
+    async def record_keyword_usage(self, keywords: List[str]):
+        """
+        记录一次行程生成中使用的提取关键词
         
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                pois = []
-                if data.get("status") == 0 and data.get("results"):
-                    for idx, poi in enumerate(data["results"], 1):
-                        location = poi.get("location", {})
-                        if location:
-                            poi_id = f"P{idx:03d}"
-                            pois.append({
-                                "id": poi_id,
-                                "name": poi.get("name", ""),
-                                "category": keyword,
-                                "lat": location.get("lat", 0),
-                                "lng": location.get("lng", 0),
-                                "description": poi.get("detail_info", {}).get("tag", "")
-                            })
-                return pois
-        except Exception as e:
-            print(f"百度地图POI搜索失败: {e}")
-            return []
+        次数按 poi_keyword_usage_half_life_seconds 指数衰减后再加一，近期使用的关键词权重更高；
+        超过 poi_keyword_usage_ttl_seconds 未使用的关键词由缓存过期淘汰
+        """
+        now = time.time()
+        for keyword in keywords:
+            value, _ = await self.keyword_usage.aget(keyword)
+            count = self._decayed_keyword_usage(value, now) + 1
+            self.keyword_usage.set(keyword, {"count": count, "updated_at": now})
+    
+    def top_keywords(self, limit: int) -> List[Tuple[str, float]]:
+        """最近最常用的提取关键词 [(关键词, 衰减后的次数), ...]"""
+        now = time.time()
+        usage = [
+            (key, round(self._decayed_keyword_usage(value, now), 2))
+            for key, value in self.keyword_usage.items()
+        ]
+        usage.sort(key=lambda item: item[1], reverse=True)
+        return usage[:limit]
+    
+    def _schedule_poi_refresh(self, city: str, keyword: str, page: int = 1):
+        """后台刷新过期的POI缓存（同一个键同时只刷新一次）"""
+        refresh_key = self._poi_cache_key(city, keyword, page)
+        if refresh_key in self._poi_refresh_tasks:
+            return
+        task = asyncio.create_task(self._fetch_poi_keyword(city, keyword, page))
+        self._poi_refresh_tasks[refresh_key] = task
+        task.add_done_callback(lambda _: self._poi_refresh_tasks.pop(refresh_key, None))
     
     async def get_eta(self, point_a: Dict[str, float], point_b: Dict[str, float], 
                      mode: str = "driving") -> Dict[str, Any]:
@@ -141,141 +470,179 @@ class MapService:
             mode: 交通方式 driving/walking/transit
         
         Returns:
-            {"duration_minutes": int, "distance_meters": int}
+            {"duration_minutes": int, "distance_meters": int}，本地估算的结果额外带 "estimated": True
         """
-        if self.api_type == "amap":
-            return await self._get_eta_amap(point_a, point_b, mode)
-        else:
-            return await self._get_eta_baidu(point_a, point_b, mode)
-    
-    async def _get_eta_amap(self, point_a: Dict[str, float], point_b: Dict[str, float],
-                           mode: str) -> Dict[str, Any]:
-        """使用高德地图API获取路线规划"""
-        # 根据交通方式选择不同的API端点
-        mode_map = {
-            "driving": "driving",
-            "walking": "walking",
-            "transit": "transit"
-        }
-        amap_mode = mode_map.get(mode, "driving")
-        
-        # 构建正确的API URL
-        url = f"https://restapi.amap.com/v3/direction/{amap_mode}"
-        
-        origin = f"{point_a['lng']},{point_a['lat']}"
-        destination = f"{point_b['lng']},{point_b['lat']}"
-        
-        params = {
-            "key": self.amap_key,
-            "origin": origin,
-            "destination": destination,
-            "output": "json"
-        }
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                if data.get("status") == "1" and data.get("route"):
-                    route = data["route"]
-                    
-                    # 根据不同交通方式，数据结构不同
-                    if amap_mode == "transit":
-                        # 公交路线：返回 transits 数组
-                        transits = route.get("transits", [])
-                        if not transits:
-                            return {"duration_minutes": 0, "distance_meters": 0}
-                        transit = transits[0]
-                        duration_seconds = transit.get("duration", 0)
-                        distance_meters = transit.get("distance", 0)
-                    else:
-                        # 步行和驾车：返回 paths 数组
-                        paths = route.get("paths", [])
-                        if not paths:
-                            return {"duration_minutes": 0, "distance_meters": 0}
-                        path = paths[0]
-                        duration_seconds = path.get("duration", 0)
-                        distance_meters = path.get("distance", 0)
-                    
-                    # 转换为数字（如果是字符串则先转浮点数再转整数）
-                    try:
-                        duration_seconds = float(duration_seconds) if duration_seconds else 0
-                        distance_meters = float(distance_meters) if distance_meters else 0
-                    except (ValueError, TypeError) as e:
-                        print(f"高德地图路线规划数据转换失败: {e}, duration={duration_seconds}, distance={distance_meters}")
-                        duration_seconds = 0
-                        distance_meters = 0
-                    
-                    return {
-                        "duration_minutes": int(duration_seconds / 60) if duration_seconds > 0 else 0,
-                        "distance_meters": int(distance_meters) if distance_meters > 0 else 0
-                    }
-                else:
-                    # API返回错误，记录详细信息
-                    print(f"高德地图路线规划API返回错误: status={data.get('status')}, info={data.get('info', '')}")
-                return {"duration_minutes": 0, "distance_meters": 0}
-        except Exception as e:
-            print(f"高德地图路线规划失败: {e}")
-            return {"duration_minutes": 0, "distance_meters": 0}
-    
-    async def _get_eta_baidu(self, point_a: Dict[str, float], point_b: Dict[str, float],
-                            mode: str) -> Dict[str, Any]:
-        """使用百度地图API获取路线规划"""
-        url = "https://api.map.baidu.com/direction/v2/driving"
-        
-        origin = f"{point_a['lat']},{point_a['lng']}"
-        destination = f"{point_b['lat']},{point_b['lng']}"
-        
-        params = {
-            "ak": self.baidu_key,
-            "origin": origin,
-            "destination": destination,
-            "tactics": 11,  # 最短时间
-            "output": "json"
-        }
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                if data.get("status") == 0 and data.get("result"):
-                    route = data["result"]["routes"][0]
-                    duration_seconds = route.get("duration", {}).get("value", 0)
-                    distance_meters = route.get("distance", {}).get("value", 0)
-                    
-                    return {
-                        "duration_minutes": int(duration_seconds / 60),
-                        "distance_meters": int(distance_meters)
-                    }
-                return {"duration_minutes": 0, "distance_meters": 0}
-        except Exception as e:
-            print(f"百度地图路线规划失败: {e}")
-            return {"duration_minutes": 0, "distance_meters": 0}
-    
-    async def generate_static_map(self, activities: List[Dict[str, Any]], 
-                                 zoom: int = 13, size: str = "1024*1024") -> str:
+        cache_key = self._eta_cache_key(point_a, point_b, mode)
+        cached, _ = await self.eta_cache.aget(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        # 距离较近的路段直接本地估算
+        if self._is_short_leg(point_a, point_b):
+            return self.eta_estimator.estimate(point_a, point_b, mode)
+        
+        # 相同路线的并发请求只调用一次地图API
+        eta = await singleflight.do(
+            normalize_key("map.eta", *cache_key),
+            lambda: self._fetch_eta(point_a, point_b, mode)
+        )
+        return dict(eta)
+    
+    async def _fetch_eta(self, point_a: Dict[str, float], point_b: Dict[str, float],
+                         mode: str) -> Dict[str, Any]:
+        """调用地图API获取路线耗时，失败时使用本地估算兜底"""
+        eta = await self.provider.get_eta(point_a, point_b, mode)
+        
+        # 耗时为0通常表示请求失败或无路线，使用本地估算兜底
+        if eta.get("duration_minutes", 0) <= 0:
+            return self.eta_estimator.estimate(point_a, point_b, mode)
+        self._record_real_eta(point_a, point_b, mode, eta)
+        return eta
+    
+    def _is_short_leg(self, point_a: Dict[str, float], point_b: Dict[str, float]) -> bool:
+        """直线距离是否低于调用地图API的阈值"""
+        distance = self.eta_estimator.straight_distances([(point_a, point_b, "walking")])[0]
+        return distance < settings.eta_estimate_below_meters
+    
+    async def get_eta_batch(self, legs: List[Tuple[Dict[str, float], Dict[str, float], str]]
+                            ) -> List[Dict[str, Any]]:
         """
-        生成静态地图图片（高德地图API）
+        批量获取多段路线的耗时（整个行程一次性计算）
         
         Args:
-            activities: 活动列表，每个活动包含 latitude, longitude, poi_name 等字段
-            zoom: 地图缩放级别 [1,17]，默认13
-            size: 图片大小，格式 "宽度*高度"，最大1024*1024，默认 "1024*1024"
+            legs: [(point_a, point_b, mode), ...]，含义同 get_eta
         
         Returns:
-            静态地图图片的URL
+            与 legs 顺序一致的结果列表，每项为 {"duration_minutes": int, "distance_meters": int}
+        """
+        # 相同路线（按缓存键量化后）只请求一次
+        unique_legs: Dict[Tuple[Any, ...], Tuple[Dict[str, float], Dict[str, float], str]] = {}
+        leg_keys = []
+        for point_a, point_b, mode in legs:
+            key = self._eta_cache_key(point_a, point_b, mode)
+            leg_keys.append(key)
+            unique_legs.setdefault(key, (point_a, point_b, mode))
+        
+        resolved: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        pending = {}
+        for key, leg in unique_legs.items():
+            cached, _ = await self.eta_cache.aget(key)
+            if cached is not None:
+                resolved[key] = dict(cached)
+            else:
+                pending[key] = leg
+        
+        # 短距离路段（路线规划接口熔断时为全部路段）一次性向量化估算
+        if pending:
+            degraded = self.is_degraded("direction")
+            pending_keys = list(pending.keys())
+            pending_legs = [pending[key] for key in pending_keys]
+            distances = self.eta_estimator.straight_distances(pending_legs)
+            estimates = self.eta_estimator.estimate_many(pending_legs)
+            for key, distance, estimate in zip(pending_keys, distances, estimates):
+                if degraded or distance < settings.eta_estimate_below_meters:
+                    resolved[key] = estimate
+                    del pending[key]
+        
+        # 驾车/步行路段按终点分组，每组一次距离测量请求
+        if pending and settings.map_use_distance_matrix and self.provider.supports_distance_matrix:
+            resolved.update(await self._resolve_legs_by_destination(pending))
+        
+        # 公交路段及批量接口未能解决的路段，逐段调用路线规划接口
+        remaining = [key for key in pending if key not in resolved]
+        semaphore = asyncio.Semaphore(max(1, settings.map_eta_concurrency))
+        
+        async def resolve(leg: Tuple[Dict[str, float], Dict[str, float], str]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.get_eta(*leg)
+        
+        results = await asyncio.gather(*(resolve(pending[key]) for key in remaining))
+        resolved.update(zip(remaining, results))
+        return [dict(resolved[key]) for key in leg_keys]
+    
+    async def get_distance_matrix(self, points: List[Dict[str, float]],
+                                  mode: str = "driving") -> DistanceMatrix:
         """
-        if self.api_type != "amap":
-            raise ValueError("静态地图功能仅支持高德地图API")
+        计算多个点两两之间的耗时/距离矩阵
         
-        if not self.amap_key:
-            raise ValueError("高德地图API Key未配置")
+        驾车/步行（服务商支持批量距离测量时）按终点分组，每个终点一次请求，共 len(points) 次；
+        公交只能逐段调用路线规划接口。
         
-        # 提取有经纬度的活动点
+        Args:
+            points: [{"lat": float, "lng": float}, ...]
+            mode: 交通方式 driving/walking/transit
+        """
+        n = len(points)
+        pairs = [(i, j) for i in range(n) for j in range(n) if i != j]
+        etas = await self.get_eta_batch([(points[i], points[j], mode) for i, j in pairs])
+        
+        durations: List[List[Optional[int]]] = [[0 if i == j else None for j in range(n)] for i in range(n)]
+        distances: List[List[Optional[int]]] = [[0 if i == j else None for j in range(n)] for i in range(n)]
+        for (i, j), eta in zip(pairs, etas):
+            if eta.get("duration_minutes", 0) > 0:
+                durations[i][j] = eta["duration_minutes"]
+                distances[i][j] = eta.get("distance_meters", 0)
+        
+        return DistanceMatrix(
+            mode=mode,
+            points=[{"lat": p["lat"], "lng": p["lng"]} for p in points],
+            duration_minutes=durations,
+            distance_meters=distances
+        )
+    
+    async def _resolve_legs_by_destination(
+        self, legs: Dict[Tuple[Any, ...], Tuple[Dict[str, float], Dict[str, float], str]]
+    ) -> Dict[Tuple[Any, ...], Dict[str, Any]]:
+        """将驾车/步行路段按 (交通方式, 终点) 分组，使用服务商的距离测量接口批量计算"""
+        groups: Dict[Tuple[Any, ...], List[Tuple[Any, ...]]] = {}
+        for key, (point_a, point_b, mode) in legs.items():
+            if mode not in ("driving", "walking"):
+                continue
+            # key[1:] = (交通方式, 起点lat, 起点lng, 终点lat, 终点lng)
+            groups.setdefault((mode, key[4], key[5]), []).append(key)
+        
+        batch_size = self.provider.distance_max_origins
+        batches = []
+        for group_keys in groups.values():
+            for start in range(0, len(group_keys), batch_size):
+                batches.append(group_keys[start:start + batch_size])
+        
+        semaphore = asyncio.Semaphore(max(1, settings.map_eta_concurrency))
+        
+        async def resolve_batch(batch_keys: List[Tuple[Any, ...]]) -> List[Optional[Dict[str, Any]]]:
+            _, destination, mode = legs[batch_keys[0]]
+            origins = [legs[key][0] for key in batch_keys]
+            async with semaphore:
+                return await self.provider.get_distance(origins, destination, mode)
+        
+        results = await asyncio.gather(*(resolve_batch(batch) for batch in batches))
+        
+        resolved = {}
+        for batch_keys, etas in zip(batches, results):
+            for key, eta in zip(batch_keys, etas):
+                # 失败或无结果的路段交给逐段接口处理
+                if eta and eta["duration_minutes"] > 0:
+                    point_a, point_b, mode = legs[key]
+                    self._record_real_eta(point_a, point_b, mode, eta)
+                    resolved[key] = eta
+        return resolved
+    
+    def _eta_cache_key(self, point_a: Dict[str, float], point_b: Dict[str, float],
+                       mode: str) -> Tuple[Any, ...]:
+        """将起终点坐标量化到网格，相近的点共用一个缓存条目"""
+        precision = settings.eta_cache_coord_precision
+        return (
+            self.api_type,
+            mode,
+            round(float(point_a["lat"]), precision),
+            round(float(point_a["lng"]), precision),
+            round(float(point_b["lat"]), precision),
+            round(float(point_b["lng"]), precision)
+        )
+    
+    @staticmethod
+    def _extract_map_points(activities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """提取有经纬度的活动点"""
         points = []
         for activity in activities:
             lat = activity.get("latitude")
@@ -284,73 +651,77 @@ class MapService:
                 points.append({
                     "lng": lng,
                     "lat": lat,
-                    "name": activity.get("poi_name", "")
+                    "name": activity.get("poi_name", ""),
+                    "activity_type": activity.get("activity_type"),
+                    "duration_minutes": activity.get("estimated_duration_minutes")
                 })
         
         if not points:
             raise ValueError("没有有效的坐标点")
+        return points
+    
+    async def store_daily_map(self, activities: List[Dict[str, Any]],
+                              zoom: Optional[int] = None, size: str = "1024*1024") -> str:
+        """
+        生成一天的地图图片并保存到图片存储，返回内容哈希
         
-        # 构建 markers 参数（标注点）- 使用large放大标记
-        # 格式: markers=large,0xFF0000,A:lng1,lat1;lng2,lat2
-        # 每个点使用不同的标签：A, B, C... Z
-        marker_parts = []
-        for idx, point in enumerate(points):
-            # 使用字母标签：A, B, C... Z
-            label = chr(65 + (idx % 26))  # A-Z循环
-            marker_locations = f"{point['lng']},{point['lat']}"
-            marker_parts.append(f"large,0xFF0000,{label}:{marker_locations}")
-        
-        markers = "|".join(marker_parts)  # 多个marker用|分隔
-        
-        # 构建 labels 参数（地点名称标签）- 除了abcd外标出地点名
-        # 格式: labels=content,font,bold,fontSize,fontColor,background:location1;location2
-        label_parts = []
-        for point in points:
-            # 只显示地点名，不显示abcd标签
-            poi_name = point.get("name", "")
-            if poi_name:
-                # 限制标签内容长度（最大15个字符）
-                label_content = poi_name[:15] if len(poi_name) <= 15 else poi_name[:12] + "..."
-                # labels格式: content,font,bold,fontSize,fontColor,background
-                # 使用较大字体(14)，白色字体，蓝色背景
-                label_style = f"{label_content},0,1,14,0xFFFFFF,0x5288d8"
-                label_location = f"{point['lng']},{point['lat']}"
-                label_parts.append(f"{label_style}:{label_location}")
-        
-        labels = "|".join(label_parts) if label_parts else None
-        
-        # 构建 paths 参数（路径，连接各个点）- 线条宽度减小到1/3
-        # 格式: paths=weight,color,transparency,,:lng1,lat1;lng2,lat2;lng3,lat3
-        # weight从10减小到约3（10的1/3），但最小值为2，所以使用2
-        path_locations = ";".join([f"{p['lng']},{p['lat']}" for p in points])
-        paths = f"2,0x0000ff,1,,:{path_locations}"
-        
-        # 计算中心点（所有点的中心）
-        center_lng = sum(p["lng"] for p in points) / len(points)
-        center_lat = sum(p["lat"] for p in points) / len(points)
-        location = f"{center_lng},{center_lat}"
-        
-        # 构建请求URL
-        url = "https://restapi.amap.com/v3/staticmap"
-        params = {
-            "key": self.amap_key,
-            "location": location,
-            "zoom": zoom,
-            "size": size,
-            "markers": markers,
-            "paths": paths
-        }
-        
-        # 如果有labels，添加到参数中
-        if labels:
-            params["labels"] = labels
+        - 哈希由渲染方式和标注点/路径等参数决定，已存在的图片直接复用，不再请求地图API
+        - 服务商不支持静态地图或获取失败（熔断、配额等）时改为本地渲染
         
-        # 高德静态地图API直接返回图片URL，可以直接使用
-        # 构建完整的URL
-        query_string = "&".join([f"{k}={v}" for k, v in params.items()])
-        map_url = f"{url}?{query_string}"
+        Args:
+            activities: 活动列表，每个活动包含 latitude, longitude, poi_name 等字段
+            zoom: 地图缩放级别，默认自动计算
+            size: 图片大小，格式 "宽度*高度"
         
-        return map_url
+        Returns:
+            地图图片的内容哈希
+        """
+        points = self._extract_map_points(activities)
+        local_params = map_renderer.render_params(points, size)
+        local_hash = compute_map_hash({"backend": "local", **local_params})
+        
+        params = None
+        if settings.map_render_backend == "amap" and self.provider.supports_static_map:
+            try:
+                params = self.provider.static_map_params(points, zoom, size)
+            except ValueError as e:
+                print(f"静态地图请求过长，改为本地渲染: {e}")
+        
+        if params is not None:
+            provider_hash = compute_map_hash({"backend": self.provider.name, **params})
+            for content_hash in (provider_hash, local_hash):
+                if map_image_store.exists(content_hash):
+                    return content_hash
+            if not self.is_degraded("staticmap"):
+                try:
+                    await singleflight.do(
+                        ("map.image", provider_hash),
+                        lambda: self._fetch_and_store_provider_map(provider_hash, params)
+                    )
+                    return provider_hash
+                except Exception as e:
+                    print(f"获取静态地图失败，改为本地渲染: {e}")
+        elif map_image_store.exists(local_hash):
+            return local_hash
+        
+        await singleflight.do(
+            ("map.image", local_hash),
+            lambda: self._render_and_store_local_map(local_hash, local_params)
+        )
+        return local_hash
+    
+    async def _fetch_and_store_provider_map(self, content_hash: str, params: Dict[str, Any]):
+        image = await self.provider.fetch_static_map(params)
+        await asyncio.to_thread(map_image_store.put, content_hash, image)
+    
+    async def _render_and_store_local_map(self, content_hash: str, params: Dict[str, Any]):
+        image = await asyncio.to_thread(map_renderer.render_from_params, params)
+        await asyncio.to_thread(map_image_store.put, content_hash, image)
+    
+    @staticmethod
+    def map_image_url(content_hash: str) -> str:
+        """地图图片的访问地址（由后端 /api/v1/maps 接口提供）"""
+        return f"{settings.map_image_base_url}/api/v1/maps/{content_hash}.png"
 
 
 # 全局地图服务实例
@@ -0,0 +1,145 @@
+"""POI 注册表 - 稳定ID分配、按ID/名称查找和空间近邻查询"""
+from app.services.eta_estimator import haversine_meters
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import math
+
+
+# Crockford Base32 字母表（去掉易混淆的 I/L/O/U）
+ID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+# 提供给 LLM 的POI字段（服务商ID等内部字段不进入 prompt）
+PROMPT_POI_FIELDS = ("id", "name", "category", "lat", "lng", "description")
+
+
+def _encode_base32(digest: bytes, length: int) -> str:
+    value = int.from_bytes(digest, "big")
+    chars = []
+    for _ in range(length):
+        value, rem = divmod(value, 32)
+        chars.append(ID_ALPHABET[rem])
+    return "".join(chars)
+
+
+class POIRegistry:
+    """
+    单次请求内的POI注册表
+    - assign_ids: 根据服务商ID生成稳定、不冲突的短ID（如 "P3K9QF"）
+    - get: 按ID O(1) 查找
+    - find_by_name: 按名称精确查找（LLM 给出了POI名称但ID缺失或写错时使用）
+    - nearest: 基于网格索引查找最近的POI（ID和名称都未匹配时按 LLM 给出的坐标吸附）
+    - for_prompt: 只保留 PROMPT_POI_FIELDS 的POI列表，用于构建 prompt
+    """
+
+    def __init__(self, pois: List[Dict[str, Any]], cell_size_degrees: float = 0.01):
+        # 未分配ID或ID重复时重新分配
+        ids = [poi.get("id") for poi in pois]
+        if any(not poi_id for poi_id in ids) or len(set(ids)) != len(ids):
+            self.assign_ids(pois)
+        self.pois = pois
+        self.cell_size = cell_size_degrees
+        self._by_id: Dict[str, Dict[str, Any]] = {poi["id"]: poi for poi in pois}
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._grid: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+        for poi in pois:
+            if poi.get("name"):
+                self._by_name.setdefault(poi["name"], poi)
+            if poi.get("lat") is not None and poi.get("lng") is not None:
+                self._grid.setdefault(self._cell(poi["lat"], poi["lng"]), []).append(poi)
+
+    @staticmethod
+    def source_key(poi: Dict[str, Any]) -> str:
+        """POI 的来源标识：优先使用服务商ID，没有时使用名称和坐标"""
+        if poi.get("source_id"):
+            return str(poi["source_id"])
+        return f"{poi.get('name', '')}|{round(float(poi.get('lat') or 0), 5)}|{round(float(poi.get('lng') or 0), 5)}"
+
+    @classmethod
+    def assign_ids(cls, pois: List[Dict[str, Any]], min_length: int = 5) -> List[Dict[str, Any]]:
+        """
+        为POI列表分配稳定的短ID（原地修改）
+        同一个服务商POI在不同请求中得到相同ID；ID已被占用时（哈希前缀冲突或同一POI重复出现）加长该ID
+        """
+        assigned = set()
+        for poi in pois:
+            digest = hashlib.sha1(cls.source_key(poi).encode("utf-8")).digest()
+            length = min_length
+            poi_id = "P" + _encode_base32(digest, length)
+            while poi_id in assigned:
+                length += 1
+                poi_id = "P" + _encode_base32(digest, length)
+            assigned.add(poi_id)
+            poi["id"] = poi_id
+        return pois
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)
+
+    @staticmethod
+    def _ring_cells(center_row: int, center_col: int, ring: int) -> List[Tuple[int, int]]:
+        """与中心网格切比雪夫距离恰好为 ring 的所有网格"""
+        if ring == 0:
+            return [(center_row, center_col)]
+        cells = []
+        for col in range(center_col - ring, center_col + ring + 1):
+            cells.append((center_row - ring, col))
+            cells.append((center_row + ring, col))
+        for row in range(center_row - ring + 1, center_row + ring):
+            cells.append((row, center_col - ring))
+            cells.append((row, center_col + ring))
+        return cells
+
+    def get(self, poi_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """按ID查找POI"""
+        if not poi_id:
+            return None
+        return self._by_id.get(poi_id)
+
+    def find_by_name(self, name: Optional[str]) -> Optional[Dict[str, Any]]:
+        """按名称精确查找POI"""
+        if not name:
+            return None
+        return self._by_name.get(name)
+
+    def nearest(self, lat: float, lng: float,
+                max_distance_meters: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        查找离给定坐标最近的POI
+        从所在网格开始逐圈向外搜索，找到候选后再多搜一圈以保证结果最近
+        """
+        if not self._grid:
+            return None
+        center_row, center_col = self._cell(lat, lng)
+        # 网格边长对应的最短距离（经度方向随纬度缩小）
+        cell_meters = self.cell_size * 111320 * max(math.cos(math.radians(lat)), 0.01)
+        max_ring = max(max(abs(row - center_row), abs(col - center_col)) for row, col in self._grid)
+
+        best: Optional[Dict[str, Any]] = None
+        best_distance = math.inf
+
+        def visit(candidates):
+            nonlocal best, best_distance
+            for poi in candidates:
+                distance = float(haversine_meters(lat, lng, poi["lat"], poi["lng"]))
+                if distance < best_distance:
+                    best, best_distance = poi, distance
+
+        # 查询点离所有POI都很远时，逐圈搜索不如直接遍历
+        if (2 * max_ring + 1) ** 2 > 4 * len(self._grid):
+            for candidates in self._grid.values():
+                visit(candidates)
+        else:
+            for ring in range(max_ring + 1):
+                # 当前圈内任意点的距离都不小于 (ring-1) 个网格边长
+                if best is not None and (ring - 1) * cell_meters > best_distance:
+                    break
+                for row, col in self._ring_cells(center_row, center_col, ring):
+                    visit(self._grid.get((row, col), ()))
+
+        if max_distance_meters is not None and best_distance > max_distance_meters:
+            return None
+        return best
+
+    def for_prompt(self) -> List[Dict[str, Any]]:
+        """构建 prompt 用的POI列表（只保留 PROMPT_POI_FIELDS）"""
+        return [{field: poi.get(field) for field in PROMPT_POI_FIELDS} for poi in self.pois]
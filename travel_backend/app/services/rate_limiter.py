@@ -0,0 +1,213 @@
+"""出站请求限流 - 令牌桶、AIMD 自适应并发和熔断"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
+import time
+
+
+class ProviderUnavailableError(Exception):
+    """服务商处于熔断状态，请求被直接拒绝"""
+
+
+class TokenBucket:
+    """令牌桶：平均速率 rate（每秒），最多积攒 burst 个令牌"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = max(rate, 0.001)
+        self.burst = max(burst if burst is not None else rate, 1.0)
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """取得一个令牌，不足时等待"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD 并发控制
+    - 请求成功且延迟低于目标：并发上限加性增长（每个上限周期 +1）
+    - 被限流或延迟超过目标：并发上限减半（同一个冷却期内只减一次）
+    """
+
+    def __init__(self, initial_limit: int, min_limit: int = 1, max_limit: int = 64,
+                 latency_target_seconds: float = 1.5, decrease_cooldown_seconds: float = 1.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.latency_target = latency_target_seconds
+        self.decrease_cooldown = decrease_cooldown_seconds
+        self.inflight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            while self.inflight >= int(self.limit):
+                await self._condition.wait()
+            self.inflight += 1
+
+    async def release(self, latency_seconds: float, overloaded: bool):
+        async with self._condition:
+            self.inflight -= 1
+            now = time.monotonic()
+            if overloaded or latency_seconds > self.latency_target:
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    async def release_unused(self):
+        """请求未发出或被取消：归还名额，不调整并发上限"""
+        async with self._condition:
+            self.inflight -= 1
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    - closed: 正常放行，连续失败 failure_threshold 次后进入 open
+    - open: 直接拒绝，reset_seconds 后进入 half_open
+    - half_open: 放行一个探测请求，成功则 closed，失败则重新 open
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_inflight = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_inflight:
+                return False
+            self._probe_inflight = True
+        return True
+
+    def is_open(self) -> bool:
+        """当前是否拒绝请求（不改变状态）"""
+        return self.state == "open" and time.monotonic() - self._opened_at < self.reset_seconds
+
+    def record_success(self):
+        self._failures = 0
+        self._probe_inflight = False
+        self.state = "closed"
+
+    def release_probe(self):
+        """请求被取消、没有结果：不改变状态，half_open 时允许下一个请求探测"""
+        self._probe_inflight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._probe_inflight = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class CallOutcome:
+    """单次请求的结果标记，由调用方根据响应内容设置"""
+
+    def __init__(self):
+        self.throttled = False  # 服务商返回了限流/配额错误
+
+
+class OutboundLimiter:
+    """一类接口（如POI检索、路线规划）的出站限流：令牌桶 + AIMD 并发 + 熔断"""
+
+    def __init__(self, name: str, qps: float, max_concurrency: int = 16,
+                 latency_target_seconds: float = 1.5, failure_threshold: int = 5,
+                 reset_seconds: float = 30.0):
+        self.name = name
+        self.bucket = TokenBucket(rate=qps)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial_limit=max(1, max_concurrency // 2),
+            max_limit=max_concurrency,
+            latency_target_seconds=latency_target_seconds
+        )
+        self.breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_seconds=reset_seconds)
+        self.stats: Dict[str, int] = {"requests": 0, "throttled": 0, "errors": 0, "rejected": 0, "cancelled": 0}
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[CallOutcome]:
+        """
+        获取一个请求名额
+
+        用法:
+            async with limiter.slot() as outcome:
+                ... 发送请求 ...
+                if 服务商返回限流错误:
+                    outcome.throttled = True
+
+        Raises:
+            ProviderUnavailableError: 熔断中，直接拒绝
+        """
+        # 熔断中直接拒绝，不排队等待令牌和并发名额
+        if self.breaker.is_open():
+            self.stats["rejected"] += 1
+            raise ProviderUnavailableError(f"{self.name} 接口熔断中，暂不可用")
+        await self.bucket.acquire()
+        await self.concurrency.acquire()
+        # 取得名额后再占用 half_open 的探测名额，排队期间被取消不会一直占着探测
+        if not self.breaker.allow():
+            await self.concurrency.release_unused()
+            self.stats["rejected"] += 1
+            raise ProviderUnavailableError(f"{self.name} 接口熔断中，暂不可用")
+        outcome = CallOutcome()
+        started = time.monotonic()
+        failed = False
+        cancelled = False
+        try:
+            self.stats["requests"] += 1
+            yield outcome
+        except Exception:
+            failed = True
+            raise
+        except BaseException:
+            # 被取消（CancelledError 等）：没有得到结果，不计成功也不计失败
+            cancelled = True
+            raise
+        finally:
+            if cancelled:
+                self.stats["cancelled"] += 1
+                self.breaker.release_probe()
+                await self.concurrency.release_unused()
+            else:
+                latency = time.monotonic() - started
+                overloaded = failed or outcome.throttled
+                if outcome.throttled:
+                    self.stats["throttled"] += 1
+                if failed:
+                    self.stats["errors"] += 1
+                if overloaded:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                await self.concurrency.release(latency, overloaded)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.stats)
+        stats["concurrency_limit"] = int(self.concurrency.limit)
+        stats["inflight"] = self.concurrency.inflight
+        stats["breaker_state"] = self.breaker.state
+        return stats
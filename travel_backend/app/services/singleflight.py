@@ -0,0 +1,63 @@
+"""请求合并 - 相同键的并发调用只执行一次"""
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+import asyncio
+import re
+
+
+T = TypeVar("T")
+
+
+def normalize_key(namespace: str, *parts: Any) -> Tuple[str, ...]:
+    """生成合并键：去除首尾空白、合并连续空白并转小写"""
+    normalized = [re.sub(r"\s+", " ", str(part)).strip().lower() for part in parts]
+    return (namespace, *normalized)
+
+
+class SingleFlight:
+    """
+    single-flight：同一个键同时只有一个底层调用在执行，其余调用方等待同一个结果
+    - 底层调用出错时，所有等待方收到同一个异常；结束后键即释放，下次调用重新执行
+    - 某个等待方被取消不会取消底层调用，其他等待方不受影响
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, key: Hashable, field: str):
+        namespace = key[0] if isinstance(key, tuple) and key else "default"
+        stats = self._stats.setdefault(namespace, {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0})
+        stats[field] += 1
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """执行 func()，若相同键已有调用在执行则等待其结果"""
+        self._count(key, "calls")
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            self._count(key, "executions")
+            task.add_done_callback(lambda done: self._on_done(key, done))
+        else:
+            self._count(key, "coalesced")
+        # shield：等待方被取消时不影响底层调用
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 取出异常，避免所有等待方都已取消时出现 "exception was never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            self._count(key, "errors")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各命名空间的调用/实际执行/被合并次数，以及当前执行中的调用数"""
+        stats: Dict[str, Any] = {namespace: dict(values) for namespace, values in self._stats.items()}
+        for values in stats.values():
+            values["coalesce_rate"] = round(values["coalesced"] / values["calls"], 4) if values["calls"] else 0.0
+        stats["inflight"] = len(self._inflight)
+        return stats
+
+
+# 全局请求合并实例（MapService 与 AIService 共用）
+singleflight = SingleFlight()
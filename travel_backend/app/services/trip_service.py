@@ -1,13 +1,15 @@
 """行程规划主服务"""
+from config import settings
 from app.services.ai_service import ai_service
-from app.services.map_service import map_service
+from app.services.map_service import map_service, BASE_POI_KEYWORDS
 from app.services.voice_service import voice_service
+from app.services.poi_registry import POIRegistry
 from app.data.trip_repository import get_trip_repository, TripRepository
 from app.data.expense_repository import get_expense_repository, ExpenseRepository
 from app.data.map_repository import get_map_repository, MapRepository
 from app.models.llm_models import ItineraryResponse
 from app.models.api_models import TripInput
-from typing import Dict, Any, List, Optional
+from typing import Any, AsyncIterable, Dict, List, Optional
 import json
 
 
@@ -19,18 +21,21 @@ class TripService:
         self.map_service = map_service
         self.voice_service = voice_service
     
-    async def process_voice_input(self, user_id: str, audio_file_path: str) -> str:
+    async def process_voice_input(self, user_id: str, audio: AsyncIterable[bytes]) -> str:
         """
         处理语音输入的主流程
-        1. 语音转文本（科大讯飞）
+        1. 语音转文本（科大讯飞，音频经 ffmpeg 流式转码）
         2. LLM意图解析
         3. 调用生成完整行程
         
+        Args:
+            audio: 按顺序产出上传音频字节的异步迭代器
+        
         Returns:
             trip_id: 创建的行程ID
         """
         # 1. 语音转文本
-        text = await self.voice_service.transcribe_audio_file(audio_file_path)
+        text = await self.voice_service.transcribe_audio_stream(audio)
         
         # 2. LLM意图解析
         user_intent = await self.ai_service.parse_user_intent(text)
@@ -66,12 +71,13 @@ class TripService:
         
         # 1. POI检索
         # 基础关键词 + 通过LLM从用户偏好中提取的关键词
-        keywords = ["景点", "餐厅", "连锁酒店"]
+        keywords = list(BASE_POI_KEYWORDS)
         if trip_input.preferences:
             try:
                 extracted = await self.ai_service.extract_poi_keywords(trip_input.preferences)
                 if extracted:
                     keywords.extend(extracted)
+                    await self.map_service.record_keyword_usage(extracted)
             except Exception:
                 pass
         # 去重，保持顺序
@@ -86,8 +92,11 @@ class TripService:
         poi_list = await self.map_service.search_poi(
             destination=trip_input.destination,
             preference=trip_input.preferences or "",
-            keywords=keywords
+            keywords=keywords,
+            days=(trip_input.end_date - trip_input.start_date).days + 1,
+            transport_profile=self._transport_profile(trip_input.preferences)
         )
+        poi_registry = POIRegistry(poi_list)
         
         # 2. LLM决策行程和交通方式
         user_data = {
@@ -101,14 +110,17 @@ class TripService:
         
         itinerary: ItineraryResponse = await self.ai_service.llm_plan_decision(
             user_data=user_data,
-            poi_list=poi_list
+            poi_list=poi_registry.for_prompt()
         )
         
         # 3. 获取交通耗时预估并更新activities
+        # 先确定所有活动的坐标，再收集整个行程的所有路段批量计算耗时
         daily_plans_dict = []
+        daily_activities = []
+        unmatched = []  # [(activity_dict, poi_name), ...]
         for daily_plan in itinerary.daily_plans:
-            activities_list = []
-            for idx, activity in enumerate(daily_plan.activities):
+            activities = []
+            for activity in daily_plan.activities:
                 activity_dict = activity.dict()
                 # 过滤掉无效占位活动：关键字段均为 None/空
                 if (
@@ -119,24 +131,60 @@ class TripService:
                 ):
                     continue
                 
-                # 如果有下一个POI，获取耗时
-                if activity.transport_to_next and activity.transport_to_next.next_poi_id:
-                    # 找到下一个POI的坐标
-                    next_poi = next(
-                        (p for p in poi_list if p["id"] == activity.transport_to_next.next_poi_id),
-                        None
-                    )
+                # 引用了检索到的POI时（ID缺失或写错时按名称匹配），以地图API的坐标为准
+                poi = poi_registry.get(activity.poi_id) or poi_registry.find_by_name(activity.poi_name)
+                if poi is None and activity.latitude is not None and activity.longitude is not None:
+                    # 都未匹配时，把 LLM 给出的坐标吸附到附近的已检索POI，找不到再地理编码
+                    poi = poi_registry.nearest(activity.latitude, activity.longitude,
+                                               max_distance_meters=settings.map_poi_snap_max_meters)
+                    if poi and not activity_dict.get("poi_id"):
+                        activity_dict["poi_id"] = poi["id"]
+                if poi and poi.get("lat") is not None and poi.get("lng") is not None:
+                    activity_dict["latitude"] = poi["lat"]
+                    activity_dict["longitude"] = poi["lng"]
+                elif activity.poi_name:
+                    # 商圈、美食街等 poi_id 为空或未匹配的活动，按名称在目的地城市内地理编码
+                    unmatched.append((activity_dict, activity.poi_name))
+                
+                activities.append((activity, activity_dict))
+            daily_activities.append((daily_plan, activities))
+        
+        if unmatched:
+            geocoded = await self.map_service.geocode_batch(
+                trip_input.destination, [name for _, name in unmatched])
+            for activity_dict, name in unmatched:
+                location = geocoded.get(name.strip())
+                # LLM 给出的坐标常常不准，以地理编码结果为准
+                if location:
+                    activity_dict["latitude"] = location["lat"]
+                    activity_dict["longitude"] = location["lng"]
+        
+        legs = []
+        leg_activities = []
+        for daily_plan, activities in daily_activities:
+            activities_list = []
+            for idx, (activity, activity_dict) in enumerate(activities):
+                # 如果有下一个POI，记录该路段
+                if activity.transport_to_next:
+                    # 找到下一个POI的坐标；下一站没有 poi_id（或未匹配）时取当天的下一个活动
+                    next_poi = poi_registry.get(activity.transport_to_next.next_poi_id)
+                    if next_poi:
+                        next_point = {"lat": next_poi.get("lat"), "lng": next_poi.get("lng")}
+                    elif idx + 1 < len(activities):
+                        next_dict = activities[idx + 1][1]
+                        next_point = {"lat": next_dict.get("latitude"), "lng": next_dict.get("longitude")}
+                    else:
+                        next_point = None
                     # 需要当前与下一个都有坐标
-                    if next_poi and activity.latitude is not None and activity.longitude is not None \
-                       and next_poi.get("lat") is not None and next_poi.get("lng") is not None:
-                        eta = await self.map_service.get_eta(
-                            point_a={"lat": activity.latitude, "lng": activity.longitude},
-                            point_b={"lat": next_poi["lat"], "lng": next_poi["lng"]},
-                            mode=self._map_transport_mode(activity.transport_to_next.mode)
-                        )
-                        activity_dict["estimated_duration_minutes"] = eta["duration_minutes"]
-                        if activity.transport_to_next:
-                            activity_dict["transport_to_next"]["estimated_minutes"] = eta["duration_minutes"]
+                    if next_point and activity_dict.get("latitude") is not None \
+                       and activity_dict.get("longitude") is not None \
+                       and next_point["lat"] is not None and next_point["lng"] is not None:
+                        legs.append((
+                            {"lat": activity_dict["latitude"], "lng": activity_dict["longitude"]},
+                            next_point,
+                            self._map_transport_mode(activity.transport_to_next.mode)
+                        ))
+                        leg_activities.append(activity_dict)
                 
                 activities_list.append(activity_dict)
             
@@ -147,6 +195,11 @@ class TripService:
                 "activities": activities_list
             })
         
+        etas = await self.map_service.get_eta_batch(legs)
+        for activity_dict, eta in zip(leg_activities, etas):
+            activity_dict["estimated_duration_minutes"] = eta["duration_minutes"]
+            activity_dict["transport_to_next"]["estimated_minutes"] = eta["duration_minutes"]
+        
         # 4. 存储TripHeader
         trip_header = trip_repo.create_trip_header(
             user_id=user_id,
@@ -202,24 +255,35 @@ class TripService:
                 continue
             
             try:
-                # 生成静态地图URL（使用最大尺寸1024*1024）
-                map_url = await self.map_service.generate_static_map(
+                # 生成地图图片（使用最大尺寸1024*1024）并按内容哈希保存
+                map_hash = await self.map_service.store_daily_map(
                     activities=valid_activities,
-                    zoom=13,
                     size="1024*1024"
                 )
                 
-                # 保存地图URL到数据库
+                # 保存地图地址和哈希到数据库
                 map_repo.save_map(
                     trip_id=trip_id,
                     day_number=day_number,
-                    map_url=map_url
+                    map_url=self.map_service.map_image_url(map_hash),
+                    map_hash=map_hash
                 )
             except Exception as e:
                 # 地图生成失败不影响整体流程，只记录错误
                 print(f"生成第{day_number}天地图失败: {e}")
                 continue
     
+    def _transport_profile(self, preferences: Optional[str]) -> str:
+        """从偏好描述推断主要交通方式（决定锚点模式下的周边检索半径），默认公共交通"""
+        if not preferences:
+            return "transit"
+        text = preferences.lower()
+        if any(word in text for word in ("自驾", "开车", "租车", "包车")):
+            return "driving"
+        if any(word in text for word in ("步行", "徒步", "citywalk", "city walk")):
+            return "walking"
+        return "transit"
+    
     def _map_transport_mode(self, mode: Optional[str]) -> str:
         """将中文交通方式转换为API所需的格式"""
         if not mode:
@@ -1,21 +1,386 @@
 """语音处理服务 - 科大讯飞语音转文本"""
 from config import settings
-import httpx
+from app.services.audio_processing import (
+    TARGET_SAMPLE_RATE, SAMPLE_WIDTH, UPSTREAM_FRAME_BYTES, AudioFrameRing, StreamingVAD,
+    create_resampler
+)
 import hashlib
 import base64
 import json
 import hmac
 from datetime import datetime, timedelta, timezone
 from urllib.parse import urlencode, quote
-import websocket
-import ssl
-from typing import Optional, Tuple
-import threading
+import websockets
+from typing import AsyncIterable, AsyncIterator, Dict, Optional, Tuple, Union
+import asyncio
 import time
-import subprocess
 import os
-import tempfile
 import uuid as uuid_lib
+import wave
+
+
+# 实时转写推送给前端的协议：text=纯文本（默认，每次推送完整文本），delta=带序号的 JSON 增量
+REALTIME_PROTOCOLS = ("text", "delta")
+# 文件转写每次从磁盘读取的音频时长
+FILE_READ_MS = 500
+# 写入 ffmpeg stdin 的上传数据块大小，以及每次从 stdout 读取的 PCM 字节数（约 0.5 秒）
+UPLOAD_CHUNK_BYTES = 64 * 1024
+FFMPEG_READ_BYTES = 16000
+
+
+class RTASRTranscript:
+    """
+    累积讯飞 RTASR 识别结果，把每条返回消息转换为推送给前端的消息
+
+    讯飞每条中间结果（st.type=1）是当前句子的完整候选，最终结果（st.type=0）确定当前句子。
+    已确定的文本记为 final_text，当前句子的候选记为 tail。
+
+    text 协议（兼容旧前端）：
+    - 最终结果推送 final_text 整体，中间结果推送 final_text + tail
+    - 中间结果仅当比上次推送更长时才推送，避免前端回退/清空
+    - 状态和错误为 "[WS_READY]"、"[ERROR] 描述" 形式的文本
+
+    delta 协议（?protocol=delta）：每条消息为 JSON，均带递增的 seq，前端按顺序应用
+    - {"type": "append", "text": t}：tail += t
+    - {"type": "replace_tail", "keep": k, "text": t}：tail = tail[:k] + t
+    - {"type": "finalize", "keep": k, "text": t}：tail = tail[:k] + t，随后 final_text += tail，tail 清空
+    - {"type": "snapshot", "final": f, "tail": t}：整体替换，每 snapshot_interval 条消息用快照代替一次增量，
+      前端发现 seq 不连续时也可以发送 {"cmd": "snapshot"} 请求快照
+    - {"type": "status", "status": "WS_READY"}、{"type": "error", "code": "ERROR", "message": 描述}、
+      {"type": "backpressure", "paused": true/false, "buffered_bytes": n}
+    """
+
+    def __init__(self, protocol: str = "text", snapshot_interval: int = 50, verbose: bool = True):
+        if protocol not in REALTIME_PROTOCOLS:
+            raise ValueError(f"不支持的实时转写协议: {protocol}")
+        self.protocol = protocol
+        self.snapshot_interval = snapshot_interval
+        self.verbose = verbose  # 是否打印每条中间/最终结果（文件转写时关闭）
+        self.acc_text = ""  # 累积的最终文本
+        self.tail = ""  # 当前句子的中间结果
+        self.last_sent_len = 0  # text 协议上次发送到前端的文本长度
+        self.seq = 0  # delta 协议已发送的消息数
+
+    def handle(self, message: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        处理一条讯飞返回的文本消息
+
+        Returns:
+            (事件: "started"=握手成功、"error"=讯飞返回错误、其他为 None, 需要推送给前端的消息，无需推送时为 None)
+        """
+        try:
+            data = json.loads(message)
+            action = data.get("action")
+            code = str(data.get("code"))
+
+            # 处理握手响应
+            if action == "started" and code == "0":
+                print("[RTASR] Handshake started OK")
+                return "started", self.marker("WS_READY")
+
+            # 处理识别结果
+            if action == "result" and code == "0":
+                # data 字段是一个JSON字符串，需再次解析
+                inner = data.get("data")
+                if not inner:
+                    return None, None
+                try:
+                    return None, self._handle_result(json.loads(inner))
+                except Exception as e:
+                    print(f"[RTASR] Parse error: {e}")
+                    return None, self.marker("PARSE_ERROR", str(e))
+            if action == "error" or code != "0":
+                error_msg = data.get('desc') or data.get('message') or f"code={code}"
+                print(f"[RTASR] Error: {error_msg}")
+                return "error", self.marker("ERROR", error_msg)
+            return None, None
+        except Exception as e:
+            print(f"[RTASR] Exception in on_message: {e}")
+            return None, self.marker("EXCEPTION", str(e))
+
+    def marker(self, code: str, detail: Optional[str] = None) -> str:
+        """
+        状态/错误消息：text 协议为 "[CODE]" 或 "[CODE] 描述"；
+        delta 协议中带描述的为 error，不带描述的为 status
+        """
+        if self.protocol == "text":
+            return f"[{code}] {detail}" if detail is not None else f"[{code}]"
+        if detail is not None:
+            return self._delta({"type": "error", "code": code, "message": detail})
+        return self._delta({"type": "status", "status": code})
+
+    def backpressure(self, paused: bool, buffered_bytes: int) -> str:
+        """
+        上行音频背压状态：缓冲已满时 paused=True（服务端暂停读取音频），腾出空间后 paused=False
+        text 协议使用前端已忽略的 [STATUS] 前缀
+        """
+        if self.protocol == "text":
+            return f"[STATUS] backpressure={'on' if paused else 'off'} buffered={buffered_bytes}"
+        return self._emit({"type": "backpressure", "paused": paused, "buffered_bytes": buffered_bytes})
+
+    def snapshot(self) -> str:
+        """delta 协议的完整快照（用于前端重新同步）"""
+        return self._emit({"type": "snapshot", "final": self.acc_text, "tail": self.tail})
+
+    def _handle_result(self, inner_json: dict) -> Optional[str]:
+        cn_data = inner_json.get("cn", {})
+        if not cn_data:
+            return None
+        st = cn_data.get("st", {})
+        words = []
+        for rt in st.get("rt", []):
+            for ws_seg in rt.get("ws", []):
+                for cw in ws_seg.get("cw", []):
+                    w = cw.get("w")
+                    if w:
+                        words.append(w)
+        if not words:
+            return None
+        text_out = "".join(words)
+        previous_tail = self.tail
+        # 0=最终, 1=中间（讯飞返回的是字符串 "0"/"1"）
+        if str(st.get("type")) == "0":
+            # 最终结果，累加到缓冲
+            self.acc_text = self.acc_text + text_out
+            self.tail = ""
+            if self.verbose:
+                print(f"[RTASR] Final: {text_out} -> Acc: {self.acc_text}")
+            if self.protocol == "delta":
+                keep = len(os.path.commonprefix([previous_tail, text_out]))
+                return self._delta({"type": "finalize", "keep": keep, "text": text_out[keep:]})
+            # 推送整体文本
+            self.last_sent_len = len(self.acc_text)
+            return self.acc_text
+
+        # 中间结果
+        self.tail = text_out
+        if self.protocol == "delta":
+            keep = len(os.path.commonprefix([previous_tail, text_out]))
+            if keep == len(previous_tail):
+                if keep == len(text_out):
+                    return None
+                return self._delta({"type": "append", "text": text_out[keep:]})
+            return self._delta({"type": "replace_tail", "keep": keep, "text": text_out[keep:]})
+        # 推送累积+当前片段供前端展示
+        preview = self.acc_text + text_out
+        if len(preview) > self.last_sent_len:
+            if self.verbose:
+                print(f"[RTASR] Partial: {text_out} -> Preview: {preview}")
+            self.last_sent_len = len(preview)
+            return preview
+        return None
+
+    def _delta(self, message: dict) -> str:
+        """编号并编码一条 delta 消息，到达快照间隔时用快照代替文本增量"""
+        if self.snapshot_interval and (self.seq + 1) % self.snapshot_interval == 0 \
+                and message["type"] in ("append", "replace_tail", "finalize"):
+            return self.snapshot()
+        return self._emit(message)
+
+    def _emit(self, message: dict) -> str:
+        self.seq += 1
+        return json.dumps({"seq": self.seq, **message}, ensure_ascii=False, separators=(",", ":"))
+
+
+class RealtimeASRSession:
+    """
+    基于 asyncio 的讯飞 RTASR 实时转写会话：不占用线程，不轮询
+
+    - write_audio 把任意大小的 16kHz 单声道 PCM 块写入环形缓冲（AudioFrameRing），
+      缓冲满时等待发送腾出空间，期间不再读取前端数据（背压），并向前端推送背压状态，不静默丢弃音频
+    - run 建立连接并等待握手，随后发送和接收并发进行：缓冲中的音频按固定帧（默认 1280 字节 / 40ms）
+      以实时速率发送（最多领先实时 catchup_bytes 对应的时长），积压超过 catchup_bytes 时以 catchup_speed 倍速追赶；
+      识别结果到达即放入 results
+    - paced=False 时不限速（文件转写），发送速度只受连接背压约束
+    - finish 后发送完缓冲中的音频和结束标识，在 final_timeout 内等待讯飞返回剩余结果后关闭连接
+    - results 中是按 protocol 编码好的消息（见 RTASRTranscript）：text 协议与旧的线程版桥接相同
+      （[WS_OPEN]、[WS_READY]、识别文本、[ERROR] ...、[WS_CLOSED]），最后放入 None 表示会话结束
+    - 会话结束（finish 之后或讯飞连接已关闭）后写入的音频和缓冲中未发送的音频计入 bytes_dropped
+    """
+
+    def __init__(self, url: str, handshake_timeout: float = 5.0, final_timeout: float = 3.0,
+                 protocol: str = "text", snapshot_interval: int = 50,
+                 frame_bytes: int = UPSTREAM_FRAME_BYTES, buffer_bytes: int = 128000,
+                 catchup_bytes: int = 6400, catchup_speed: float = 2.0, paced: bool = True,
+                 verbose: bool = True):
+        self.url = url
+        self.handshake_timeout = handshake_timeout
+        self.final_timeout = final_timeout
+        self.ring = AudioFrameRing(buffer_bytes, frame_bytes)
+        self.frame_seconds = frame_bytes / (TARGET_SAMPLE_RATE * SAMPLE_WIDTH)
+        self.catchup_bytes = catchup_bytes
+        self.catchup_seconds = catchup_bytes / (TARGET_SAMPLE_RATE * SAMPLE_WIDTH)
+        self.catchup_speed = max(1.0, catchup_speed)
+        self.results: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        self.paced = paced
+        self.transcript = RTASRTranscript(protocol, snapshot_interval, verbose)
+        self.stats = {"frames_sent": 0, "bytes_sent": 0, "backpressure_events": 0, "backpressure_seconds": 0.0}
+        self._data_ready = asyncio.Event()
+        self._space_ready = asyncio.Event()
+        self._paused = False
+        self._finished = False  # 前端音频已结束
+        self._closed = False  # 讯飞连接已关闭
+
+    async def write_audio(self, chunk: bytes):
+        """
+        写入一块音频；缓冲满时等待发送腾出一半空间后继续写入
+        会话已结束时丢弃并计数
+        """
+        view = memoryview(chunk)
+        while len(view):
+            if self._finished or self._closed:
+                self.ring.drop(len(view))
+                return
+            written = self.ring.write(view)
+            if written:
+                view = view[written:]
+                self._data_ready.set()
+            if len(view):
+                if not self._paused:
+                    self._paused = True
+                    self.stats["backpressure_events"] += 1
+                    self.results.put_nowait(self.transcript.backpressure(True, self.ring.buffered))
+                waited_from = time.monotonic()
+                self._space_ready.clear()
+                await self._space_ready.wait()
+                self.stats["backpressure_seconds"] += time.monotonic() - waited_from
+        if self._paused:
+            self._paused = False
+            self.results.put_nowait(self.transcript.backpressure(False, self.ring.buffered))
+
+    def finish(self):
+        """音频结束：发送完缓冲中的音频后发送结束标识"""
+        self._finished = True
+        self._data_ready.set()
+
+    @property
+    def closed(self) -> bool:
+        """讯飞连接是否已关闭（之后写入的音频都会被丢弃）"""
+        return self._closed
+
+    def request_snapshot(self):
+        """delta 协议：前端请求重新同步时放入一条完整快照"""
+        if self.transcript.protocol == "delta":
+            self.results.put_nowait(self.transcript.snapshot())
+
+    def get_stats(self) -> Dict[str, float]:
+        """发送帧数/字节数、缓冲中和丢弃的字节数、背压次数和等待时长"""
+        return {
+            "frames_sent": self.stats["frames_sent"],
+            "bytes_sent": self.stats["bytes_sent"],
+            "bytes_buffered": self.ring.buffered,
+            "bytes_dropped": self.ring.stats["bytes_dropped"],
+            "backpressure_events": self.stats["backpressure_events"],
+            "backpressure_seconds": round(self.stats["backpressure_seconds"], 2),
+        }
+
+    async def run(self):
+        """连接讯飞并转发，直到会话结束；异常不向外抛出，而是以标记消息放入 results"""
+        try:
+            async with websockets.connect(self.url, open_timeout=self.handshake_timeout,
+                                          ping_interval=None, max_size=None, compression=None) as ws:
+                print("[RTASR] WebSocket opened")
+                self.results.put_nowait(self.transcript.marker("WS_OPEN"))
+                try:
+                    ready = await asyncio.wait_for(self._handshake(ws), timeout=self.handshake_timeout)
+                except asyncio.TimeoutError:
+                    print("[RTASR] Handshake timeout")
+                    self.results.put_nowait(self.transcript.marker("ERROR", "WebSocket握手超时"))
+                    return
+                if ready:
+                    await self._forward(ws)
+        except Exception as e:
+            print(f"[RTASR] WebSocket error: {e}")
+            self.results.put_nowait(self.transcript.marker("WS_ERROR", str(e)))
+        finally:
+            self._closed = True
+            # 未发送的音频计为丢弃，唤醒等待缓冲空间的写入方
+            self.ring.discard()
+            self._space_ready.set()
+            print("[RTASR] WebSocket closed")
+            self.results.put_nowait(self.transcript.marker("WS_CLOSED"))
+            self.results.put_nowait(None)
+
+    async def _handshake(self, ws) -> bool:
+        """等待握手成功消息，握手前收到错误或连接关闭时返回 False"""
+        async for message in ws:
+            if isinstance(message, bytes):
+                continue
+            event, text = self.transcript.handle(message)
+            if text:
+                self.results.put_nowait(text)
+            if event == "started":
+                return True
+            if event == "error":
+                return False
+        return False
+
+    async def _forward(self, ws):
+        sender = asyncio.create_task(self._send(ws))
+        receiver = asyncio.create_task(self._receive(ws))
+        try:
+            done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver not in done:
+                # 结束标识已发送，等待讯飞返回剩余结果并关闭连接
+                await asyncio.wait({receiver}, timeout=self.final_timeout)
+        finally:
+            for task in (sender, receiver):
+                task.cancel()
+            await asyncio.gather(sender, receiver, return_exceptions=True)
+        for task in (sender, receiver):
+            if not task.cancelled() and task.exception():
+                raise task.exception()
+
+    async def _send(self, ws):
+        loop = asyncio.get_running_loop()
+        next_at = loop.time()
+        while True:
+            frame = self.ring.peek_frame()
+            if frame is None:
+                if self._finished:
+                    break
+                self._data_ready.clear()
+                await self._data_ready.wait()
+                # 空闲之后不累积发送额度
+                next_at = max(next_at, loop.time())
+                continue
+            if self.paced:
+                # 最多领先实时 catchup_bytes 对应的时长，吸收前端分块和事件循环的抖动
+                delay = next_at - self.catchup_seconds - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            # RTASR 要求直接发送二进制 PCM 数据；帧是缓冲上的 memoryview，send 返回前已完成拷贝
+            await ws.send(frame)
+            self._frame_sent(len(frame))
+            # 实时速率发送，积压较多或音频已结束时加速
+            if self._finished or self.ring.buffered > self.catchup_bytes:
+                next_at += self.frame_seconds / self.catchup_speed
+            else:
+                next_at += self.frame_seconds
+
+        tail = self.ring.peek_tail()
+        if tail is not None:
+            await ws.send(tail)
+            self._frame_sent(len(tail))
+        end_msg = json.dumps({"end": True})
+        print(f"[RTASR] Sending end flag: {end_msg}")
+        await ws.send(end_msg)
+
+    def _frame_sent(self, size: int):
+        self.ring.advance(size)
+        self.stats["frames_sent"] += 1
+        self.stats["bytes_sent"] += size
+        # 腾出一半空间后再唤醒写入方，避免背压状态频繁切换
+        if not self._space_ready.is_set() and self.ring.free * 2 >= self.ring.capacity:
+            self._space_ready.set()
+
+    async def _receive(self, ws):
+        async for message in ws:
+            if isinstance(message, bytes):
+                continue
+            _, text = self.transcript.handle(message)
+            if text:
+                self.results.put_nowait(text)
 
 
 class VoiceService:
@@ -27,13 +392,16 @@ class VoiceService:
         self.api_secret = settings.xunfei_api_secret
         # IAT(听写)与RTASR(实时转写)为两个不同服务，默认使用RTASR标准版
         self.iat_url = "wss://iat-api.xfyun.cn/v2/iat"
-        self.rtasr_url = "wss://rtasr.xfyun.cn/v1/ws"
+        self.rtasr_url = settings.xunfei_rtasr_url
         
         # 大模型版本配置
         self.llm_app_id = settings.xunfei_llm_app_id
         self.llm_access_key_id = settings.xunfei_llm_access_key_id
         self.llm_access_key_secret = settings.xunfei_llm_access_key_secret
         self.llm_url = "wss://office-api-ast-dx.iflyaisol.com/ast/communicate/v1"
+
+        # 同时运行的 ffmpeg 转码进程数
+        self._ffmpeg_slots = asyncio.Semaphore(settings.voice_ffmpeg_max_concurrency)
     
     def generate_iat_auth_url(self) -> str:
         """IAT 听写鉴权URL（备用）"""
@@ -51,8 +419,6 @@ class VoiceService:
     def generate_rtasr_auth_url(self, lang: str = "cn", verbose: bool = False) -> str:
         """RTASR 实时语音转写鉴权URL（标准版）"""
         # 文档: signa = Base64( HmacSHA1( MD5(appid+ts), api_key ) )
-        host = "rtasr.xfyun.cn"
-        path = "/v1/ws"
         # 注意：必须使用 epoch 秒（time.time），不要用 naive utcnow().timestamp() 以免被当作本地时区计算
         ts = str(int(time.time()))
         base_string = f"{self.app_id}{ts}"
@@ -65,7 +431,7 @@ class VoiceService:
             "signa": signa,
             "lang": lang,
         }
-        url = f"wss://{host}{path}?{urlencode(params)}"
+        url = f"{self.rtasr_url}?{urlencode(params)}"
         if verbose:
             print(f"[RTASR] auth ts={ts}")
         return url
@@ -159,284 +525,248 @@ class VoiceService:
         return ws_url, session_id
 
     # =============== 实时转写桥接（WebSocket 转发） ===============
-    def start_realtime_proxy(self, audio_queue, result_queue, stop_event):
+    def create_realtime_session(self, lang: str = "cn", protocol: str = "text") -> RealtimeASRSession:
         """
-        使用讯飞 RTASR 标准版：
-        - 建立到 rtasr.xfyun.cn/v1/ws 的 WebSocket 连接
-        - 从 audio_queue 读取二进制PCM块，直接作为 binary message 发送
-        - 接收 text message(JSON)，解析后将识别文本写入 result_queue
-        - stop_event 置位后，发送结束帧并关闭连接
-        说明：RTASR 要求 16kHz、16bit、单声道 PCM（pcm_s16le）。建议前端发送L16 PCM。
+        创建讯飞 RTASR 标准版实时转写会话（asyncio，由 /api/v1/voice/realtime 使用）
+        说明：RTASR 要求 16kHz、16bit、单声道 PCM（pcm_s16le）。其他采样率/声道数由
+        路由按客户端声明的格式重采样后再放入会话。
+
+        Args:
+            protocol: 推送给前端的消息格式，"text"（完整文本）或 "delta"（JSON 增量），见 RTASRTranscript
         """
-        ws_url = self.generate_rtasr_auth_url()
-        print(f"[RTASR] Connecting to: {ws_url}")
-        ws_ready = threading.Event()  # 用于标记WebSocket连接已就绪
-        ws_instance = None  # 保存WebSocket实例，用于发送数据
-        acc_text = ""  # 累积的最终文本
-        last_sent_len = 0  # 上次发送到前端的文本长度
-
-        def on_open(ws):
-            nonlocal ws_instance
-            ws_instance = ws
-            print("[RTASR] WebSocket opened")
-            result_queue.put("[WS_OPEN]")
-
-        def on_message(ws, message):
-            nonlocal acc_text, last_sent_len  # 声明使用外层作用域的变量
-            try:
-                data = json.loads(message)
-                action = data.get("action")
-                code = str(data.get("code"))
-                
-                # 处理握手响应
-                if action == "started" and code == "0":
-                    print("[RTASR] Handshake started OK")
-                    result_queue.put("[WS_READY]")
-                    ws_ready.set()  # 标记连接已就绪，可以开始发送音频
-                    return
-                
-                # 处理识别结果
-                if action == "result" and code == "0":
-                    # data 字段是一个JSON字符串，需再次解析
-                    inner = data.get("data")
-                    if inner:
-                        try:
-                            inner_json = json.loads(inner)
-                            # 解析识别结果
-                            cn_data = inner_json.get("cn", {})
-                            if cn_data:
-                                st = cn_data.get("st", {})
-                                words = []
-                                for rt in st.get("rt", []):
-                                    for ws_seg in rt.get("ws", []):
-                                        for cw in ws_seg.get("cw", []):
-                                            w = cw.get("w")
-                                            if w:
-                                                words.append(w)
-                                if words:
-                                    text_out = "".join(words)
-                                    result_type = st.get("type")  # 0=最终, 1=中间
-                                    if result_type == 0:
-                                        # 最终结果，累加到缓冲并推送整体文本
-                                        acc_text = acc_text + text_out
-                                        print(f"[RTASR] Final: {text_out} -> Acc: {acc_text}")
-                                        last_sent_len = len(acc_text)
-                                        result_queue.put(acc_text)
-                                    else:
-                                        # 中间结果，推送累积+当前片段供前端展示
-                                        preview = acc_text + text_out
-                                        # 仅当预览比已发送更长时才推送，避免前端回退/清空
-                                        if len(preview) > last_sent_len:
-                                            print(f"[RTASR] Partial: {text_out} -> Preview: {preview}")
-                                            last_sent_len = len(preview)
-                                            result_queue.put(preview)
-                        except Exception as e:
-                            print(f"[RTASR] Parse error: {e}")
-                            result_queue.put(f"[PARSE_ERROR] {str(e)}")
-                elif action == "error" or code != "0":
-                    error_msg = data.get('desc') or data.get('message') or f"code={code}"
-                    print(f"[RTASR] Error: {error_msg}")
-                    result_queue.put(f"[ERROR] {error_msg}")
-            except Exception as e:
-                print(f"[RTASR] Exception in on_message: {e}")
-                result_queue.put(f"[EXCEPTION] {str(e)}")
-
-        def on_error(ws, error):
-            print(f"[RTASR] WebSocket error: {error}")
-            result_queue.put(f"[WS_ERROR] {error}")
-
-        def on_close(ws, *args):
-            print("[RTASR] WebSocket closed")
-            result_queue.put("[WS_CLOSED]")
-            ws_ready.clear()
-
-        # 建立连接
-        ws = websocket.WebSocketApp(
-            ws_url,
-            on_open=on_open,
-            on_message=on_message,
-            on_error=on_error,
-            on_close=on_close,
+        return RealtimeASRSession(
+            self.generate_rtasr_auth_url(lang=lang, verbose=True),
+            handshake_timeout=settings.xunfei_rtasr_handshake_timeout,
+            final_timeout=settings.xunfei_rtasr_final_timeout,
+            protocol=protocol,
+            snapshot_interval=settings.voice_realtime_snapshot_interval,
+            frame_bytes=settings.voice_realtime_frame_bytes,
+            buffer_bytes=settings.voice_realtime_buffer_ms * TARGET_SAMPLE_RATE * SAMPLE_WIDTH // 1000,
+            catchup_bytes=settings.voice_realtime_catchup_ms * TARGET_SAMPLE_RATE * SAMPLE_WIDTH // 1000,
+            catchup_speed=settings.voice_realtime_catchup_speed,
         )
 
-        # 在子线程里运行WebSocket
-        def run_forever():
-            print("[RTASR] run_forever starting...")
-            ws.run_forever(sslopt={"cert_reqs": ssl.CERT_NONE})
-            print("[RTASR] run_forever ended")
+    async def transcribe_audio_file(self, audio_file_path: str) -> str:
+        """
+        转录音频文件为文本
+        WAV（16bit PCM）直接读取；其他格式（WebM 等）经 ffmpeg 流式转码，见 transcribe_audio_stream
+        """
+        if os.path.splitext(audio_file_path)[1].lower() == '.wav':
+            return await self._transcribe_wav_file(audio_file_path)
+        return await self.transcribe_audio_stream(iter_file_chunks(audio_file_path))
 
-        ws_thread = threading.Thread(target=run_forever, daemon=True)
-        ws_thread.start()
+    async def transcribe_audio_stream(self, audio: Union[bytes, AsyncIterable[bytes]]) -> str:
+        """
+        转写任意 ffmpeg 支持格式的音频（上传的 WebM/WAV 等），不落盘、不阻塞事件循环
 
-        # 等待连接建立和握手完成（最多等待5秒）
-        if not ws_ready.wait(timeout=5.0):
-            print("[RTASR] Handshake timeout")
-            result_queue.put("[ERROR] WebSocket握手超时")
-            stop_event.set()
-            return
+        - 音频字节经管道写入 ffmpeg 的 stdin，从 stdout 读取 16kHz 单声道 s16le PCM，
+          边转码边裁掉静音并发送到讯飞，不等待转码完成
+        - 同时运行的 ffmpeg 进程数不超过 VOICE_FFMPEG_MAX_CONCURRENCY，超出的请求排队等待
 
-        # 音频发送循环（建议每 ~40ms 发送 ~1280字节）
-        while not stop_event.is_set():
+        Args:
+            audio: 完整的音频字节，或按顺序产出音频字节的异步迭代器（如 iter_upload_chunks(UploadFile)）
+        """
+        chunks = iter_bytes_chunks(audio) if isinstance(audio, (bytes, bytearray)) else audio
+        async with self._ffmpeg_slots:
             try:
-                # 非阻塞获取一块音频
-                chunk = None
+                process = await asyncio.create_subprocess_exec(
+                    settings.voice_ffmpeg_path, '-hide_banner', '-loglevel', 'error',
+                    '-i', 'pipe:0',
+                    '-ar', str(TARGET_SAMPLE_RATE),  # 采样率16kHz
+                    '-ac', '1',  # 单声道
+                    '-f', 's16le',  # 16bit PCM，无文件头
+                    'pipe:1',
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            except FileNotFoundError:
+                raise Exception("未找到ffmpeg工具，请确保已安装ffmpeg并添加到系统PATH")
+
+            async def feed_ffmpeg():
                 try:
-                    chunk = audio_queue.get(timeout=0.1)
-                except Exception:
-                    continue
-                
-                if chunk is not None and ws_instance:
-                    try:
-                        # RTASR 要求直接发送二进制 PCM 数据
-                        # websocket-client 库的 send 方法会自动处理二进制数据
-                        if isinstance(chunk, bytes):
-                            ws_instance.send(chunk, opcode=websocket.ABNF.OPCODE_BINARY)
-                        else:
-                            # 如果不是bytes，尝试转换
-                            ws_instance.send(bytes(chunk), opcode=websocket.ABNF.OPCODE_BINARY)
-                        print(f"[RTASR] Sent audio chunk: {len(chunk)} bytes")
-                    except Exception as e:
-                        print(f"[RTASR] Send error: {e}")
-                        result_queue.put(f"[SEND_ERROR] {str(e)}")
+                    async for chunk in chunks:
+                        process.stdin.write(chunk)
+                        await process.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    # ffmpeg 提前退出，错误信息从 stderr 读取
+                    pass
+                finally:
+                    process.stdin.close()
+
+            async def read_pcm():
+                while True:
+                    data = await process.stdout.read(FFMPEG_READ_BYTES)
+                    if not data:
                         break
-            except Exception as e:
-                print(f"[RTASR] Loop error: {e}")
-                result_queue.put(f"[LOOP_ERROR] {str(e)}")
-                break
+                    yield data
 
-        # 发送结束标识
-        if ws_instance:
+            feeder = asyncio.create_task(feed_ffmpeg())
+            stderr_task = asyncio.create_task(process.stderr.read())
             try:
-                end_msg = json.dumps({"end": True})
-                print(f"[RTASR] Sending end flag: {end_msg}")
-                ws_instance.send(end_msg)
-            except Exception:
-                pass
-            try:
-                print("[RTASR] Closing WebSocket")
-                ws_instance.close()
-            except Exception:
-                pass
-    
-    def convert_webm_to_wav(self, webm_path: str, output_path: str) -> str:
+                try:
+                    text = await self._transcribe_pcm(read_pcm())
+                    transcribe_error = None
+                except Exception as e:
+                    text, transcribe_error = "", e
+                stopped_early = not process.stdout.at_eof()
+                if stopped_early:
+                    # 转写提前结束（如讯飞连接断开），不再读取输出，结束 ffmpeg 以免写入 stdin 时阻塞
+                    process.kill()
+                await feeder
+                returncode = await process.wait()
+                if returncode != 0 and not stopped_early:
+                    stderr = (await stderr_task).decode('utf-8', errors='replace').strip()
+                    raise Exception(f"ffmpeg转换失败: {stderr[-500:] or f'exit code {returncode}'}")
+                if transcribe_error:
+                    raise transcribe_error
+                return text
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                for task in (feeder, stderr_task):
+                    if not task.done():
+                        task.cancel()
+                await asyncio.gather(feeder, stderr_task, return_exceptions=True)
+
+    async def _transcribe_wav_file(self, wav_path: str) -> str:
         """
-        使用 ffmpeg 将 WebM 文件转换为 WAV (PCM格式)
-        科大讯飞要求：16kHz, 16bit, 单声道, PCM编码
-        
-        Args:
-            webm_path: WebM文件路径
-            output_path: 输出WAV文件路径
-            
-        Returns:
-            转换后的WAV文件路径
+        转写 WAV 文件为文本：从磁盘逐块读取 PCM（每次 FILE_READ_MS），按需下混/重采样到 16kHz 单声道，
+        不把整个文件读入内存，内存占用与文件时长无关；读文件和重采样在线程池中执行，不阻塞事件循环
         """
-        # ffmpeg命令：转换为PCM格式的WAV
-        # -ar 16000: 采样率16kHz
-        # -ac 1: 单声道
-        # -sample_fmt s16: 16bit PCM
-        # -f wav: 输出格式为WAV
-        cmd = [
-            'ffmpeg',
-            '-i', webm_path,
-            '-ar', '16000',  # 采样率
-            '-ac', '1',      # 单声道
-            '-sample_fmt', 's16',  # 16bit PCM
-            '-f', 'wav',     # 输出格式
-            '-y',            # 覆盖输出文件
-            output_path
-        ]
-        
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            if not os.path.exists(output_path):
-                raise Exception(f"转换失败：输出文件不存在 {output_path}")
-            return output_path
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"ffmpeg转换失败: {e.stderr}")
-        except FileNotFoundError:
-            raise Exception("未找到ffmpeg工具，请确保已安装ffmpeg并添加到系统PATH")
-    
-    async def transcribe_audio_file(self, audio_file_path: str) -> str:
+            wav = await asyncio.to_thread(wave.open, wav_path, 'rb')
+        except (wave.Error, EOFError) as e:
+            raise Exception(f"WAV 文件格式错误: {str(e) or '文件不完整'}")
+        with wav:
+            if wav.getsampwidth() != SAMPLE_WIDTH or wav.getcomptype() != "NONE":
+                raise Exception("仅支持 16bit PCM 编码的 WAV 文件")
+            try:
+                resampler = create_resampler(wav.getframerate(), wav.getnchannels())
+            except ValueError as e:
+                raise Exception(f"不支持的 WAV 格式: {e}")
+            frames_per_read = max(1, wav.getframerate() * FILE_READ_MS // 1000)
+
+            def read_chunk() -> Optional[bytes]:
+                """读取并转换下一块，文件结束时返回 None"""
+                data = wav.readframes(frames_per_read)
+                if not data:
+                    return None
+                return data if resampler.passthrough else resampler.process(data)
+
+            async def read_pcm():
+                try:
+                    while True:
+                        data = await asyncio.to_thread(read_chunk)
+                        if data is None:
+                            break
+                        yield data
+                except (wave.Error, EOFError) as e:
+                    raise Exception(f"WAV 文件格式错误: {str(e) or '文件不完整'}")
+                if not resampler.passthrough:
+                    yield resampler.flush()
+
+            return await self._transcribe_pcm(read_pcm())
+
+    async def _transcribe_pcm(self, pcm_chunks: AsyncIterator[bytes]) -> str:
         """
-        转录音频文件为文本
-        支持 WebM 和 WAV 格式，如果是 WebM 会自动转换为 WAV (PCM)
+        把 16kHz 单声道 PCM 块流发送到讯飞 RTASR，返回识别文本
+
+        - 收到第一块音频后才建立连接，转码失败或音频为空时不访问讯飞
+        - 裁掉静音后写入会话；不按实时速率限速，发送速度只受连接背压和会话缓冲约束
+        - 识别结果以增量消息异步收集，讯飞返回最后的结果并关闭连接（或 XUNFEI_RTASR_FILE_FINAL_TIMEOUT 超时）后返回
+        - 讯飞返回错误或在音频发送完之前关闭连接时抛出异常，不把中途截断的部分文本当作转写结果
         """
-        # 检查文件格式
-        file_ext = os.path.splitext(audio_file_path)[1].lower()
-        
-        # 如果是 WebM，需要先转换为 WAV
-        if file_ext == '.webm':
-            # 创建临时 WAV 文件
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_wav:
-                wav_path = tmp_wav.name
-            
-            try:
-                # 转换为 WAV
-                wav_path = self.convert_webm_to_wav(audio_file_path, wav_path)
-                # 使用转换后的文件进行转写
-                return await self._transcribe_wav_file(wav_path)
-            finally:
-                # 清理临时文件
-                if os.path.exists(wav_path):
-                    os.unlink(wav_path)
-        elif file_ext == '.wav':
-            # 直接转写 WAV 文件
-            return await self._transcribe_wav_file(audio_file_path)
-        else:
-            raise Exception(f"不支持的音频格式: {file_ext}，仅支持 .webm 和 .wav")
-    
-    async def _transcribe_wav_file(self, wav_path: str) -> str:
-        """转写 WAV 文件为文本"""
-        # 这里使用科大讯飞WebSocket API进行实时转写
-        # 简化实现：读取音频文件并转换为base64
-        
-        with open(wav_path, 'rb') as f:
-            audio_data = f.read()
-        
-        # 转换为base64
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-        
-        return await self.transcribe_audio_base64(audio_base64)
-    
-    async def transcribe_audio_base64(self, audio_base64: str, audio_format: str = "wav") -> str:
-        """从base64音频数据转写文本（简化版，实际需要使用WebSocket）"""
-        # 注意：这是一个简化实现
-        # 实际科大讯飞API需要：
-        # 1. 建立WebSocket连接
-        # 2. 发送音频数据流
-        # 3. 接收识别结果
-        
-        # 这里提供一个使用HTTP接口的简化实现（如果可用）
-        # 实际项目中应该使用WebSocket进行实时转写
-        
+        vad = StreamingVAD(aggressiveness=settings.voice_vad_aggressiveness) if settings.voice_vad_enabled else None
         try:
-            # 示例：使用HTTP接口（需要根据科大讯飞实际API文档调整）
-            async with httpx.AsyncClient() as client:
-                # 这里需要根据科大讯飞实际的HTTP API接口实现
-                # 当前为占位实现
-                pass
-        except Exception as e:
-            raise Exception(f"语音转写失败: {str(e)}")
-        
-        # 返回占位文本（实际应用中应该返回识别结果）
-        return "这是从语音转换的文本（需要实现科大讯飞WebSocket连接）"
-    
-    def transcribe_audio_sync(self, audio_base64: str) -> str:
-        """同步转写（使用WebSocket）"""
-        # 注意：这是一个占位实现
-        # 完整的科大讯飞WebSocket实现需要：
-        # 1. 建立WebSocket连接
-        # 2. 发送参数和音频数据
-        # 3. 接收并解析结果
-        
-        # 实际实现需要参考科大讯飞官方SDK
-        # 这里返回示例文本
-        return "语音转文本结果（需要完整实现WebSocket连接）"
+            data = await pcm_chunks.__anext__()
+        except StopAsyncIteration:
+            raise Exception("语音转写失败: 音频为空")
+
+        session = RealtimeASRSession(
+            self.generate_rtasr_auth_url(),
+            handshake_timeout=settings.xunfei_rtasr_handshake_timeout,
+            final_timeout=settings.xunfei_rtasr_file_final_timeout,
+            frame_bytes=settings.voice_realtime_frame_bytes,
+            buffer_bytes=settings.voice_realtime_buffer_ms * TARGET_SAMPLE_RATE * SAMPLE_WIDTH // 1000,
+            paced=False,
+            verbose=False,
+            # 增量消息大小与已识别文本长度无关；最终文本直接取 transcript 中的累积结果
+            protocol="delta",
+            snapshot_interval=0,
+        )
+        run_task = asyncio.create_task(session.run())
+        errors = []
+
+        async def collect_results():
+            while True:
+                message = await session.results.get()
+                if message is None:
+                    break
+                result = json.loads(message)
+                if result["type"] == "error":
+                    errors.append(f"[{result['code']}] {result['message']}")
+
+        collector = asyncio.create_task(collect_results())
+        completed = False  # 音频是否在连接关闭前全部写入会话
+        try:
+            while not session.closed:
+                if vad:
+                    data = vad.process(data)
+                if data:
+                    await session.write_audio(data)
+                try:
+                    data = await pcm_chunks.__anext__()
+                except StopAsyncIteration:
+                    completed = not session.closed
+                    break
+        finally:
+            session.finish()
+            await run_task
+            await collector
+            print(f"[RTASR] 文件转写: {session.get_stats()}")
+            if vad:
+                print(f"[VAD] 音频文件: {vad.get_stats()}")
+
+        text = session.transcript.acc_text + session.transcript.tail
+        if errors or not completed or session.get_stats()["bytes_dropped"]:
+            detail = errors[0] if errors else "讯飞连接提前关闭，音频未全部发送"
+            if text:
+                print(f"[RTASR] 文件转写中断，丢弃部分结果: {text}")
+            raise Exception(f"语音转写失败: {detail}")
+        if not text:
+            raise Exception("语音转写失败: 未识别到语音内容")
+        return text
+
+
+async def iter_bytes_chunks(data: bytes, chunk_size: int = UPLOAD_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """把内存中的音频按块产出"""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
+
+
+async def iter_upload_chunks(upload, chunk_size: int = UPLOAD_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """按块读取上传文件（任何带 async read(size) 的对象，如 FastAPI 的 UploadFile）"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def iter_file_chunks(path: str, chunk_size: int = UPLOAD_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """按块读取磁盘上的音频文件（打开和读取在线程池中执行，不阻塞事件循环）"""
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
 
 
 # 全局语音服务实例
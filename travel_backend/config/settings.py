@@ -13,16 +13,79 @@ class Settings(BaseSettings):
     xunfei_app_id: str = ""
     xunfei_api_key: str = ""
     xunfei_api_secret: str = ""
+    xunfei_rtasr_url: str = "wss://rtasr.xfyun.cn/v1/ws"  # 实时转写地址（压测时可指向本地模拟服务）
+    xunfei_rtasr_handshake_timeout: float = 5.0  # 等待讯飞握手的秒数
+    xunfei_rtasr_final_timeout: float = 3.0  # 发送结束标识后等待剩余识别结果的秒数
+    xunfei_rtasr_file_final_timeout: float = 30.0  # 文件转写发送完音频后等待识别完成的秒数（发送快于实时，需要更长）
     
     # 科大讯飞大模型 API 配置
     xunfei_llm_app_id: str = ""
     xunfei_llm_access_key_id: str = ""
     xunfei_llm_access_key_secret: str = ""
+    voice_vad_enabled: bool = True  # 上传到讯飞前用语音活动检测裁掉静音（按音频时长计费）
+    voice_vad_aggressiveness: int = 2  # 0-3，越高裁得越多
+    voice_vad_keepalive_ms: int = 2000  # 实时转写长静音期间每隔多久插入一帧静音保活，0为不插入
+    voice_realtime_snapshot_interval: int = 50  # 实时转写 delta 协议每多少条消息用一次完整快照代替增量，0为不发送
+    voice_realtime_frame_bytes: int = 1280  # 发往讯飞的固定帧长（1280字节=40ms）
+    voice_realtime_buffer_ms: int = 4000  # 每个会话的上行音频缓冲时长，满后对前端施加背压
+    voice_realtime_catchup_ms: int = 200  # 发送最多领先实时该时长，缓冲积压超过该时长时加速发送
+    voice_realtime_catchup_speed: float = 2.0  # 加速发送的倍速
+    voice_ffmpeg_path: str = "ffmpeg"  # 语音上传转码使用的 ffmpeg
+    voice_ffmpeg_max_concurrency: int = 4  # 同时运行的 ffmpeg 转码进程数，超出的请求排队
     
     # 地图 API 配置
-    map_api_type: Literal["amap", "baidu"] = "amap"
+    map_api_type: Literal["amap", "baidu", "local"] = "amap"  # local=本地夹具数据，不访问网络（压测/离线开发）
     amap_api_key: str = ""
     baidu_api_key: str = ""
+    map_fixture_path: str = ""  # 本地服务商的夹具文件（录制的POI和路线），留空则全部合成
+    map_fixture_latency_ms: float = 50  # 本地服务商模拟的请求延迟
+    map_fixture_latency_jitter_ms: float = 20  # 模拟延迟的随机抖动范围（±）
+    map_fixture_error_rate: float = 0.0  # 模拟请求失败的比例
+    map_fixture_throttle_rate: float = 0.0  # 模拟限流响应的比例（计入熔断）
+    map_fixture_seed: int = 0  # 延迟和错误注入的随机种子，便于复现压测结果
+    map_http_timeout_seconds: float = 10.0  # 地图API请求超时
+    map_http_max_connections: int = 20  # 共享连接池最大连接数
+    map_http_max_keepalive: int = 10  # 连接池保持的长连接数
+    map_place_qps: float = 20  # POI检索接口每秒请求数上限（令牌桶）
+    map_direction_qps: float = 20  # 路线规划/距离测量接口每秒请求数上限
+    map_staticmap_qps: float = 10  # 静态地图接口每秒请求数上限
+    map_limiter_max_concurrency: int = 16  # 每类接口自适应并发的上限
+    map_limiter_latency_target_ms: int = 1500  # 超过此延迟时并发上限减半
+    map_breaker_failure_threshold: int = 5  # 连续失败多少次后熔断
+    map_breaker_reset_seconds: float = 30  # 熔断后多久放行探测请求
+    amap_poi_lean_mode: bool = True  # 高德POI检索只请求基础字段（extensions=base）并流式解析需要的字段
+    map_poi_concurrent_search: bool = True  # 多关键词POI并发检索
+    map_poi_search_concurrency: int = 5  # 并发检索的最大并发数
+    map_poi_days_per_page: int = 2  # 行程每多这么多天，重要关键词多检索一页POI
+    map_poi_max_pages: int = 5  # 单个关键词最多检索的页数
+    map_poi_page_concurrency: int = 2  # 单个关键词同时请求的页数（每批之后检查是否已无新结果）
+    map_poi_anchor_mode: bool = False  # 锚点模式：景点全城检索并按天聚类出锚点，酒店、餐厅及其余关键词改为锚点周边检索
+    map_poi_max_anchors: int = 5  # 锚点（景点聚类中心）最多个数
+    map_poi_snap_max_meters: float = 300  # 未按ID/名称匹配到POI的活动，吸附到此距离内最近的已检索POI
+    map_poi_nearby_radius_walking: int = 1500  # 周边检索半径（米），按交通方式区分
+    map_poi_nearby_radius_transit: int = 3000
+    map_poi_nearby_radius_driving: int = 8000
+    map_cache_db_path: str = ""  # 地图缓存的SQLite文件路径，留空则只使用内存缓存
+    poi_cache_ttl_seconds: int = 86400  # POI缓存有效期
+    poi_cache_stale_seconds: int = 604800  # 过期后仍可先返回旧数据并后台刷新的时长
+    poi_cache_max_entries: int = 2000  # 内存中最多缓存的 (服务商, 城市, 关键词) 条目数
+    poi_keyword_usage_ttl_seconds: int = 2592000  # 提取关键词超过此时长未使用则不再统计（预热任务据此挑选常用关键词）
+    poi_keyword_usage_half_life_seconds: int = 604800  # 提取关键词使用次数的半衰期，近期使用的关键词排在前面
+    geocode_cache_ttl_seconds: int = 7776000  # 地点名称坐标缓存有效期（按城市、名称持久化，同一名称不重复请求）
+    geocode_cache_max_entries: int = 5000  # 内存中最多缓存的 (服务商, 城市, 名称) 条目数
+    map_eta_concurrency: int = 8  # 批量计算路线耗时的最大并发数
+    map_use_distance_matrix: bool = True  # 驾车/步行路段使用高德距离测量接口（多起点一终点）批量计算
+    eta_estimate_below_meters: float = 800  # 直线距离低于此值的路段直接本地估算，不调用地图API
+    eta_estimator_calibrate_every: int = 50  # 每收到多少条真实耗时重新校准一次本地估算参数
+    eta_cache_ttl_seconds: int = 604800  # 路线耗时缓存有效期
+    eta_cache_max_entries: int = 20000  # 内存中最多缓存的路线条数
+    eta_cache_coord_precision: int = 3  # 坐标量化保留的小数位数（3位约100米），相近的点共用缓存
+    map_render_backend: Literal["amap", "local"] = "amap"  # 每日地图：amap=高德静态地图，local=本地渲染PNG（离线可用）
+    map_static_max_labels: int = 10  # 静态地图最多显示的地点名标签数（按景点 > 酒店 > 其他 > 餐饮的优先级保留）
+    map_label_font_path: str = "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc"  # 本地渲染地点名标签的字体（需支持中文，需安装 Pillow），不存在时只绘制序号
+    map_static_url_max_bytes: int = 4000  # 静态地图请求URL长度上限，超出时简化路径、减少标签和标注点，仍超出则改为本地渲染
+    map_image_store_dir: str = "data/map_images"  # 地图图片存储目录（按内容哈希保存）
+    map_image_base_url: str = ""  # 地图图片地址前缀，留空则使用相对路径 /api/v1/maps/...
     
     # Supabase 配置
     supabase_url: str = ""
@@ -66,7 +66,8 @@ CREATE TABLE IF NOT EXISTS trip_maps (
     map_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     trip_id UUID NOT NULL REFERENCES trip_headers(trip_id) ON DELETE CASCADE,
     day_number INTEGER NOT NULL,
-    map_url TEXT NOT NULL,  -- 高德静态地图API返回的图片URL或base64编码
+    map_url TEXT NOT NULL,  -- 地图图片地址：/api/v1/maps/<哈希>.png（旧数据为高德静态地图URL）
+    map_hash TEXT,  -- 地图图片内容哈希（sha256），相同参数的地图共用一张图片
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW(),
     UNIQUE(trip_id, day_number)  -- 确保每个行程的每一天只有一张地图
@@ -81,6 +82,9 @@ CREATE INDEX IF NOT EXISTS idx_expenses_timestamp ON expenses(timestamp);
 CREATE INDEX IF NOT EXISTS idx_trip_maps_trip_id ON trip_maps(trip_id);
 CREATE INDEX IF NOT EXISTS idx_trip_maps_trip_day ON trip_maps(trip_id, day_number);
 
+-- 已有数据库升级：添加地图内容哈希列
+ALTER TABLE trip_maps ADD COLUMN IF NOT EXISTS map_hash TEXT;
+
 -- 添加更新时间触发器函数
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
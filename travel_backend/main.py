@@ -1,8 +1,9 @@
 """FastAPI 应用入口"""
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, plan, budget
+from app.api import auth, plan, budget, maps
 from app.api import voice_realtime
+from app.services.map_service import map_service
 from config import settings
 
 # 创建FastAPI应用实例
@@ -27,6 +28,19 @@ app.include_router(auth.users_router)
 app.include_router(plan.router)
 app.include_router(budget.router)
 app.include_router(voice_realtime.router)
+app.include_router(maps.router)
+
+
+@app.on_event("startup")
+async def startup():
+    """用已缓存的真实路线耗时校准本地耗时估算"""
+    map_service.calibrate_eta_estimator()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """应用关闭时释放共享连接池"""
+    await map_service.aclose()
 
 
 @app.get("/")
@@ -0,0 +1,112 @@
+"""
+语音文件转写压测：把不同时长的 WAV 文件经 VoiceService.transcribe_audio_file 流式发送到本地模拟的讯飞 RTASR 服务
+
+在子进程中启动 scripts/fake_rtasr_server.py，合成若干时长的 WAV（语音频段的间歇音，部分为 48kHz 双声道以覆盖重采样），
+输出每个文件的转写耗时、相对实时的倍速、发送的帧数，以及 tracemalloc 统计的 Python 内存峰值
+（应与文件时长无关，只取决于会话缓冲和读取块大小）。
+
+使用方法:
+    python scripts/benchmark_file_transcription.py [--minutes 1 10 30]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import socket
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import wave
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.voice_service import voice_service
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="语音文件流式转写压测")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 30], help="合成的文件时长（分钟）")
+    parser.add_argument("--port", type=int, default=0, help="模拟服务端口，0为自动选择")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_wav(path: str, minutes: float, rate: int, channels: int):
+    """按块写入间歇音（1 秒有声、0.5 秒静音），不在内存中生成整个文件"""
+    t = np.arange(int(rate * 1.5)) / rate
+    burst = sum(np.sin(2 * np.pi * f * t) for f in (220.0, 660.0, 1500.0)) * (0.2 * 32767)
+    burst[rate:] = 0
+    block = np.repeat(burst[:, None], channels, axis=1).astype("<i2").tobytes()
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        for _ in range(int(minutes * 60 / 1.5)):
+            wav.writeframes(block)
+
+
+async def transcribe(path: str) -> str:
+    return await voice_service.transcribe_audio_file(path)
+
+
+def main():
+    args = parse_args()
+    port = args.port or free_port()
+    server = subprocess.Popen(
+        [sys.executable, str(project_root / "scripts" / "fake_rtasr_server.py"), "--port", str(port)],
+        stdout=subprocess.PIPE, text=True
+    )
+    server.stdout.readline()  # 等待监听就绪
+    voice_service.rtasr_url = f"ws://127.0.0.1:{port}/v1/ws"
+
+    rows = []
+    stdout = sys.stdout
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for minutes in args.minutes:
+                for rate, channels in ((16000, 1), (48000, 2)):
+                    path = os.path.join(tmp_dir, f"{minutes}min_{rate}_{channels}.wav")
+                    write_wav(path, minutes, rate, channels)
+                    size_mb = os.path.getsize(path) / 1024 / 1024
+                    with open(os.devnull, "w") as devnull:
+                        sys.stdout = devnull
+                        try:
+                            started = time.perf_counter()
+                            text = asyncio.run(transcribe(path))
+                            elapsed = time.perf_counter() - started
+                            tracemalloc.start()
+                            asyncio.run(transcribe(path))
+                            _, peak = tracemalloc.get_traced_memory()
+                            tracemalloc.stop()
+                        finally:
+                            sys.stdout = stdout
+                    rows.append((f"{minutes:g}min {rate // 1000}k/{channels}ch", size_mb, elapsed,
+                                 minutes * 60 / elapsed, len(text), peak / 1024 / 1024))
+                    os.unlink(path)
+                    print(f"完成: {rows[-1][0]}", flush=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print("=" * 84)
+    print(f"{'文件':<20}{'大小MB':>10}{'耗时秒':>10}{'倍速':>10}{'识别字数':>10}{'内存峰值MB':>14}")
+    print("-" * 84)
+    for name, size_mb, elapsed, speed, chars, peak_mb in rows:
+        print(f"{name:<20}{size_mb:>10.1f}{elapsed:>10.2f}{speed:>9.0f}x{chars:>10}{peak_mb:>14.2f}")
+    print("=" * 84)
+    print("倍速 = 音频时长 / 转写耗时；内存峰值为 tracemalloc 统计的 Python 分配（含识别文本本身）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+地图流水线压测脚本（默认使用本地地图服务商，不消耗地图API配额）
+
+模拟 generate_full_itinerary 中的地图部分：POI检索 -> 组装每日活动 -> 批量计算路线耗时 -> 生成每日地图，
+多个行程并发执行，输出吞吐、单行程耗时分位数以及限流/缓存/请求合并统计。
+
+使用方法:
+    python scripts/benchmark_map_pipeline.py [--trips 50] [--concurrency 10] [--days 3]
+        [--latency-ms 50] [--error-rate 0.05] [--fixtures fixtures.json]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import random
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+CITIES = ["北京", "上海", "成都", "杭州", "西安", "重庆"]
+KEYWORDS = ["景点", "美食", "博物馆", "公园", "购物", "酒店"]
+MODES = ["driving", "walking", "transit"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="地图流水线压测")
+    parser.add_argument("--trips", type=int, default=50, help="模拟的行程数")
+    parser.add_argument("--concurrency", type=int, default=10, help="同时进行的行程数")
+    parser.add_argument("--days", type=int, default=3, help="每个行程的天数")
+    parser.add_argument("--activities", type=int, default=6, help="每天的活动数")
+    parser.add_argument("--provider", default="local", help="地图服务商 amap/baidu/local")
+    parser.add_argument("--latency-ms", type=float, default=None, help="本地服务商模拟延迟")
+    parser.add_argument("--error-rate", type=float, default=None, help="本地服务商模拟失败比例")
+    parser.add_argument("--throttle-rate", type=float, default=None, help="本地服务商模拟限流比例")
+    parser.add_argument("--fixtures", default=None, help="本地服务商夹具文件")
+    parser.add_argument("--seed", type=int, default=0, help="行程生成的随机种子")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """在导入配置之前设置环境变量，使 map_service 按压测参数创建服务商"""
+    os.environ["MAP_API_TYPE"] = args.provider
+    os.environ.setdefault("MAP_IMAGE_STORE_DIR", str(project_root / "data" / "benchmark_map_images"))
+    if args.latency_ms is not None:
+        os.environ["MAP_FIXTURE_LATENCY_MS"] = str(args.latency_ms)
+    if args.error_rate is not None:
+        os.environ["MAP_FIXTURE_ERROR_RATE"] = str(args.error_rate)
+    if args.throttle_rate is not None:
+        os.environ["MAP_FIXTURE_THROTTLE_RATE"] = str(args.throttle_rate)
+    if args.fixtures:
+        os.environ["MAP_FIXTURE_PATH"] = args.fixtures
+
+
+async def run_trip(map_service, rng: random.Random, days: int, activities_per_day: int) -> float:
+    """执行一个行程的地图流水线，返回耗时（秒）"""
+    from app.services.poi_registry import POIRegistry
+
+    started = time.perf_counter()
+    city = rng.choice(CITIES)
+    pois = await map_service.search_poi(city, keywords=KEYWORDS, days=days)
+    if not pois:
+        return time.perf_counter() - started
+    registry = POIRegistry(pois)
+
+    daily_activities = []
+    legs = []
+    for _ in range(days):
+        chosen = rng.sample(pois, min(activities_per_day, len(pois)))
+        activities = []
+        for poi in chosen:
+            poi = registry.get(poi["id"])
+            activities.append({"poi_id": poi["id"], "poi_name": poi["name"],
+                               "latitude": poi["lat"], "longitude": poi["lng"]})
+        for current, following in zip(chosen, chosen[1:]):
+            legs.append((current, following, rng.choice(MODES)))
+        daily_activities.append(activities)
+
+    await map_service.get_eta_batch(legs)
+    for activities in daily_activities:
+        await map_service.store_daily_map(activities)
+    return time.perf_counter() - started
+
+
+async def main():
+    args = parse_args()
+    configure_environment(args)
+
+    from app.services.map_service import map_service
+    from app.services.singleflight import singleflight
+
+    print(f"地图服务商: {map_service.api_type}，行程数: {args.trips}，并发: {args.concurrency}")
+    rng = random.Random(args.seed)
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+
+    async def limited_trip(trip_rng: random.Random) -> float:
+        async with semaphore:
+            return await run_trip(map_service, trip_rng, args.days, args.activities)
+
+    started = time.perf_counter()
+    durations = await asyncio.gather(*(
+        limited_trip(random.Random(rng.random())) for _ in range(args.trips)
+    ))
+    elapsed = time.perf_counter() - started
+
+    durations = sorted(durations)
+
+    def percentile(p: float) -> float:
+        return durations[min(len(durations) - 1, int(p * len(durations)))] * 1000
+
+    print("\n" + "=" * 60)
+    print(f"总耗时: {elapsed:.2f}s，吞吐: {args.trips / elapsed:.1f} 行程/秒")
+    print(f"单行程耗时 p50: {percentile(0.5):.0f}ms  p95: {percentile(0.95):.0f}ms  max: {durations[-1] * 1000:.0f}ms")
+    print("-" * 60)
+    for family, stats in map_service.get_limiter_stats().items():
+        print(f"限流 {family}: {stats}")
+    for namespace, stats in map_service.get_cache_stats().items():
+        print(f"缓存 {namespace}: {stats}")
+    print(f"请求合并: {singleflight.get_stats()}")
+    print("=" * 60)
+    await map_service.aclose()
+
+
+if __name__ == "__main__":
+    # 运行异步主函数
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+"""
+高德POI检索响应体积与解析耗时对比：extensions=all + 整体解析 vs extensions=base + 流式字段投影解析
+
+使用方法:
+    python scripts/benchmark_poi_parsing.py                         # 使用按高德字段结构合成的响应
+    python scripts/benchmark_poi_parsing.py --live 成都 景点 美食     # 使用真实响应（需要 AMAP_API_KEY）
+
+输出每个关键词（一页 20 条）的传输字节数（原始 / gzip）和解析耗时中位数。
+"""
+import sys
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.map_providers.streaming_json import StreamingArrayParser
+
+AMAP_POI_FIELDS = ("id", "name", "location", "type", "address")
+CHUNK_SIZE = 4096
+
+
+def synthetic_poi(rng: random.Random, idx: int, extensions: str) -> Dict[str, Any]:
+    """按高德 v3/place/text 返回的字段结构合成一条POI"""
+    lng, lat = 104.0 + rng.random() * 0.2, 30.5 + rng.random() * 0.2
+    poi = {
+        "id": f"B0FFG{rng.randint(10000, 99999)}",
+        "parent": [],
+        "name": f"成都宽窄巷子历史文化街区{idx}号",
+        "type": "风景名胜;风景名胜;风景名胜|科教文化服务;博物馆;博物馆",
+        "typecode": "110200|140100",
+        "biz_type": [],
+        "address": f"金河路口宽窄巷子{rng.randint(1, 200)}号",
+        "location": f"{lng:.6f},{lat:.6f}",
+        "tel": "028-86259233",
+        "distance": [],
+        "biz_ext": [],
+        "pname": "四川省",
+        "cityname": "成都市",
+        "adname": "青羊区",
+        "importance": [],
+        "shopid": [],
+        "shopinfo": "0",
+        "poiweight": [],
+        "gridcode": str(rng.randint(3000000000, 3999999999)),
+        "navi_poiid": f"H48F014002_{rng.randint(10000, 99999)}",
+        "match": "0",
+        "recommend": "3",
+        "timestamp": "2024-06-01 10:00:00",
+        "alias": "宽窄巷子",
+        "indoor_map": "0",
+        "groupbuy_num": "0",
+        "discount_num": "0",
+        "event": [],
+        "children": [],
+    }
+    if extensions == "all":
+        poi.update({
+            "tag": "盖碗茶,川剧变脸,三大炮,糖油果子,伤心凉粉,钟水饺,龙抄手,担担面",
+            "postcode": "610031",
+            "website": "www.kuanzhaixiangzi.cn",
+            "email": [],
+            "pcode": "510000",
+            "citycode": "028",
+            "adcode": "510105",
+            "entr_location": f"{lng + 0.0003:.6f},{lat - 0.0002:.6f}",
+            "exit_location": [],
+            "business_area": "宽窄巷子",
+            "indoor_data": {"cpid": [], "floor": [], "truefloor": [], "cmsid": []},
+            "biz_ext": {"rating": "4.7", "cost": "89.00", "meal_ordering": "0", "seat_ordering": "0",
+                        "ticket_ordering": "1", "hotel_ordering": "0"},
+            "children": [
+                {"id": f"B0FFH{rng.randint(10000, 99999)}", "name": f"宽窄巷子{gate}", "sname": gate,
+                 "location": f"{lng + 0.001:.6f},{lat:.6f}", "address": "宽窄巷子内",
+                 "distance": "120", "subtype": "出入口", "typecode": "991400"}
+                for gate in ("东门", "西门", "南门")
+            ],
+            "photos": [
+                {"title": [], "url": f"http://store.is.autonavi.com/showpic/{rng.getrandbits(128):032x}"}
+                for _ in range(3)
+            ],
+        })
+    return poi
+
+
+def synthetic_payload(extensions: str, seed: int) -> bytes:
+    rng = random.Random(seed)
+    body = {
+        "status": "1", "count": "356", "info": "OK", "infocode": "10000",
+        "suggestion": {"keywords": [], "cities": []},
+        "pois": [synthetic_poi(rng, idx, extensions) for idx in range(20)],
+    }
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def live_payload(city: str, keyword: str, extensions: str) -> bytes:
+    import httpx
+    from config import settings
+
+    response = httpx.get("https://restapi.amap.com/v3/place/text", params={
+        "key": settings.amap_api_key, "keywords": keyword, "city": city, "output": "json",
+        "offset": 20, "page": 1, "extensions": extensions
+    }, timeout=10)
+    response.raise_for_status()
+    return response.content
+
+
+def parse_full(raw: bytes) -> List[Dict[str, Any]]:
+    """改动前：整体解析后再取字段"""
+    data = json.loads(raw)
+    return [{field: poi[field] for field in AMAP_POI_FIELDS if field in poi} for poi in data.get("pois", [])]
+
+
+def parse_streaming(raw: bytes) -> List[Dict[str, Any]]:
+    """改动后：按网络分块喂入流式解析器，只保留需要的字段"""
+    parser = StreamingArrayParser("pois", AMAP_POI_FIELDS)
+    items = []
+    for start in range(0, len(raw), CHUNK_SIZE):
+        items.extend(parser.feed(raw[start:start + CHUNK_SIZE]))
+    items.extend(parser.close())
+    return items
+
+
+def median_ms(func: Callable[[bytes], Any], raw: bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(raw)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="高德POI响应体积与解析耗时对比")
+    parser.add_argument("--live", nargs="+", metavar="CITY_OR_KEYWORD",
+                        help="使用真实响应：第一个参数为城市，其余为关键词")
+    parser.add_argument("--repeat", type=int, default=200, help="每种解析方式重复次数")
+    args = parser.parse_args()
+
+    if args.live:
+        city, keywords = args.live[0], args.live[1:] or ["景点"]
+        samples: List[Tuple[str, bytes, bytes]] = [
+            (keyword, live_payload(city, keyword, "all"), live_payload(city, keyword, "base"))
+            for keyword in keywords
+        ]
+    else:
+        samples = [(f"合成#{seed}", synthetic_payload("all", seed), synthetic_payload("base", seed))
+                   for seed in range(3)]
+
+    print("=" * 96)
+    print(f"{'关键词':<10}{'all 字节':>10}{'all gzip':>10}{'base 字节':>11}{'base gzip':>11}"
+          f"{'all 整体解析':>14}{'base 整体解析':>14}{'base 流式投影':>14}")
+    print("-" * 96)
+    for keyword, raw_all, raw_base in samples:
+        assert parse_full(raw_base) == parse_streaming(raw_base)
+        print(f"{keyword:<10}{len(raw_all):>10}{len(gzip.compress(raw_all)):>10}"
+              f"{len(raw_base):>11}{len(gzip.compress(raw_base)):>11}"
+              f"{median_ms(parse_full, raw_all, args.repeat):>12.3f}ms"
+              f"{median_ms(parse_full, raw_base, args.repeat):>12.3f}ms"
+              f"{median_ms(parse_streaming, raw_base, args.repeat):>12.3f}ms")
+    print("=" * 96)
+
+
+if __name__ == "__main__":
+    main()
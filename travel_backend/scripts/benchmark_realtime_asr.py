@@ -0,0 +1,322 @@
+"""
+实时转写桥接压测：线程版（每路一个 websocket-client 线程 + 轮询队列）vs asyncio 版（RealtimeASRSession）
+
+在子进程中启动本地模拟的讯飞 RTASR 服务（scripts/fake_rtasr_server.py），本进程按 /api/v1/voice/realtime
+路由的方式驱动 N 路并发会话：每路每 40ms 放入 1280 字节 PCM，并把识别结果"推送给前端"。
+输出本进程的 CPU 耗时（不含模拟服务端）、每块音频到识别结果推送的延迟分位数、结果送达率、线程数峰值，
+以及该并发下是否仍保持实时（p95 延迟不超过 --max-p95-ms、结果送达率不低于 99%）。
+单进程单核下仍保持实时的最大并发即为"每核可承载的路数"。
+
+使用方法:
+    python scripts/benchmark_realtime_asr.py [--sessions 10 20 50 100 200] [--seconds 10] [--modes thread asyncio]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import queue
+import random
+import re
+import resource
+import socket
+import ssl
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import websocket
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.voice_service import RTASRTranscript, voice_service
+
+CHUNK_BYTES = 1280  # 40ms 16kHz 16bit 单声道
+CHUNK_SECONDS = 0.04
+SEQ_RE = re.compile(r"#(\d{6})$")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="实时转写桥接压测（线程版 vs asyncio 版）")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 20, 50, 100, 200],
+                        help="并发路数，可给多个")
+    parser.add_argument("--seconds", type=float, default=10, help="每路发送的音频时长")
+    parser.add_argument("--modes", nargs="+", choices=["thread", "asyncio"], default=["thread", "asyncio"])
+    parser.add_argument("--max-p95-ms", type=float, default=300, help="判定为实时的 p95 延迟上限")
+    parser.add_argument("--port", type=int, default=0, help="模拟服务端口，0为自动选择")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_server(port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, str(project_root / "scripts" / "fake_rtasr_server.py"), "--port", str(port)],
+        stdout=subprocess.PIPE, text=True
+    )
+    process.stdout.readline()  # 等待监听就绪
+    return process
+
+
+def cpu_seconds() -> float:
+    """本进程（含所有线程）的 CPU 耗时"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def start_realtime_proxy(audio_queue, result_queue, stop_event):
+    """
+    改动前的线程版桥接（仅用于对比，生产路由使用 VoiceService.create_realtime_session）：
+    - 在子线程中建立到讯飞 RTASR 的 WebSocket 连接
+    - 从 audio_queue 读取二进制PCM块，直接作为 binary message 发送
+    - 接收 text message(JSON)，解析后将识别文本写入 result_queue
+    - stop_event 置位后，发送结束帧并关闭连接
+    """
+    ws_url = voice_service.generate_rtasr_auth_url()
+    print(f"[RTASR] Connecting to: {ws_url}")
+    ws_ready = threading.Event()  # 用于标记WebSocket连接已就绪
+    ws_instance = None  # 保存WebSocket实例，用于发送数据
+    transcript = RTASRTranscript()
+
+    def on_open(ws):
+        nonlocal ws_instance
+        ws_instance = ws
+        print("[RTASR] WebSocket opened")
+        result_queue.put("[WS_OPEN]")
+
+    def on_message(ws, message):
+        event, text = transcript.handle(message)
+        if text:
+            result_queue.put(text)
+        if event == "started":
+            ws_ready.set()  # 标记连接已就绪，可以开始发送音频
+
+    def on_error(ws, error):
+        print(f"[RTASR] WebSocket error: {error}")
+        result_queue.put(f"[WS_ERROR] {error}")
+
+    def on_close(ws, *args):
+        print("[RTASR] WebSocket closed")
+        result_queue.put("[WS_CLOSED]")
+        ws_ready.clear()
+
+    ws = websocket.WebSocketApp(
+        ws_url,
+        on_open=on_open,
+        on_message=on_message,
+        on_error=on_error,
+        on_close=on_close,
+    )
+
+    def run_forever():
+        ws.run_forever(sslopt={"cert_reqs": ssl.CERT_NONE})
+
+    threading.Thread(target=run_forever, daemon=True).start()
+
+    # 等待连接建立和握手完成（最多等待5秒）
+    if not ws_ready.wait(timeout=5.0):
+        print("[RTASR] Handshake timeout")
+        result_queue.put("[ERROR] WebSocket握手超时")
+        stop_event.set()
+        return
+
+    # 音频发送循环：队列 get(timeout=0.1) 轮询
+    while not stop_event.is_set():
+        try:
+            chunk = audio_queue.get(timeout=0.1)
+        except Exception:
+            continue
+        if chunk is not None and ws_instance:
+            try:
+                ws_instance.send(bytes(chunk), opcode=websocket.ABNF.OPCODE_BINARY)
+                print(f"[RTASR] Sent audio chunk: {len(chunk)} bytes")
+            except Exception as e:
+                print(f"[RTASR] Send error: {e}")
+                result_queue.put(f"[SEND_ERROR] {str(e)}")
+                break
+
+    # 发送结束标识
+    if ws_instance:
+        try:
+            ws_instance.send(json.dumps({"end": True}))
+        except Exception:
+            pass
+        try:
+            ws_instance.close()
+        except Exception:
+            pass
+
+
+class SessionStats:
+    def __init__(self):
+        self.sent_at: Dict[int, float] = {}
+        self.latencies: List[float] = []
+        self.results = 0
+
+    def on_text(self, text: str):
+        """模拟推送给前端：按识别文本末尾的块序号计算延迟"""
+        match = SEQ_RE.search(text)
+        if match:
+            sent = self.sent_at.pop(int(match.group(1)), None)
+            if sent is not None:
+                self.results += 1
+                self.latencies.append(time.perf_counter() - sent)
+
+
+async def feed_audio(put, stats: SessionStats, chunks: int):
+    """按实时节奏放入音频，随机错开各路的起始相位"""
+    await asyncio.sleep(random.random() * CHUNK_SECONDS)
+    chunk = bytes(CHUNK_BYTES)
+    started = time.perf_counter()
+    for seq in range(1, chunks + 1):
+        stats.sent_at[seq] = time.perf_counter()
+        written = put(chunk)
+        if asyncio.iscoroutine(written):
+            await written
+        delay = started + seq * CHUNK_SECONDS - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def thread_session(stats: SessionStats, chunks: int):
+    """改动前的路由：子线程运行 start_realtime_proxy，结果队列用 get(timeout=0.1) 轮询"""
+    audio_queue: "queue.Queue[bytes]" = queue.Queue(maxsize=100)
+    result_queue: "queue.Queue[str]" = queue.Queue(maxsize=100)
+    stop_event = threading.Event()
+    proxy_thread = threading.Thread(
+        target=start_realtime_proxy,
+        args=(audio_queue, result_queue, stop_event),
+        daemon=True,
+    )
+    proxy_thread.start()
+
+    async def pump_results_to_client():
+        while not stop_event.is_set():
+            try:
+                text = result_queue.get(timeout=0.1)
+                if text:
+                    stats.on_text(text)
+            except Exception:
+                await asyncio.sleep(0.05)
+
+    def enqueue_audio(chunk: bytes):
+        try:
+            audio_queue.put_nowait(chunk)
+        except queue.Full:
+            try:
+                audio_queue.get_nowait()
+            except Exception:
+                pass
+            audio_queue.put_nowait(chunk)
+
+    pump_task = asyncio.create_task(pump_results_to_client())
+    await feed_audio(enqueue_audio, stats, chunks)
+    stop_event.set()
+    await pump_task
+    await asyncio.get_running_loop().run_in_executor(None, proxy_thread.join, 5)
+
+
+async def asyncio_session(stats: SessionStats, chunks: int):
+    """改动后的路由：RealtimeASRSession，结果到达即推送"""
+    session = voice_service.create_realtime_session()
+    session_task = asyncio.create_task(session.run())
+
+    async def pump_results_to_client():
+        while True:
+            text = await session.results.get()
+            if text is None:
+                break
+            stats.on_text(text)
+
+    pump_task = asyncio.create_task(pump_results_to_client())
+    await feed_audio(session.write_audio, stats, chunks)
+    session.finish()
+    await session_task
+    await pump_task
+
+
+async def run_mode(mode: str, sessions: int, chunks: int) -> Dict[str, float]:
+    session_func = thread_session if mode == "thread" else asyncio_session
+    stats = [SessionStats() for _ in range(sessions)]
+    peak_threads = threading.active_count()
+    done = asyncio.Event()
+
+    async def watch_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.5)
+
+    watcher = asyncio.create_task(watch_threads())
+    cpu_started, wall_started = cpu_seconds(), time.perf_counter()
+    await asyncio.gather(*(session_func(item, chunks) for item in stats))
+    cpu, wall = cpu_seconds() - cpu_started, time.perf_counter() - wall_started
+    done.set()
+    await watcher
+
+    latencies = sorted(value for item in stats for value in item.latencies)
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float("nan")
+
+    return {
+        "cpu": cpu, "wall": wall,
+        "p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99),
+        "results": sum(item.results for item in stats) / (sessions * chunks),
+        "threads": peak_threads,
+    }
+
+
+def main():
+    args = parse_args()
+    port = args.port or free_port()
+    server = start_fake_server(port)
+    voice_service.rtasr_url = f"ws://127.0.0.1:{port}/v1/ws"
+    chunks = int(args.seconds / CHUNK_SECONDS)
+
+    rows = []
+    stdout = sys.stdout
+    try:
+        for sessions in args.sessions:
+            for mode in args.modes:
+                # 桥接的逐块日志不计入输出
+                with open(os.devnull, "w") as devnull:
+                    sys.stdout = devnull
+                    try:
+                        result = asyncio.run(run_mode(mode, sessions, chunks))
+                    finally:
+                        sys.stdout = stdout
+                rows.append((mode, sessions, result))
+                print(f"完成: {mode} x {sessions}", flush=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print("=" * 100)
+    print(f"{'桥接':<10}{'并发':>6}{'CPU秒':>9}{'墙钟秒':>9}{'延迟p50':>11}{'p95':>10}"
+          f"{'p99':>10}{'结果送达率':>11}{'线程峰值':>9}{'实时':>6}")
+    print("-" * 100)
+    capacity: Dict[str, int] = {}
+    for mode, sessions, r in rows:
+        realtime = r["p95"] <= args.max_p95_ms and r["results"] >= 0.99
+        if realtime:
+            capacity[mode] = max(capacity.get(mode, 0), sessions)
+        print(f"{mode:<10}{sessions:>6}{r['cpu']:>9.2f}{r['wall']:>9.2f}"
+              f"{r['p50']:>9.1f}ms{r['p95']:>8.1f}ms{r['p99']:>8.1f}ms{r['results']:>10.1%}{r['threads']:>9}"
+              f"{'是' if realtime else '否':>6}")
+    print("=" * 100)
+    for mode in args.modes:
+        print(f"{mode}: 保持实时的最大并发 {capacity.get(mode, 0)} 路")
+    print("延迟 = 放入音频块到对应识别结果推送给前端；CPU 为本进程耗时，模拟服务端在子进程中运行")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+把地图缓存（SQLite）中录制的真实POI和路线导出为本地地图服务商的夹具文件
+使用方法: python scripts/export_map_fixtures.py <输出文件> [--provider amap]
+
+需要先配置 MAP_CACHE_DB_PATH 并用真实服务商运行过一段时间，导出后配置
+MAP_API_TYPE=local、MAP_FIXTURE_PATH=<输出文件> 即可离线重放。
+"""
+import sys
+import os
+import argparse
+import json
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings
+from app.data.cache_store import CacheStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出地图夹具")
+    parser.add_argument("output", help="输出的夹具JSON文件")
+    parser.add_argument("--provider", default="amap", help="导出哪个服务商录制的数据")
+    args = parser.parse_args()
+
+    if not settings.map_cache_db_path or not os.path.exists(settings.map_cache_db_path):
+        print("✗ 未配置 MAP_CACHE_DB_PATH 或文件不存在，没有可导出的数据")
+        sys.exit(1)
+
+    poi_cache = CacheStore(namespace="poi", max_entries=1, ttl_seconds=0, db_path=settings.map_cache_db_path)
+    eta_cache = CacheStore(namespace="eta", max_entries=1, ttl_seconds=0, db_path=settings.map_cache_db_path)
+
+    fixtures = {"pois": [], "routes": []}
+    # 第2页起的缓存键多一个页码，按页码顺序拼接成一组结果
+    pages = {}
+    for cache_key, pois in poi_cache.items():
+        provider, city, keyword, *page = json.loads(cache_key)
+        # 缓存值为 {"pois": [...], "raw_count": n}（旧版本为POI列表）
+        if isinstance(pois, dict):
+            pois = pois["pois"]
+        if provider == args.provider:
+            pages.setdefault((city, keyword), {})[page[0] if page else 1] = pois
+    for (city, keyword), by_page in pages.items():
+        results = []
+        # 只导出从第1页开始连续的页，缺页之后的结果无法按页码正确重放
+        page = 1
+        while page in by_page:
+            results.extend(by_page[page])
+            page += 1
+        if results:
+            fixtures["pois"].append({"city": city, "keyword": keyword, "results": results})
+    for cache_key, eta in eta_cache.items():
+        provider, mode, lat_a, lng_a, lat_b, lng_b = json.loads(cache_key)
+        # 本地估算的结果不是真实数据，不导出
+        if provider == args.provider and not eta.get("estimated"):
+            fixtures["routes"].append({
+                "mode": mode,
+                "from": [lat_a, lng_a],
+                "to": [lat_b, lng_b],
+                "duration_minutes": eta["duration_minutes"],
+                "distance_meters": eta.get("distance_meters", 0)
+            })
+    poi_cache.close()
+    eta_cache.close()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, ensure_ascii=False, indent=2)
+    print(f"✓ 已导出 {len(fixtures['pois'])} 组POI、{len(fixtures['routes'])} 条路线到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
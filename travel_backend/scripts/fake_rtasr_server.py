@@ -0,0 +1,94 @@
+"""
+本地模拟的讯飞 RTASR 实时转写服务（压测/离线开发用，不识别语音）
+
+协议与讯飞标准版一致：连接后返回 {"action": "started", "code": "0"}；每收到 --chunks-per-result 块音频
+返回一条中间结果（st.type="1"），每 --chunks-per-final 块返回一条最终结果（st.type="0"）；
+收到 {"end": true} 后返回剩余的最终结果并关闭连接。指定 --error-after 时，收到该块数后返回一条错误消息并关闭连接
+（模拟转写中途的上游错误）。
+
+识别文本为 "." * 本句已收到的块数 + "#<已收到的总块数，6位>"，压测脚本据此计算每块音频到识别结果的延迟。
+
+使用方法:
+    python scripts/fake_rtasr_server.py --port 8765
+    # .env 中配置 XUNFEI_RTASR_URL=ws://127.0.0.1:8765/v1/ws
+
+单元测试在同一事件循环中通过 start_server 启动（端口传 0 时由系统分配）。
+"""
+import argparse
+import asyncio
+import json
+
+import websockets
+
+
+def result_message(text: str, final: bool) -> str:
+    """按讯飞 RTASR 返回结构构造一条识别结果"""
+    inner = {"cn": {"st": {"type": "0" if final else "1", "bg": "0", "ed": "0",
+                           "rt": [{"ws": [{"cw": [{"w": text, "wp": "n"}], "wb": 0, "we": 0}]}]}},
+             "seg_id": 0}
+    return json.dumps({"action": "result", "code": "0", "desc": "success",
+                       "data": json.dumps(inner, ensure_ascii=False)}, ensure_ascii=False)
+
+
+# 模拟的上游错误（讯飞引擎错误）
+ERROR_CODE = "10700"
+ERROR_DESC = "engine error"
+
+
+async def handle(ws, chunks_per_result: int, chunks_per_final: int, error_after: int = 0):
+    await ws.send(json.dumps({"action": "started", "code": "0", "desc": "success", "sid": "fake"}))
+    received = 0
+    sentence = 0
+    async for message in ws:
+        if isinstance(message, str):
+            if json.loads(message).get("end"):
+                if sentence:
+                    await ws.send(result_message("." * sentence + f"#{received:06d}", final=True))
+                break
+            continue
+        received += 1
+        sentence += 1
+        if error_after and received >= error_after:
+            await ws.send(json.dumps({"action": "error", "code": ERROR_CODE, "desc": ERROR_DESC, "sid": "fake"}))
+            break
+        if sentence >= chunks_per_final:
+            await ws.send(result_message("." * sentence + f"#{received:06d}", final=True))
+            sentence = 0
+        elif received % chunks_per_result == 0:
+            await ws.send(result_message("." * sentence + f"#{received:06d}", final=False))
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, chunks_per_result: int = 1,
+                 chunks_per_final: int = 25, error_after: int = 0):
+    """返回模拟服务（async with 使用），监听端口见 server.sockets[0].getsockname()[1]"""
+    async def handler(ws, *args):
+        try:
+            await handle(ws, chunks_per_result, chunks_per_final, error_after)
+        except websockets.ConnectionClosed:
+            pass
+
+    return websockets.serve(handler, host, port, max_size=None, ping_interval=None)
+
+
+async def serve(host: str, port: int, chunks_per_result: int, chunks_per_final: int, error_after: int = 0):
+    async with start_server(host, port, chunks_per_result, chunks_per_final, error_after):
+        print(f"[FakeRTASR] 监听 ws://{host}:{port}/v1/ws", flush=True)
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟的讯飞 RTASR 实时转写服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chunks-per-result", type=int, default=1, help="每多少块音频返回一条中间结果")
+    parser.add_argument("--chunks-per-final", type=int, default=25, help="每多少块音频返回一条最终结果")
+    parser.add_argument("--error-after", type=int, default=0, help="收到多少块音频后返回错误并关闭连接，0为不模拟错误")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.chunks_per_result, args.chunks_per_final, args.error_after))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
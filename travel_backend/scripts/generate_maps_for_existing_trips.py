@@ -56,18 +56,19 @@ async def generate_maps_for_trip(trip_id: str, trip_name: str):
             continue
         
         try:
-            # 生成静态地图URL（使用最大尺寸1024*1024）
-            map_url = await map_service.generate_static_map(
+            # 生成地图图片（使用最大尺寸1024*1024）并按内容哈希保存
+            map_hash = await map_service.store_daily_map(
                 activities=valid_activities,
-                zoom=13,
                 size="1024*1024"
             )
+            map_url = map_service.map_image_url(map_hash)
             
             # 保存地图URL到数据库
             map_repo.save_map(
                 trip_id=trip_id,
                 day_number=day_number,
-                map_url=map_url
+                map_url=map_url,
+                map_hash=map_hash
             )
             
             print(f"  ✓ 第{day_number}天地图生成成功")
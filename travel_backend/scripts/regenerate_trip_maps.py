@@ -66,18 +66,19 @@ async def regenerate_trip_maps(trip_id: str):
         print(f"  ✓ 找到 {len(valid_activities)} 个有效坐标点")
         
         try:
-            # 生成静态地图URL（使用最大尺寸1024*1024）
-            map_url = await map_service.generate_static_map(
+            # 生成地图图片（使用最大尺寸1024*1024）并按内容哈希保存
+            map_hash = await map_service.store_daily_map(
                 activities=valid_activities,
-                zoom=13,
                 size="1024*1024"
             )
+            map_url = map_service.map_image_url(map_hash)
             
             # 保存或更新地图URL到数据库（会自动替换已有内容）
             map_repo.save_map(
                 trip_id=trip_id,
                 day_number=day_number,
-                map_url=map_url
+                map_url=map_url,
+                map_hash=map_hash
             )
             
             print(f"  ✓ 第{day_number}天地图生成并保存成功")
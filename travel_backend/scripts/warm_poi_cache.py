@@ -0,0 +1,167 @@
+"""
+热门城市POI缓存预热脚本
+使用方法:
+    python scripts/warm_poi_cache.py                     # 按历史行程目的地频次选取前 50 个城市
+    python scripts/warm_poi_cache.py 成都 北京 上海        # 指定城市
+    python scripts/warm_poi_cache.py --top-cities 100 --top-keywords 30 --concurrency 4
+
+预热结果写入 MAP_CACHE_DB_PATH 指向的 SQLite 缓存，服务进程在内存未命中时直接读取。
+每完成一个 (城市, 关键词) 就写一次检查点，中断后重新运行会从断点继续；上一次运行已全部完成时重新开始。
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings
+from app.services.map_service import map_service, BASE_POI_KEYWORDS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="热门城市POI缓存预热")
+    parser.add_argument("cities", nargs="*", help="要预热的城市，留空则按历史行程目的地频次选取")
+    parser.add_argument("--top-cities", type=int, default=50, help="按频次选取的城市数")
+    parser.add_argument("--top-keywords", type=int, default=20, help="除基础关键词外，预热最常用的提取关键词个数")
+    parser.add_argument("--keywords", nargs="*", default=[], help="额外指定的关键词")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的检索数（仍受 MAP_PLACE_QPS 限流）")
+    parser.add_argument("--force", action="store_true", help="缓存仍新鲜时也重新检索")
+    parser.add_argument("--checkpoint", default=str(project_root / "data" / "poi_warmup_checkpoint.json"),
+                        help="检查点文件")
+    parser.add_argument("--restart", action="store_true", help="忽略未完成的检查点，重新开始")
+    return parser.parse_args()
+
+
+def top_destinations(limit: int) -> List[str]:
+    """按 trip_headers.destination 出现频次选取热门城市"""
+    from app.data.trip_repository import get_trip_repository
+
+    destinations = get_trip_repository().get_recent_destinations()
+    counter = Counter(d.strip() for d in destinations if d and d.strip())
+    return [city for city, _ in counter.most_common(limit)]
+
+
+def build_keywords(args) -> List[str]:
+    """基础关键词 + 指定关键词 + 最常用的提取关键词（去重，保持顺序）"""
+    keywords = list(BASE_POI_KEYWORDS) + list(args.keywords)
+    keywords += [keyword for keyword, _ in map_service.top_keywords(args.top_keywords)]
+    deduped = []
+    for keyword in keywords:
+        if keyword and keyword not in deduped:
+            deduped.append(keyword)
+    return deduped
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    """先写临时文件再替换，中断时不会留下损坏的检查点"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def main():
+    args = parse_args()
+
+    if not settings.map_cache_db_path:
+        print("✗ 未配置 MAP_CACHE_DB_PATH，预热结果无法被服务进程读取")
+        sys.exit(1)
+
+    checkpoint = {} if args.restart else load_checkpoint(args.checkpoint)
+    if checkpoint and not checkpoint.get("finished_at") and checkpoint.get("provider") == map_service.api_type:
+        # 继续上一次未完成的运行，沿用当时的城市和关键词
+        cities, keywords = checkpoint["cities"], checkpoint["keywords"]
+        print(f"从检查点继续（开始于 {checkpoint['started_at']}）")
+    else:
+        cities = args.cities or top_destinations(args.top_cities)
+        keywords = build_keywords(args)
+        checkpoint = {
+            "provider": map_service.api_type,
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "cities": cities,
+            "keywords": keywords,
+            "done": {}
+        }
+        save_checkpoint(args.checkpoint, checkpoint)
+
+    if not cities:
+        print("✗ 没有可预热的城市")
+        sys.exit(1)
+
+    tasks = [(city, keyword) for city in cities for keyword in keywords]
+    done: Dict[str, str] = checkpoint["done"]
+    pending = [(city, keyword) for city, keyword in tasks if f"{city}|{keyword}" not in done]
+
+    print("=" * 60)
+    print(f"地图服务商: {map_service.api_type}")
+    print(f"城市 {len(cities)} 个，关键词 {len(keywords)} 个: {', '.join(keywords)}")
+    print(f"共 {len(tasks)} 项，已完成 {len(tasks) - len(pending)} 项，待处理 {len(pending)} 项")
+    print("=" * 60)
+
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    place_limiter = map_service.limiters["place"]
+    stats = Counter()
+    started = time.monotonic()
+
+    async def warm(city: str, keyword: str):
+        async with semaphore:
+            # 熔断期间暂停，等熔断器允许探测后再继续，不把任务记为失败
+            while map_service.is_degraded("place"):
+                print(f"  ⏸  POI检索接口熔断中，{place_limiter.breaker.reset_seconds:.0f}s 后重试")
+                await asyncio.sleep(place_limiter.breaker.reset_seconds)
+            status, count = await map_service.prefetch_poi(city, keyword, force=args.force)
+
+        stats[status] += 1
+        # 无结果的项不写入检查点，下次运行会重试
+        if status != "empty":
+            done[f"{city}|{keyword}"] = status
+            save_checkpoint(args.checkpoint, checkpoint)
+
+        finished = sum(stats.values())
+        elapsed = time.monotonic() - started
+        remaining = (len(pending) - finished) * elapsed / finished
+        mark = {"fetched": "✓", "cached": "⊘", "empty": "✗"}[status]
+        print(f"[{finished}/{len(pending)}] {mark} {city} / {keyword}: {count} 条"
+              f"（已用 {elapsed:.0f}s，预计剩余 {remaining:.0f}s）")
+
+    await asyncio.gather(*(warm(city, keyword) for city, keyword in pending))
+
+    if len(done) == len(tasks):
+        checkpoint["finished_at"] = datetime.now().isoformat()
+        save_checkpoint(args.checkpoint, checkpoint)
+
+    print("\n" + "=" * 60)
+    print("POI缓存预热完成！" if checkpoint["finished_at"] else "POI缓存预热结束，部分项无结果，下次运行将重试")
+    print("=" * 60)
+    print(f"  ✓ 新检索: {stats['fetched']} 项")
+    print(f"  ⊘ 缓存仍新鲜（跳过）: {stats['cached']} 项")
+    print(f"  ✗ 无结果或失败: {stats['empty']} 项")
+    print(f"  限流统计: {place_limiter.get_stats()}")
+    print("=" * 60)
+    await map_service.aclose()
+
+
+if __name__ == "__main__":
+    # 运行异步主函数
+    asyncio.run(main())
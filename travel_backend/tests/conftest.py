@@ -0,0 +1,47 @@
+"""
+单元测试公共配置
+
+- 必填配置给出占位值，测试不依赖 .env 中的真实密钥
+- 地图相关测试使用本地服务商（不访问网络）并关闭模拟延迟
+- 语音转写测试连接 scripts/fake_rtasr_server.py 在本进程中启动的模拟讯飞服务
+"""
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("QIANWEN_API_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test")
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings  # noqa: E402
+
+
+@pytest.fixture
+def local_map_service(monkeypatch):
+    """使用本地服务商、无模拟延迟、只有内存缓存的 MapService"""
+    from app.services.map_service import MapService
+
+    monkeypatch.setattr(settings, "map_api_type", "local")
+    monkeypatch.setattr(settings, "map_fixture_path", "")
+    monkeypatch.setattr(settings, "map_fixture_latency_ms", 0)
+    monkeypatch.setattr(settings, "map_fixture_latency_jitter_ms", 0)
+    monkeypatch.setattr(settings, "map_fixture_error_rate", 0.0)
+    monkeypatch.setattr(settings, "map_fixture_throttle_rate", 0.0)
+    monkeypatch.setattr(settings, "map_cache_db_path", "")
+    monkeypatch.setattr(settings, "map_poi_anchor_mode", False)
+    return MapService()
+
+
+@pytest.fixture(scope="session")
+def fake_rtasr():
+    """模拟讯飞 RTASR 服务的脚本模块，在测试的事件循环中用 start_server 启动"""
+    spec = importlib.util.spec_from_file_location("fake_rtasr_server", project_root / "scripts" / "fake_rtasr_server.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
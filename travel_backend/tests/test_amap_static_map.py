@@ -0,0 +1,107 @@
+"""高德静态地图参数：视野适配和请求URL长度限制"""
+import asyncio
+from urllib.parse import urlencode
+
+import httpx
+import pytest
+
+from config import settings
+from app.data.map_image_store import map_image_store
+from app.services.map_geometry import to_pixel
+from app.services.map_providers.amap import AMAP_STATIC_MAP_URL, AmapProvider
+from app.services.map_renderer import parse_size
+
+
+def make_provider():
+    return AmapProvider({}, lambda: httpx.AsyncClient(), api_key="k")
+
+
+def make_points(n, name_length=12):
+    return [
+        {"lat": 30.55 + 0.011 * (i % 7), "lng": 104.00 + 0.013 * (i // 7),
+         "name": f"{i:02d}" + "景" * name_length,
+         "activity_type": "Attraction" if i % 3 == 0 else "Meal_Lunch", "duration_minutes": 30 + i}
+        for i in range(n)
+    ]
+
+
+def url_length(params):
+    return len(AMAP_STATIC_MAP_URL) + len("?key=k&") + len(urlencode(params))
+
+
+def marker_letters(params):
+    return [part.split(":")[0].split(",")[-1] for part in params["markers"].split("|")]
+
+
+def test_all_points_inside_image():
+    points = make_points(12)
+    params = make_provider().static_map_params(points, None, "800*600")
+    center_lng, center_lat = map(float, params["location"].split(","))
+    width, height = parse_size(params["size"])
+    for point in points:
+        x, y = to_pixel(point["lat"], point["lng"], center_lat, center_lng, params["zoom"], width, height)
+        assert 0 <= x <= width and 0 <= y <= height
+
+
+def test_small_day_keeps_everything():
+    params = make_provider().static_map_params(make_points(6, name_length=3), None, "1024*1024")
+    assert marker_letters(params) == list("ABCDEF")
+    assert len(params["labels"].split("|")) == 6
+    assert "104.000000,30.550000" in params["markers"]
+
+
+def test_many_points_fit_budget_by_thinning_markers(monkeypatch):
+    monkeypatch.setattr(settings, "map_static_url_max_bytes", 700)
+    points = make_points(40)
+    params = make_provider().static_map_params(points, None, "1024*1024")
+    assert url_length(params) <= 700
+    assert "labels" not in params
+    kept = params["markers"].split("|")
+    assert 1 <= len(kept) <= 14
+    # 景点优先于餐饮保留，保留下来的标注点仍使用原来的字母（按游览顺序）
+    attractions = {
+        f"{chr(65 + i % 26)}:{point['lng']:.4f},{point['lat']:.4f}"
+        for i, point in enumerate(points) if point["activity_type"] == "Attraction"
+    }
+    assert all(part.split(",", 2)[2] in attractions for part in kept)
+
+
+def test_reduces_coordinate_precision_before_dropping_markers(monkeypatch):
+    points = make_points(20, name_length=0)
+    provider = make_provider()
+    full = provider.static_map_params(points, None, "1024*1024")
+    # 去掉标签、路径只保留首尾两点后仍超出 60 字节：5位小数节省 46 字节不够，4位小数节省 92 字节
+    shortest = {**full, "paths": "2,0x0000ff,1,,:" + ";".join(full["paths"].split(":")[1].split(";")[::len(points) - 1])}
+    shortest.pop("labels")
+    monkeypatch.setattr(settings, "map_static_url_max_bytes", url_length(shortest) - 60)
+    params = provider.static_map_params(points, None, "1024*1024")
+    assert url_length(params) <= settings.map_static_url_max_bytes
+    assert len(marker_letters(params)) == len(points)
+    assert "104.0000,30.5500" in params["markers"]
+
+
+def test_impossible_budget_raises(monkeypatch):
+    monkeypatch.setattr(settings, "map_static_url_max_bytes", 100)
+    with pytest.raises(ValueError):
+        make_provider().static_map_params(make_points(5), None, "1024*1024")
+
+
+def test_store_daily_map_falls_back_to_local_rendering(local_map_service, monkeypatch, tmp_path):
+    monkeypatch.setattr(map_image_store, "root_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "map_render_backend", "amap")
+    monkeypatch.setattr(settings, "map_static_url_max_bytes", 100)
+    provider = make_provider()
+
+    async def fetch_static_map(params):
+        raise AssertionError("超出长度限制时不应请求静态地图")
+
+    monkeypatch.setattr(provider, "fetch_static_map", fetch_static_map)
+    local_map_service.provider = provider
+    activities = [
+        {"latitude": point["lat"], "longitude": point["lng"], "poi_name": point["name"],
+         "activity_type": point["activity_type"], "estimated_duration_minutes": point["duration_minutes"]}
+        for point in make_points(5)
+    ]
+
+    content_hash = asyncio.run(local_map_service.store_daily_map(activities))
+    assert map_image_store.exists(content_hash)
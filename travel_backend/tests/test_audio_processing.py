@@ -0,0 +1,179 @@
+"""音频处理：流式重采样与分块方式无关、输出长度和下混，语音活动检测，上行音频环形缓冲"""
+import numpy as np
+import pytest
+
+from app.services.audio_processing import (
+    TARGET_SAMPLE_RATE, VAD_AGGRESSIVENESS, AudioFrameRing, StreamingResampler, StreamingVAD
+)
+
+
+def tone(rate, seconds, channels=1, frequency=1000.0, amplitude=8000):
+    t = np.arange(int(rate * seconds)) / rate
+    mono = (amplitude * np.sin(2 * np.pi * frequency * t)).astype("<i2")
+    return np.repeat(mono, channels).tobytes()
+
+
+def resample(pcm, rate, channels, chunk_sizes):
+    """按给定的分块大小（字节，循环使用）喂入，块边界可以落在样本中间"""
+    resampler = StreamingResampler(rate, channels)
+    out, pos, i = [], 0, 0
+    while pos < len(pcm):
+        size = chunk_sizes[i % len(chunk_sizes)]
+        out.append(resampler.process(pcm[pos:pos + size]))
+        pos += size
+        i += 1
+    out.append(resampler.flush())
+    return b"".join(out)
+
+
+@pytest.mark.parametrize("rate,channels", [(48000, 2), (44100, 1), (22050, 2), (8000, 1)])
+def test_output_independent_of_chunking(rate, channels):
+    pcm = tone(rate, 0.5, channels)
+    whole = resample(pcm, rate, channels, [len(pcm)])
+    assert resample(pcm, rate, channels, [1]) == whole
+    assert resample(pcm, rate, channels, [3, 1000, 7, 1763]) == whole
+
+
+@pytest.mark.parametrize("rate", [48000, 44100, 24000, 11025])
+def test_output_length_and_amplitude(rate):
+    seconds = 1.0
+    out = np.frombuffer(resample(tone(rate, seconds), rate, 1, [rate // 25 * 2]), dtype="<i2")
+    # flush 补足了滤波器延迟，输出比理想长度最多多出一个周期（up 个样本）和半个滤波器
+    resampler = StreamingResampler(rate)
+    expected = int(seconds * TARGET_SAMPLE_RATE)
+    assert expected <= len(out) <= expected + resampler.up + resampler.taps // 2
+    # 1kHz 测试音在通带内，幅度基本不变
+    steady = out[len(out) // 4:len(out) // 2].astype(np.float64)
+    assert abs(np.sqrt(2 * np.mean(steady ** 2)) - 8000) < 8000 * 0.02
+
+
+def test_stereo_is_downmixed_to_average():
+    left = np.full(4800, 6000, dtype="<i2")
+    right = np.full(4800, -2000, dtype="<i2")
+    pcm = np.column_stack((left, right)).ravel().tobytes()
+    out = np.frombuffer(resample(pcm, 48000, 2, [960]), dtype="<i2")
+    assert len(out) >= 1600
+    assert np.all(np.abs(out[400:1200] - 2000) <= 2)
+
+
+def test_passthrough_for_target_format():
+    pcm = tone(TARGET_SAMPLE_RATE, 0.1)
+    assert resample(pcm, TARGET_SAMPLE_RATE, 1, [5, 640]) == pcm
+
+
+def test_rejects_unsupported_format():
+    with pytest.raises(ValueError):
+        StreamingResampler(12345)
+    with pytest.raises(ValueError):
+        StreamingResampler(48000, channels=9)
+
+
+FRAME = 320  # VAD 帧长：16kHz 下 20ms
+
+
+def noise(frames, std, seed=0):
+    return np.random.default_rng(seed).normal(0, std, frames * FRAME)
+
+
+def sine(frames, amplitude):
+    return amplitude * np.sin(2 * np.pi * 440 * np.arange(frames * FRAME) / TARGET_SAMPLE_RATE)
+
+
+def pcm(*parts):
+    return np.concatenate(parts).round().clip(-32768, 32767).astype("<i2").tobytes()
+
+
+def run_vad(vad, data, chunk_bytes=1000):
+    """按与帧长不对齐的块喂入"""
+    return b"".join(vad.process(data[i:i + chunk_bytes]) for i in range(0, len(data), chunk_bytes))
+
+
+def test_vad_keeps_speech_with_preroll_and_hangover():
+    # 1 秒底噪、0.5 秒语音、2 秒底噪
+    data = pcm(noise(50, 30), sine(25, 8000), noise(100, 30, seed=1))
+    vad = StreamingVAD(aggressiveness=2)
+    out = run_vad(vad, data)
+
+    # 语音前补回 100ms（5 帧）起音，语音后保留 300ms（15 帧）尾音，其余静音全部裁掉
+    assert out == data[(50 - 5) * FRAME * 2:(75 + 15) * FRAME * 2]
+    assert vad.stats["speech_frames"] == 25
+    assert vad.get_stats()["saved_seconds"] == pytest.approx(3.5 - 0.9)
+
+
+def test_vad_long_silence_becomes_keepalive_frames():
+    vad = StreamingVAD(aggressiveness=2, keepalive_interval_ms=2000)
+    out = run_vad(vad, pcm(noise(500, 30)))
+    # 10 秒静音：起音缓冲之外丢弃的 495 帧中每 100 帧插入一帧数字静音
+    assert out == bytes(4 * FRAME * 2)
+    assert vad.stats["keepalive_frames"] == 4
+    assert run_vad(StreamingVAD(aggressiveness=2), pcm(noise(500, 30))) == b""
+
+
+@pytest.mark.parametrize("aggressiveness", sorted(VAD_AGGRESSIVENESS))
+def test_vad_aggressiveness_thresholds(aggressiveness):
+    # 只比底噪高约 10.5dB 的短促语音：激进程度 0、1（门限 6、9dB）保留，2、3（12、15dB）裁掉
+    std = 300
+    data = pcm(noise(50, std), sine(10, std * 10 ** 0.525 * 2 ** 0.5), noise(50, std, seed=1))
+    vad = StreamingVAD(aggressiveness=aggressiveness)
+    out = run_vad(vad, data)
+    if aggressiveness <= 1:
+        hangover = VAD_AGGRESSIVENESS[aggressiveness]["hangover_ms"] // 20
+        assert vad.stats["speech_frames"] == 10
+        assert len(out) == (5 + 10 + hangover) * FRAME * 2
+    else:
+        assert vad.stats["speech_frames"] == 0
+        assert out == b""
+
+
+def test_vad_rejects_unknown_aggressiveness():
+    with pytest.raises(ValueError):
+        StreamingVAD(aggressiveness=4)
+
+
+def drain(ring):
+    frames = []
+    while (frame := ring.peek_frame()) is not None:
+        frames.append(bytes(frame))
+        ring.advance()
+    return frames
+
+
+def test_ring_reframes_arbitrary_writes():
+    ring = AudioFrameRing(capacity_bytes=40, frame_bytes=10)
+    data = bytes(range(256)) * 2
+    out, pos, i = [], 0, 0
+    sizes = [3, 17, 1, 29, 8, 40]
+    while pos < len(data):
+        # 写入跨越缓冲末尾后回绕，读出的帧顺序和内容不变；每隔一次才读出，缓冲会被写满
+        pos += ring.write(data[pos:pos + sizes[i % len(sizes)]])
+        if i % 2:
+            out += drain(ring)
+        i += 1
+    out += drain(ring)
+    tail = ring.peek_tail()
+    if tail is not None:
+        out.append(bytes(tail))
+        ring.advance(len(tail))
+    assert b"".join(out) == data
+    assert all(len(frame) == 10 for frame in out[:-1])
+    assert ring.buffered == 0
+
+
+def test_ring_applies_backpressure_when_full():
+    ring = AudioFrameRing(capacity_bytes=25, frame_bytes=10)
+    # 容量向上取整为帧长的整数倍
+    assert ring.capacity == 30
+    assert ring.write(b"a" * 40) == 30
+    assert ring.free == 0
+    ring.drop(10)
+    frame = ring.peek_frame()
+    # peek 出的帧在 advance 之前不会被新写入覆盖
+    assert ring.write(b"b" * 5) == 0
+    assert bytes(frame) == b"a" * 10
+    ring.advance()
+    assert ring.write(b"b" * 10) == 10
+    assert drain(ring) == [b"a" * 10, b"a" * 10, b"b" * 10]
+    ring.write(b"c" * 7)
+    ring.discard()
+    assert ring.buffered == 0
+    assert ring.stats == {"bytes_written": 47, "bytes_dropped": 17, "frames_read": 4}
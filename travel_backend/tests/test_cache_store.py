@@ -0,0 +1,83 @@
+"""CacheStore：TTL、过期后返回旧数据、LRU 淘汰和 SQLite 持久层"""
+import asyncio
+import sqlite3
+
+from app.data import cache_store
+from app.data.cache_store import CacheStore
+
+
+def test_fresh_stale_and_expired(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_store.time, "time", lambda: now[0])
+    cache = CacheStore("t", ttl_seconds=10, stale_seconds=20)
+    cache.set(("amap", "成都", "景点"), [1])
+
+    assert cache.get(("amap", "成都", "景点")) == ([1], False)
+    now[0] += 15
+    assert cache.get(("amap", "成都", "景点")) == ([1], True)
+    now[0] += 20
+    assert cache.get(("amap", "成都", "景点")) == (None, False)
+    # 服务降级时仍可取回彻底过期的数据
+    assert cache.get(("amap", "成都", "景点"), allow_expired=True) == ([1], True)
+
+
+def test_lru_eviction():
+    cache = CacheStore("t", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") == (None, False)
+    assert cache.get("a") == (1, False)
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = CacheStore("poi", db_path=db_path)
+    cache.set(("amap", "成都", "景点"), [{"name": "武侯祠"}])
+    cache.close()
+
+    reopened = CacheStore("poi", db_path=db_path)
+    assert reopened.get(("amap", "成都", "景点")) == ([{"name": "武侯祠"}], False)
+    assert reopened.get_stats()["disk_hits"] == 1
+    reopened.close()
+
+
+def test_writes_in_event_loop_are_batched_off_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_store, "DISK_FLUSH_DELAY_SECONDS", 0.01)
+    db_path = str(tmp_path / "cache.db")
+    cache = CacheStore("eta", max_entries=1, db_path=db_path)
+
+    def rows():
+        with sqlite3.connect(db_path) as conn:
+            return conn.execute('SELECT COUNT(*) FROM "cache_eta"').fetchone()[0]
+
+    async def scenario():
+        for i in range(50):
+            cache.set(("k", i), i)
+        # 还未提交：被淘汰出内存的条目仍能从待写队列读到
+        assert rows() == 0
+        assert await cache.aget(("k", 0)) == (0, False)
+        await asyncio.sleep(0.2)
+        assert rows() == 50
+
+    asyncio.run(scenario())
+    cache.close()
+
+
+def test_aget_reads_disk_and_close_flushes_pending(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_store, "DISK_FLUSH_DELAY_SECONDS", 60)
+    db_path = str(tmp_path / "cache.db")
+    cache = CacheStore("geocode", db_path=db_path)
+
+    async def write():
+        cache.set("春熙路", {"lat": 30.65, "lng": 104.08})
+
+    asyncio.run(write())
+    cache.close()
+
+    reopened = CacheStore("geocode", db_path=db_path)
+    assert asyncio.run(reopened.aget("春熙路")) == ({"lat": 30.65, "lng": 104.08}, False)
+    reopened.close()
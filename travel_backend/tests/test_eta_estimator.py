@@ -0,0 +1,51 @@
+"""离线耗时估算：球面距离、批量估算和按真实耗时校准"""
+import numpy as np
+import pytest
+
+from app.services.eta_estimator import DEFAULT_SPEED_PROFILES, ETAEstimator, haversine_meters
+
+
+def test_haversine_one_degree_latitude():
+    assert haversine_meters(30.0, 104.0, 31.0, 104.0) == pytest.approx(111195, rel=1e-3)
+    assert haversine_meters(30.0, 104.0, 30.0, 104.0) == 0
+
+
+def test_estimate_many_matches_single_estimates():
+    estimator = ETAEstimator()
+    a, b, c = {"lat": 30.60, "lng": 104.05}, {"lat": 30.62, "lng": 104.08}, {"lat": 30.65, "lng": 104.02}
+    legs = [(a, b, "walking"), (b, c, "driving"), (c, a, "transit"), (a, a, "walking")]
+    batch = estimator.estimate_many(legs)
+    assert batch == [estimator.estimate(*leg) for leg in legs]
+    # 同一点不加固定耗时
+    assert batch[3]["duration_minutes"] == 0
+    # 未知交通方式按驾车估算
+    assert estimator.estimate(a, b, "cycling") == estimator.estimate(a, b, "driving")
+
+
+def test_calibrate_recovers_speed_detour_and_overhead():
+    estimator = ETAEstimator(min_samples=20)
+    rng = np.random.default_rng(0)
+    origin = {"lat": 30.60, "lng": 104.05}
+    for _ in range(60):
+        target = {"lat": 30.60 + rng.uniform(0.005, 0.08), "lng": 104.05 + rng.uniform(0.005, 0.08)}
+        straight = float(haversine_meters(origin["lat"], origin["lng"], target["lat"], target["lng"]))
+        road = straight * 1.6
+        minutes = 5.0 + road / 1000.0 / 30.0 * 60.0
+        estimator.observe(origin, target, "driving", {"duration_minutes": minutes, "distance_meters": road})
+
+    profiles = estimator.calibrate()
+    assert profiles["driving"]["detour"] == pytest.approx(1.6)
+    assert profiles["driving"]["speed_kmh"] == pytest.approx(30.0)
+    assert profiles["driving"]["overhead_minutes"] == pytest.approx(5.0)
+    # 样本不足的交通方式保持默认参数，默认参数本身不被修改
+    assert profiles["walking"] == DEFAULT_SPEED_PROFILES["walking"]
+    assert DEFAULT_SPEED_PROFILES["driving"]["speed_kmh"] == 25.0
+
+
+def test_observe_ignores_unusable_samples():
+    estimator = ETAEstimator()
+    a, b = {"lat": 30.60, "lng": 104.05}, {"lat": 30.6001, "lng": 104.05}
+    estimator.observe(a, b, "walking", {"duration_minutes": 2, "distance_meters": 15})
+    estimator.observe(a, {"lat": 30.61, "lng": 104.05}, "walking", {"duration_minutes": 0, "distance_meters": 0})
+    estimator.observe(a, {"lat": 30.61, "lng": 104.05}, "cycling", {"duration_minutes": 5, "distance_meters": 1200})
+    assert estimator.sample_count() == 0
@@ -0,0 +1,91 @@
+"""本地地图渲染：PNG 输出、序号标注和地点名标签"""
+import struct
+import zlib
+
+import pytest
+
+from config import settings
+from app.services.map_renderer import GLYPHS, MapRenderer, label_priority
+
+
+def make_points(n):
+    return [
+        {"lat": 30.60 + 0.004 * (i % 6), "lng": 104.05 + 0.006 * (i // 6), "name": f"景点{i}",
+         "activity_type": "Attraction" if i % 3 == 0 else "Meal_Lunch", "duration_minutes": 60 + i}
+        for i in range(n)
+    ]
+
+
+def decode_png(png):
+    """解析本渲染器输出的 PNG（8位 RGB，无滤波），返回 (宽, 高, 像素)"""
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    pos, idat = 8, b""
+    while pos < len(png):
+        length, tag = struct.unpack(">I4s", png[pos:pos + 8])
+        data = png[pos + 8:pos + 8 + length]
+        if tag == b"IHDR":
+            width, height = struct.unpack(">II", data[:8])
+        elif tag == b"IDAT":
+            idat += data
+        pos += 12 + length
+    raw = zlib.decompress(idat)
+    return width, height, raw
+
+
+def label_renderer():
+    """使用 Pillow 内置字体的渲染器（测试环境没有中文字体文件）"""
+    image_font = pytest.importorskip("PIL.ImageFont")
+    renderer = MapRenderer(font_path="builtin")
+    renderer._font = image_font.load_default(size=16)
+    renderer._font_loaded = True
+    return renderer
+
+
+def test_renders_valid_png_of_requested_size():
+    png = MapRenderer(font_path="").render(make_points(6), "640*480")
+    width, height, raw = decode_png(png)
+    assert (width, height) == (640, 480)
+    assert len(raw) == height * (1 + width * 3)
+
+
+def test_every_marker_number_has_glyphs():
+    # 超过 26 个点时序号仍各不相同
+    assert all(digit in GLYPHS for digit in "0123456789")
+    renderer = MapRenderer(font_path="")
+    assert decode_png(renderer.render(make_points(120), "1024*1024"))[:2] == (1024, 1024)
+
+
+def test_labels_follow_priority_and_limit(monkeypatch):
+    monkeypatch.setattr(settings, "map_static_max_labels", 3)
+    points = make_points(12)
+    params = label_renderer().render_params(points)
+
+    labelled = [idx for idx, _ in params["labels"]]
+    expected = sorted(sorted(range(12), key=lambda i: label_priority(points[i]))[:3])
+    assert labelled == expected
+    assert all(points[idx]["activity_type"] == "Attraction" for idx in labelled)
+    assert params["font"] is not None
+
+
+def test_labels_change_the_image_and_its_key():
+    points = make_points(4)
+    plain = MapRenderer(font_path="")
+    labelled = label_renderer()
+
+    assert plain.render_params(points)["labels"] == []
+    assert plain.render_params(points) != labelled.render_params(points)
+    assert plain.render(points) != labelled.render(points)
+
+
+def test_long_names_are_truncated():
+    points = make_points(1)
+    points[0]["name"] = "成都大熊猫繁育研究基地熊猫谷与熊猫乐园"
+    [[_, content]] = label_renderer().render_params(points)["labels"]
+    assert content == "成都大熊猫繁育研究基地熊..."
+
+
+def test_missing_font_falls_back_to_numbers_only():
+    renderer = MapRenderer(font_path="/nonexistent/font.ttc")
+    params = renderer.render_params(make_points(3))
+    assert params["labels"] == [] and params["font"] is None
+    assert renderer.render(make_points(3)).startswith(b"\x89PNG")
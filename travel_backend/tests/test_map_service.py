@@ -0,0 +1,300 @@
+"""MapService：多关键词并发检索、检索深度和翻页、锚点周边检索，地名批量解析，路线耗时缓存、批量计算和距离矩阵"""
+import asyncio
+
+from config import settings
+
+
+def test_gather_keywords_keeps_keyword_order_and_bounds_concurrency(local_map_service, monkeypatch):
+    monkeypatch.setattr(settings, "map_poi_concurrent_search", True)
+    monkeypatch.setattr(settings, "map_poi_search_concurrency", 2)
+    running = 0
+    peak = 0
+
+    async def search(keyword):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        # 先发起的关键词后完成，结果仍按关键词顺序返回
+        await asyncio.sleep(0.01 * (5 - len(keyword)))
+        running -= 1
+        return [keyword]
+
+    keywords = ["a", "bb", "ccc", "dddd"]
+    results = asyncio.run(local_map_service._gather_keywords(keywords, search))
+
+    assert results == [[k] for k in keywords]
+    assert peak == 2
+
+
+def test_concurrent_search_matches_sequential(local_map_service, monkeypatch):
+    keywords = ["景点", "餐厅", "连锁酒店", "博物馆"]
+    monkeypatch.setattr(settings, "map_poi_concurrent_search", True)
+    concurrent = asyncio.run(local_map_service.search_poi("成都", keywords=keywords, days=3))
+
+    local_map_service.poi_cache._memory.clear()
+    monkeypatch.setattr(settings, "map_poi_concurrent_search", False)
+    sequential = asyncio.run(local_map_service.search_poi("成都", keywords=keywords, days=3))
+
+    assert [p["id"] for p in concurrent] == [p["id"] for p in sequential]
+    assert len({(p["name"], p["lat"], p["lng"]) for p in concurrent}) == len(concurrent)
+
+
+def test_keyword_usage_decays_with_half_life(local_map_service, monkeypatch):
+    from app.services import map_service as map_service_module
+
+    monkeypatch.setattr(settings, "poi_keyword_usage_half_life_seconds", 100)
+    now = [1000.0]
+    monkeypatch.setattr(map_service_module.time, "time", lambda: now[0])
+
+    asyncio.run(local_map_service.record_keyword_usage(["博物馆", "博物馆", "博物馆", "博物馆"]))
+    now[0] += 200
+    asyncio.run(local_map_service.record_keyword_usage(["火锅", "火锅"]))
+
+    # 博物馆 4 次已衰减两个半衰期，排在刚用过 2 次的火锅之后
+    assert local_map_service.top_keywords(10) == [("火锅", 2.0), ("博物馆", 1.0)]
+    now[0] += 100
+    asyncio.run(local_map_service.record_keyword_usage(["博物馆"]))
+    assert local_map_service.top_keywords(1) == [("博物馆", 1.5)]
+
+
+def record_pages(service, monkeypatch, transform=None):
+    """记录服务商收到的 (关键词, 页码)，transform 可改写返回的页（模拟服务商过滤/重复）"""
+    requested = []
+    search_poi = service.provider.search_poi
+
+    async def recording_search_poi(city, keyword, page=1):
+        requested.append((keyword, page))
+        result = await search_poi(city, keyword, page)
+        return transform(result, page) if transform else result
+
+    monkeypatch.setattr(service.provider, "search_poi", recording_search_poi)
+    return requested
+
+
+def test_search_depth_follows_trip_length(local_map_service, monkeypatch):
+    requested = record_pages(local_map_service, monkeypatch)
+    keywords = ["景点", "餐厅", "连锁酒店", "博物馆"]
+    pois = asyncio.run(local_map_service.search_poi("成都", keywords=keywords, days=7))
+
+    pages = {keyword: sorted(p for k, p in requested if k == keyword) for keyword in keywords}
+    # 7 天：景点、餐厅各 4 页，提取的关键词减半为 2 页，连锁酒店始终 1 页
+    assert pages == {"景点": [1, 2, 3, 4], "餐厅": [1, 2, 3, 4], "连锁酒店": [1], "博物馆": [1, 2]}
+    assert len(pois) == 20 * (4 + 4 + 1 + 2)
+    assert [local_map_service.poi_page_count("景点", days) for days in (1, 2, 3, 4, 7, 30)] == [1, 1, 2, 2, 4, 5]
+
+
+def test_paging_stops_after_last_page(local_map_service, monkeypatch):
+    requested = record_pages(local_map_service, monkeypatch)
+    # 合成数据每个关键词 100 条（5 页）：第 6 页没有原始记录，不再请求之后的批次
+    results = asyncio.run(local_map_service._search_poi_keyword_pages("成都", "景点", 10))
+    assert len(results) == 100
+    assert max(page for _, page in requested) == 7
+
+
+def test_paging_continues_past_full_page_with_filtered_records(local_map_service, monkeypatch):
+    from app.services.map_providers import POIPage
+
+    # 服务商每页返回满 20 条，但第一条坐标无效被过滤：过滤后不足一页，仍应继续翻页
+    requested = record_pages(local_map_service, monkeypatch,
+                             lambda result, page: POIPage(result[1:], raw_count=result.raw_count))
+    results = asyncio.run(local_map_service._search_poi_keyword_pages("成都", "景点", 3))
+    assert [page for _, page in requested] == [1, 2, 3]
+    assert len(results) == 57
+
+
+def test_paging_stops_when_page_repeats(local_map_service, monkeypatch):
+    from app.services.map_providers import POIPage
+
+    first_page = []
+
+    def repeat_first_page(result, page):
+        if page == 1:
+            first_page.extend(result)
+        return POIPage(dict(poi) for poi in first_page)
+
+    monkeypatch.setattr(settings, "map_poi_page_concurrency", 1)
+    requested = record_pages(local_map_service, monkeypatch, repeat_first_page)
+    results = asyncio.run(local_map_service._search_poi_keyword_pages("成都", "景点", 5))
+    assert [page for _, page in requested] == [1, 2]
+    assert len(results) == 20
+
+
+def test_amap_page_keeps_raw_count_when_records_are_filtered(monkeypatch):
+    import httpx
+
+    from app.services.map_providers import AmapProvider
+
+    monkeypatch.setattr(settings, "amap_poi_lean_mode", False)
+    provider = AmapProvider({}, lambda: httpx.AsyncClient(), api_key="k")
+    raw = [{"id": f"B{i}", "name": f"景点{i}", "location": f"104.0{i},30.6{i}", "type": "风景名胜", "address": []}
+           for i in range(20)]
+    raw[5]["location"] = []
+
+    async def get_json(family, url, params):
+        return {"status": "1", "count": "200", "pois": raw}
+
+    monkeypatch.setattr(provider, "_get_json", get_json)
+    page = asyncio.run(provider.search_poi("成都", "景点"))
+    assert len(page) == 19
+    assert page.raw_count == 20
+
+
+def record_calls(monkeypatch, obj, name):
+    """记录对 obj.name（异步方法）的调用参数"""
+    calls = []
+    original = getattr(obj, name)
+
+    async def recording(*args, **kwargs):
+        calls.append(args)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(obj, name, recording)
+    return calls
+
+
+CHUNXI = {"lat": 30.6571, "lng": 104.0813}
+WUHOU = {"lat": 30.6462, "lng": 104.0484}
+PANDA = {"lat": 30.7352, "lng": 104.1454}
+KUANZHAI = {"lat": 30.6692, "lng": 104.0552}
+
+
+def test_nearby_points_share_eta_cache_entry(local_map_service, monkeypatch):
+    monkeypatch.setattr(settings, "eta_cache_coord_precision", 3)
+    calls = record_calls(monkeypatch, local_map_service.provider, "get_eta")
+
+    first = asyncio.run(local_map_service.get_eta(CHUNXI, WUHOU))
+    # 起终点各偏移约 10 米，量化后落在同一网格
+    nearby = asyncio.run(local_map_service.get_eta({"lat": 30.65712, "lng": 104.08126},
+                                                    {"lat": 30.64625, "lng": 104.04835}))
+    assert nearby == first
+    assert len(calls) == 1
+
+    # 交通方式或网格不同时是不同的缓存条目
+    asyncio.run(local_map_service.get_eta(CHUNXI, WUHOU, mode="walking"))
+    asyncio.run(local_map_service.get_eta(CHUNXI, PANDA))
+    assert len(calls) == 3
+    assert local_map_service.get_cache_stats()["eta"]["hits"] == 1
+
+
+def test_short_leg_is_estimated_without_api_call(local_map_service, monkeypatch):
+    calls = record_calls(monkeypatch, local_map_service.provider, "get_eta")
+    eta = asyncio.run(local_map_service.get_eta(CHUNXI, {"lat": 30.6581, "lng": 104.0823}, mode="walking"))
+    assert eta["estimated"] and eta["duration_minutes"] > 0
+    assert calls == []
+
+
+def test_itinerary_batch_makes_one_call_per_destination(local_map_service, monkeypatch):
+    monkeypatch.setattr(settings, "map_use_distance_matrix", True)
+    distance_calls = record_calls(monkeypatch, local_map_service.provider, "get_distance")
+    eta_calls = record_calls(monkeypatch, local_map_service.provider, "get_eta")
+    legs = [
+        (CHUNXI, WUHOU, "driving"),
+        (KUANZHAI, WUHOU, "driving"),
+        (PANDA, WUHOU, "driving"),
+        (CHUNXI, PANDA, "driving"),
+        (WUHOU, PANDA, "driving"),
+        ({"lat": 30.65712, "lng": 104.08126}, WUHOU, "driving"),  # 与第一段量化后相同
+        (CHUNXI, KUANZHAI, "transit"),
+        (CHUNXI, {"lat": 30.6581, "lng": 104.0823}, "walking"),  # 短距离，本地估算
+    ]
+
+    etas = asyncio.run(local_map_service.get_eta_batch(legs))
+
+    assert len(etas) == len(legs)
+    assert etas[5] == etas[0]
+    assert etas[7]["estimated"]
+    assert all(eta["duration_minutes"] > 0 for eta in etas)
+    # 驾车路段按终点分为两组（武侯祠、熊猫基地），各一次距离测量请求；公交路段逐段请求
+    assert sorted(len(origins) for origins, *_ in distance_calls) == [2, 3]
+    assert len(eta_calls) == 1
+
+    # 再次计算同一行程全部命中缓存
+    assert asyncio.run(local_map_service.get_eta_batch(legs))[:7] == etas[:7]
+    assert len(distance_calls) == 2 and len(eta_calls) == 1
+
+
+def test_distance_matrix_matches_per_leg_etas(local_map_service, monkeypatch):
+    points = [CHUNXI, WUHOU, PANDA, KUANZHAI]
+    monkeypatch.setattr(settings, "map_use_distance_matrix", True)
+    distance_calls = record_calls(monkeypatch, local_map_service.provider, "get_distance")
+    matrix = asyncio.run(local_map_service.get_distance_matrix(points, mode="driving"))
+    # 每个终点一次请求
+    assert len(distance_calls) == len(points)
+
+    local_map_service.eta_cache._memory.clear()
+    for i, origin in enumerate(points):
+        for j, destination in enumerate(points):
+            if i == j:
+                assert matrix.duration_minutes[i][j] == 0
+                continue
+            eta = asyncio.run(local_map_service.get_eta(origin, destination, "driving"))
+            assert matrix.duration_minutes[i][j] == eta["duration_minutes"]
+            assert matrix.distance_meters[i][j] == eta["distance_meters"]
+
+
+def test_anchor_mode_dedupes_pois_shared_by_clusters(local_map_service, monkeypatch):
+    from app.services.map_providers import POIPage
+
+    monkeypatch.setattr(settings, "map_poi_anchor_mode", True)
+    monkeypatch.setattr(settings, "map_poi_max_anchors", 5)
+    # 相邻锚点的周边检索返回同一批餐厅
+    shared = [
+        {"source_id": "local:shared-1", "name": "陈麻婆豆腐", "category": "餐厅", "lat": 30.6601, "lng": 104.0601,
+         "description": "餐厅"},
+        {"source_id": "local:shared-2", "name": "钟水饺", "category": "餐厅", "lat": 30.6502, "lng": 104.0702,
+         "description": "餐厅"},
+    ]
+    centers = []
+    search_poi_nearby = local_map_service.provider.search_poi_nearby
+
+    async def overlapping_search_poi_nearby(center, keyword, radius_meters, page=1):
+        centers.append((keyword, center["lat"], center["lng"]))
+        if keyword == "餐厅":
+            return POIPage(dict(poi) for poi in shared)
+        return await search_poi_nearby(center, keyword, radius_meters, page)
+
+    monkeypatch.setattr(local_map_service.provider, "search_poi_nearby", overlapping_search_poi_nearby)
+    pois = asyncio.run(local_map_service.search_poi("成都", keywords=["景点", "餐厅", "酒店"], days=3))
+
+    # 餐厅围绕 3 个锚点各检索一次，酒店只围绕景点中心检索一次
+    assert len({c for c in centers if c[0] == "餐厅"}) == 3
+    assert len([c for c in centers if c[0] == "酒店"]) == 1
+    restaurants = [poi for poi in pois if poi["category"] == "餐厅"]
+    assert [poi["name"] for poi in restaurants] == ["陈麻婆豆腐", "钟水饺"]
+    assert len({poi["id"] for poi in pois}) == len(pois)
+    assert any(poi["category"] == "景点" for poi in pois) and any(poi["category"] == "酒店" for poi in pois)
+
+
+def test_repeat_geocode_is_cache_hit(local_map_service, monkeypatch):
+    calls = record_calls(monkeypatch, local_map_service.provider, "geocode")
+
+    first = asyncio.run(local_map_service.geocode_batch("成都", ["宽窄巷子", "锦里", "宽窄巷子", " "]))
+    assert set(first) == {"宽窄巷子", "锦里"} and all(first.values())
+    assert calls == [("成都", ["宽窄巷子", "锦里"])]
+
+    # 已解析的名称读缓存，只请求新名称
+    second = asyncio.run(local_map_service.geocode_batch("成都", ["锦里", "春熙路"]))
+    assert second["锦里"] == first["锦里"]
+    assert calls[1] == ("成都", ["春熙路"])
+    asyncio.run(local_map_service.geocode_batch("成都", ["宽窄巷子", "春熙路"]))
+    assert len(calls) == 2
+
+    # 按服务商的批量上限分批
+    names = [f"地点{i}" for i in range(local_map_service.provider.geocode_max_batch + 2)]
+    asyncio.run(local_map_service.geocode_batch("成都", names))
+    assert [len(batch) for _, batch in calls[2:]] == [local_map_service.provider.geocode_max_batch, 2]
+
+
+def test_failed_geocode_batch_is_not_cached(local_map_service, monkeypatch):
+    geocode = local_map_service.provider.geocode
+    failures = [1]
+
+    async def flaky_geocode(city, names):
+        if failures:
+            failures.pop()
+            return None
+        return await geocode(city, names)
+
+    monkeypatch.setattr(local_map_service.provider, "geocode", flaky_geocode)
+    assert asyncio.run(local_map_service.geocode_batch("成都", ["锦里"])) == {"锦里": None}
+    assert asyncio.run(local_map_service.geocode_batch("成都", ["锦里"]))["锦里"] is not None
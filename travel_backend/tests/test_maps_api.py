@@ -0,0 +1,54 @@
+"""地图图片接口：内容哈希寻址和 ETag 协商缓存"""
+import hashlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import maps
+from app.data.map_image_store import map_image_store
+
+IMAGE = b"\x89PNG\r\n\x1a\nfake"
+CONTENT_HASH = hashlib.sha256(b"map").hexdigest()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(map_image_store, "root_dir", str(tmp_path))
+    map_image_store.put(CONTENT_HASH, IMAGE)
+    app = FastAPI()
+    app.include_router(maps.router)
+    return TestClient(app)
+
+
+def test_serves_image_with_immutable_caching(client):
+    response = client.get(f"/api/v1/maps/{CONTENT_HASH}.png")
+    assert response.status_code == 200
+    assert response.content == IMAGE
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["etag"] == f'"{CONTENT_HASH}"'
+    assert "immutable" in response.headers["cache-control"]
+
+
+@pytest.mark.parametrize("if_none_match", [
+    f'"{CONTENT_HASH}"',
+    f'W/"{CONTENT_HASH}"',
+    f'"other", W/"{CONTENT_HASH}"',
+    "*",
+])
+def test_if_none_match_returns_304(client, if_none_match):
+    response = client.get(f"/api/v1/maps/{CONTENT_HASH}.png", headers={"If-None-Match": if_none_match})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == f'"{CONTENT_HASH}"'
+
+
+def test_mismatched_etag_returns_image(client):
+    response = client.get(f"/api/v1/maps/{CONTENT_HASH}.png", headers={"If-None-Match": 'W/"other"'})
+    assert response.status_code == 200
+    assert response.content == IMAGE
+
+
+@pytest.mark.parametrize("name", ["0" * 64, "not-a-hash", CONTENT_HASH.upper()])
+def test_unknown_or_invalid_hash_is_404(client, name):
+    assert client.get(f"/api/v1/maps/{name}.png").status_code == 404
@@ -0,0 +1,88 @@
+"""POIRegistry：稳定短ID、查找、最近POI和 prompt 字段投影"""
+import random
+
+from app.services.eta_estimator import haversine_meters
+
+from app.services.poi_registry import POIRegistry, PROMPT_POI_FIELDS
+
+
+def make_pois(n):
+    return [
+        {"source_id": f"B0FFG{i:05d}", "name": f"景点{i}", "category": "景点",
+         "lat": 30.6 + i * 0.001, "lng": 104.0 + i * 0.001, "description": "风景名胜"}
+        for i in range(n)
+    ]
+
+
+def test_ids_are_stable_across_requests_and_order():
+    first = {p["source_id"]: p["id"] for p in POIRegistry.assign_ids(make_pois(50))}
+    shuffled = make_pois(50)
+    random.Random(1).shuffle(shuffled)
+    second = {p["source_id"]: p["id"] for p in POIRegistry.assign_ids(shuffled)}
+
+    assert first == second
+    assert all(poi_id.startswith("P") and len(poi_id) == 6 for poi_id in first.values())
+
+
+def test_duplicate_source_and_prefix_collisions_stay_unique():
+    pois = make_pois(3) + make_pois(1)  # 同一个服务商POI出现两次
+    POIRegistry.assign_ids(pois)
+    assert len({p["id"] for p in pois}) == 4
+    assert pois[3]["id"].startswith(pois[0]["id"])
+
+    # 1 位前缀只有 32 种，100 个POI 必然冲突，冲突的ID加长后仍唯一
+    many = POIRegistry.assign_ids(make_pois(100), min_length=1)
+    assert len({p["id"] for p in many}) == 100
+
+
+def test_pois_without_source_id_use_name_and_coordinates():
+    a = {"name": "春熙路", "lat": 30.657, "lng": 104.081}
+    b = {"name": "春熙路", "lat": 30.657, "lng": 104.081}
+    assert POIRegistry.assign_ids([a])[0]["id"] == POIRegistry.assign_ids([b])[0]["id"]
+
+
+def test_lookup_by_id_and_name():
+    registry = POIRegistry(make_pois(5))
+    poi = registry.pois[2]
+
+    assert registry.get(poi["id"]) is poi
+    assert registry.get("PXXXXX") is None
+    assert registry.get(None) is None
+    assert registry.find_by_name("景点2") is poi
+    assert registry.find_by_name("") is None
+
+
+def test_registry_assigns_ids_when_missing():
+    registry = POIRegistry(make_pois(3))
+    assert all(registry.get(p["id"]) is p for p in registry.pois)
+
+
+def test_prompt_view_drops_provider_fields():
+    registry = POIRegistry(make_pois(2))
+    view = registry.for_prompt()
+
+    assert [set(p) for p in view] == [set(PROMPT_POI_FIELDS)] * 2
+    assert view[0]["id"] == registry.pois[0]["id"]
+    assert "source_id" in registry.pois[0]
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(7)
+    pois = [{"name": f"点{i}", "lat": 30.5 + rng.random() * 0.3, "lng": 103.9 + rng.random() * 0.3}
+            for i in range(300)]
+    registry = POIRegistry(pois)
+    # 查询点在POI范围内、边缘和远处（远处走直接遍历分支）
+    queries = [(30.5 + rng.random() * 0.3, 103.9 + rng.random() * 0.3) for _ in range(50)]
+    queries += [(30.49, 103.89), (30.81, 104.21), (31.5, 105.0)]
+    for lat, lng in queries:
+        expected = min(pois, key=lambda p: float(haversine_meters(lat, lng, p["lat"], p["lng"])))
+        assert registry.nearest(lat, lng) is expected
+
+
+def test_nearest_respects_max_distance_and_missing_coordinates():
+    pois = make_pois(3) + [{"source_id": "B0NOCOORD", "name": "无坐标"}]
+    registry = POIRegistry(pois)
+    # 景点0 在 (30.6, 104.0)，0.001 度纬度约 111 米
+    assert registry.nearest(30.5995, 104.0, max_distance_meters=200) is pois[0]
+    assert registry.nearest(30.59, 104.0, max_distance_meters=200) is None
+    assert POIRegistry([]).nearest(30.6, 104.0) is None
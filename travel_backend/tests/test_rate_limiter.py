@@ -0,0 +1,173 @@
+"""出站限流：令牌桶、AIMD 并发、熔断器及其在取消时的行为"""
+import asyncio
+import time
+
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import (
+    AdaptiveConcurrencyLimiter, CircuitBreaker, OutboundLimiter, ProviderUnavailableError, TokenBucket
+)
+
+
+class FakeClock:
+    """只替换 rate_limiter 模块看到的时钟，事件循环仍使用真实时间"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", fake)
+    return fake
+
+
+def test_token_bucket_limits_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=50, burst=5)
+        started = time.monotonic()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # 前 5 个用积攒的令牌，其余 10 个按 50/s 发放
+    assert asyncio.run(scenario()) == pytest.approx(0.2, abs=0.08)
+
+
+def test_aimd_grows_additively_and_halves_on_overload(clock):
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=16, latency_target_seconds=1.0)
+        for _ in range(8):
+            await limiter.acquire()
+            await limiter.release(0.1, overloaded=False)
+        grown = limiter.limit
+        await limiter.acquire()
+        await limiter.release(0.1, overloaded=True)
+        halved = limiter.limit
+        # 冷却期内再次过载不再减半
+        await limiter.acquire()
+        await limiter.release(2.0, overloaded=False)
+        return grown, halved, limiter.limit
+
+    grown, halved, after_cooldown = asyncio.run(scenario())
+    assert 5 < grown < 6
+    assert halved == pytest.approx(grown / 2)
+    assert after_cooldown == halved
+
+
+def test_breaker_opens_then_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def open_limiter(clock, max_concurrency=2):
+    limiter = OutboundLimiter("test", qps=1000, max_concurrency=max_concurrency,
+                              failure_threshold=1, reset_seconds=30)
+    limiter.breaker.record_failure()
+    clock.now += 30
+    return limiter
+
+
+def test_cancelled_probe_is_released(clock):
+    limiter = open_limiter(clock)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def probe():
+            async with limiter.slot():
+                started.set()
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(probe())
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # 被取消的探测不算成功，下一个请求可以继续探测
+        assert limiter.breaker.state == "half_open"
+        async with limiter.slot():
+            pass
+
+    asyncio.run(scenario())
+    assert limiter.breaker.state == "closed"
+    assert limiter.stats["cancelled"] == 1
+    assert limiter.concurrency.inflight == 0
+
+
+def test_cancel_while_queued_does_not_hold_probe(clock):
+    limiter = open_limiter(clock, max_concurrency=2)  # 初始并发上限为 1
+
+    async def scenario():
+        await limiter.concurrency.acquire()  # 占满并发名额
+        queued = asyncio.create_task(limiter.slot().__aenter__())
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        await limiter.concurrency.release_unused()
+
+        async with limiter.slot():
+            pass
+
+    asyncio.run(scenario())
+    assert limiter.breaker.state == "closed"
+
+
+def test_cancelled_call_in_closed_state_is_not_a_success(clock):
+    limiter = OutboundLimiter("test", qps=1000, failure_threshold=2)
+
+    async def scenario():
+        with pytest.raises(Exception):
+            async with limiter.slot():
+                raise RuntimeError("boom")
+
+        started = asyncio.Event()
+
+        async def call():
+            async with limiter.slot():
+                started.set()
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(call())
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # 取消没有清零连续失败次数，再失败一次即熔断
+        with pytest.raises(Exception):
+            async with limiter.slot():
+                raise RuntimeError("boom")
+        with pytest.raises(ProviderUnavailableError):
+            async with limiter.slot():
+                pass
+
+    asyncio.run(scenario())
+    assert limiter.stats["errors"] == 2
+    assert limiter.stats["rejected"] == 1
@@ -0,0 +1,70 @@
+"""请求合并：相同键并发只执行一次，异常共享，取消互不影响"""
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight, normalize_key
+
+
+def test_normalize_key():
+    assert normalize_key("poi", " 成都 ", "Hot  Pot") == ("poi", "成都", "hot pot")
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    executions = 0
+
+    async def fetch():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return executions
+
+    async def main():
+        results = await asyncio.gather(*(flight.do(("poi", "成都"), fetch) for _ in range(5)))
+        # 结束后键已释放，再次调用重新执行
+        again = await flight.do(("poi", "成都"), fetch)
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert results == [1] * 5
+    assert again == 2
+    stats = flight.get_stats()
+    assert stats["poi"]["calls"] == 6
+    assert stats["poi"]["executions"] == 2
+    assert stats["poi"]["coalesced"] == 4
+    assert stats["inflight"] == 0
+
+
+def test_error_is_shared_by_all_waiters():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.do(("eta", 1), fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.get_stats()["eta"]["errors"] == 1
+
+
+def test_cancelled_waiter_does_not_cancel_call():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "ok"
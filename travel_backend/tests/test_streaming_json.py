@@ -0,0 +1,59 @@
+"""流式 JSON 解析：任意分块下与整体解析结果一致"""
+import json
+
+import pytest
+
+from app.services.map_providers.streaming_json import StreamingArrayParser
+
+FIELDS = ("id", "name", "location")
+
+RESPONSE = {
+    "status": "1",
+    "count": "3",
+    "info": "OK",
+    "pois": [
+        {"id": "B001", "name": "宽窄巷子", "location": "104.05,30.66", "photos": [{"url": "x"}], "rating": 4.8},
+        {"id": "B002", "name": "武侯祠 \"三国\"", "location": "104.04,30.64", "biz_ext": {"cost": []}},
+        {"id": "B003", "name": "杜甫草堂", "location": "104.03,30.66", "distance": 12345},
+    ],
+    "infocode": "10000",
+}
+
+
+def parse(data, chunk_size, fields=FIELDS):
+    parser = StreamingArrayParser("pois", fields)
+    items = []
+    for start in range(0, len(data), chunk_size):
+        items += parser.feed(data[start:start + chunk_size])
+    items += parser.close()
+    return parser, items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 100000])
+def test_any_chunking_matches_full_parse(chunk_size):
+    # 中文按 UTF-8 编码为多字节，小分块会把字符切开
+    data = json.dumps(RESPONSE, ensure_ascii=False, indent=1).encode("utf-8")
+    parser, items = parse(data, chunk_size)
+    assert items == [{field: poi[field] for field in FIELDS} for poi in RESPONSE["pois"]]
+    assert parser.header == {"status": "1", "count": "3", "info": "OK", "infocode": "10000"}
+
+
+def test_without_fields_keeps_whole_items():
+    data = json.dumps(RESPONSE).encode("utf-8")
+    _, items = parse(data, 5, fields=None)
+    assert items == RESPONSE["pois"]
+
+
+def test_trailing_number_is_not_cut():
+    data = b'{"pois": [1, 23, 456], "count": 789}'
+    parser, items = parse(data, 1, fields=None)
+    assert items == [1, 23, 456]
+    assert parser.header == {"count": 789}
+
+
+def test_truncated_document_raises():
+    data = json.dumps(RESPONSE).encode("utf-8")
+    parser = StreamingArrayParser("pois", FIELDS)
+    parser.feed(data[:len(data) // 2])
+    with pytest.raises(ValueError):
+        parser.close()
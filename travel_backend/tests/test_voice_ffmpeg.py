@@ -0,0 +1,171 @@
+"""ffmpeg 流式转码：stdin/stdout 管道、并发上限和 ffmpeg 缺失/提前退出（不需要安装 ffmpeg）"""
+import asyncio
+
+import pytest
+
+from config import settings
+from app.services import voice_service as voice_module
+from app.services.voice_service import VoiceService, iter_file_chunks
+
+
+class FakeStdin:
+    def __init__(self, process):
+        self.process = process
+
+    def write(self, chunk):
+        if self.process.broken_pipe:
+            raise BrokenPipeError()
+        self.process.received.append(bytes(chunk))
+        # 模拟的 ffmpeg 原样输出（输入视为已经是 16kHz PCM）
+        self.process.stdout.feed_data(chunk)
+
+    async def drain(self):
+        await asyncio.sleep(0.005)
+
+    def close(self):
+        self.process.exit(self.process.exit_code)
+
+
+class FakeProcess:
+    """模拟 ffmpeg 子进程：写入 stdin 的数据原样出现在 stdout，stdin 关闭后退出"""
+
+    running = 0
+    peak = 0
+
+    def __init__(self, args, broken_pipe=False, exit_code=0, stderr=b""):
+        self.args = args
+        self.broken_pipe = broken_pipe
+        self.exit_code = exit_code
+        self.received = []
+        self.returncode = None
+        self.stdin = FakeStdin(self)
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.stderr.feed_data(stderr)
+        self._exited = asyncio.Event()
+        FakeProcess.running += 1
+        FakeProcess.peak = max(FakeProcess.peak, FakeProcess.running)
+        if broken_pipe:
+            # ffmpeg 读到非法数据后立即退出
+            self.exit(exit_code)
+
+    def exit(self, code):
+        if self.returncode is None:
+            self.returncode = code
+            FakeProcess.running -= 1
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+            self._exited.set()
+
+    def kill(self):
+        self.exit(-9)
+
+    async def wait(self):
+        await self._exited.wait()
+        return self.returncode
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    """替换 asyncio.create_subprocess_exec，返回已创建的模拟进程列表；options 控制下一个进程的行为"""
+    processes = []
+    options = {}
+    FakeProcess.running = FakeProcess.peak = 0
+
+    async def create_subprocess_exec(*args, **kwargs):
+        if options.get("missing"):
+            raise FileNotFoundError(args[0])
+        process = FakeProcess(args, **{k: v for k, v in options.items() if k != "missing"})
+        processes.append(process)
+        return process
+
+    monkeypatch.setattr(voice_module.asyncio, "create_subprocess_exec", create_subprocess_exec)
+    return processes, options
+
+
+def make_service():
+    """_transcribe_pcm 替换为收集 PCM：只检查转码管道，不连接讯飞（并发上限在创建时读取配置）"""
+    service = VoiceService()
+    service.pcm = []
+
+    async def transcribe_pcm(pcm_chunks):
+        chunks = [chunk async for chunk in pcm_chunks]
+        service.pcm += chunks
+        return f"{sum(len(c) for c in chunks)} bytes"
+
+    service._transcribe_pcm = transcribe_pcm
+    return service
+
+
+@pytest.fixture
+def service():
+    return make_service()
+
+
+def test_streams_upload_through_ffmpeg_pipes(ffmpeg, service, monkeypatch):
+    processes, _ = ffmpeg
+    monkeypatch.setattr(settings, "voice_ffmpeg_path", "/opt/ffmpeg")
+    audio = bytes(range(256)) * 1000
+
+    text = asyncio.run(service.transcribe_audio_stream(audio))
+
+    assert text == f"{len(audio)} bytes"
+    assert b"".join(service.pcm) == audio
+    (process,) = processes
+    # 分块写入 stdin，按 16kHz 单声道 s16le 从 stdout 读取
+    assert len(process.received) == -(-len(audio) // voice_module.UPLOAD_CHUNK_BYTES)
+    assert process.args[0] == "/opt/ffmpeg"
+    assert process.args[process.args.index("-ar") + 1] == "16000"
+    assert process.args[-1] == "pipe:1"
+
+
+def test_file_chunks_are_read_in_order(ffmpeg, service, tmp_path):
+    path = tmp_path / "voice.webm"
+    path.write_bytes(b"0123456789" * 20000)
+
+    async def main():
+        return [chunk async for chunk in iter_file_chunks(str(path), chunk_size=4096)]
+
+    chunks = asyncio.run(main())
+    assert b"".join(chunks) == path.read_bytes()
+    assert all(len(c) == 4096 for c in chunks[:-1])
+    assert asyncio.run(service.transcribe_audio_file(str(path))) == "200000 bytes"
+
+
+def test_concurrent_ffmpeg_processes_are_bounded(ffmpeg, monkeypatch):
+    monkeypatch.setattr(settings, "voice_ffmpeg_max_concurrency", 2)
+    service = make_service()
+
+    async def main():
+        return await asyncio.gather(*(service.transcribe_audio_stream(b"x" * 200000) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["200000 bytes"] * 5
+    assert FakeProcess.peak == 2
+    assert FakeProcess.running == 0
+
+
+def test_missing_ffmpeg_raises_and_releases_slot(ffmpeg, monkeypatch):
+    _, options = ffmpeg
+    monkeypatch.setattr(settings, "voice_ffmpeg_max_concurrency", 1)
+    service = make_service()
+
+    async def main():
+        options["missing"] = True
+        with pytest.raises(Exception, match="未找到ffmpeg"):
+            await service.transcribe_audio_stream(b"abc")
+        # 并发名额已释放，下一个请求不会一直排队
+        options["missing"] = False
+        return await asyncio.wait_for(service.transcribe_audio_stream(b"abc"), timeout=1)
+
+    assert asyncio.run(main()) == "3 bytes"
+
+
+def test_ffmpeg_exiting_early_reports_stderr(ffmpeg, service):
+    processes, options = ffmpeg
+    options.update(broken_pipe=True, exit_code=1, stderr=b"pipe:0: Invalid data found when processing input\n")
+
+    with pytest.raises(Exception, match="ffmpeg转换失败: pipe:0: Invalid data found"):
+        asyncio.run(service.transcribe_audio_stream(b"not audio" * 10000))
+    assert processes[0].received == []
+    assert FakeProcess.running == 0
+
@@ -0,0 +1,62 @@
+"""文件转写端到端：WAV 读取 -> RealtimeASRSession -> 本地模拟的讯飞 RTASR 服务"""
+import asyncio
+import wave
+
+import numpy as np
+import pytest
+
+from config import settings
+from app.services.voice_service import VoiceService
+
+
+@pytest.fixture
+def transcribe(fake_rtasr, monkeypatch):
+    """启动模拟服务并转写文件，返回识别文本（失败时抛出转写的异常）"""
+    monkeypatch.setattr(settings, "voice_vad_enabled", False)
+    monkeypatch.setattr(settings, "voice_realtime_frame_bytes", 1280)
+    monkeypatch.setattr(settings, "xunfei_rtasr_file_final_timeout", 2.0)
+
+    def run(path, **server_options):
+        async def main():
+            async with fake_rtasr.start_server(**server_options) as server:
+                port = server.sockets[0].getsockname()[1]
+                monkeypatch.setattr(settings, "xunfei_rtasr_url", f"ws://127.0.0.1:{port}/v1/ws")
+                return await VoiceService().transcribe_audio_file(str(path))
+
+        return asyncio.run(main())
+
+    return run
+
+
+def write_wav(path, seconds, rate=16000, channels=1):
+    t = np.arange(int(rate * seconds)) / rate
+    samples = (6000 * np.sin(2 * np.pi * 440 * t)).astype("<i2")
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(samples, channels).tobytes())
+    return path
+
+
+def test_transcribes_whole_file(transcribe, tmp_path):
+    # 1 秒 16kHz 单声道 = 25 帧；模拟服务每 10 帧返回一句最终结果，结束时返回剩余的 5 帧
+    text = transcribe(write_wav(tmp_path / "a.wav", 1.0), chunks_per_final=10)
+    assert text == "." * 10 + "#000010" + "." * 10 + "#000020" + "." * 5 + "#000025"
+
+
+def test_resampled_file_sends_all_audio(transcribe, tmp_path):
+    # 48kHz 双声道重采样后仍是 1 秒（最后一帧为 flush 补出的尾部）
+    text = transcribe(write_wav(tmp_path / "b.wav", 1.0, rate=48000, channels=2), chunks_per_final=100)
+    assert text.endswith("#000026")
+
+
+def test_empty_file_is_rejected_without_connecting(transcribe, tmp_path):
+    with pytest.raises(Exception, match="音频为空"):
+        transcribe(write_wav(tmp_path / "empty.wav", 0.0))
+
+
+def test_upstream_error_mid_stream_fails_instead_of_returning_partial_text(transcribe, tmp_path, fake_rtasr):
+    # 第 15 帧后上游报错：此时已有一句最终结果，但转写不完整，必须失败
+    with pytest.raises(Exception, match=fake_rtasr.ERROR_DESC):
+        transcribe(write_wav(tmp_path / "c.wav", 1.0), chunks_per_final=10, error_after=15)
@@ -0,0 +1,165 @@
+"""RealtimeASRSession 对接本地模拟的讯飞 RTASR 服务：发送节奏、积压追赶、写入背压、结束和超时"""
+import asyncio
+import json
+import re
+import time
+
+import websockets
+
+from app.services.voice_service import RealtimeASRSession
+
+FRAME_BYTES = 1280  # 40ms
+SEQ_RE = re.compile(r"#(\d{6})$")
+
+
+async def collect(session, arrivals=None):
+    """读取会话推送的消息直到结束；arrivals 记录每块音频对应识别结果的到达时间"""
+    messages = []
+    while True:
+        text = await session.results.get()
+        if text is None:
+            return messages
+        messages.append(text)
+        match = SEQ_RE.search(text)
+        if match and arrivals is not None:
+            arrivals.setdefault(int(match.group(1)), time.monotonic())
+
+
+def run_with_server(serve, drive, **session_options):
+    """启动服务 serve（返回 websockets.serve），运行会话并交给 drive(session, arrivals) 写入音频"""
+    async def main():
+        async with serve() as server:
+            port = server.sockets[0].getsockname()[1]
+            session = RealtimeASRSession(f"ws://127.0.0.1:{port}/v1/ws", verbose=False, **session_options)
+            arrivals = {}
+            run_task = asyncio.create_task(session.run())
+            collect_task = asyncio.create_task(collect(session, arrivals))
+            await drive(session, arrivals)
+            await run_task
+            return await collect_task, session, arrivals
+
+    return asyncio.run(main())
+
+
+async def wait_for_seq(arrivals, seq, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while seq not in arrivals:
+        assert time.monotonic() < deadline, f"未收到第 {seq} 块的识别结果"
+        await asyncio.sleep(0.005)
+
+
+def send_backlog(fake_rtasr, frames, **session_options):
+    """一次写入 frames 帧积压音频，全部识别后再结束，返回首帧到末帧识别结果的间隔"""
+    async def drive(session, arrivals):
+        await session.write_audio(bytes(frames * FRAME_BYTES))
+        await wait_for_seq(arrivals, frames)
+        session.finish()
+
+    _, session, arrivals = run_with_server(
+        lambda: fake_rtasr.start_server(chunks_per_final=1000), drive,
+        frame_bytes=FRAME_BYTES, **session_options
+    )
+    assert session.get_stats()["frames_sent"] == frames
+    return arrivals[frames] - arrivals[1]
+
+
+def test_paced_session_sends_in_real_time(fake_rtasr):
+    # 不追赶时 25 帧积压仍按 40ms 一帧发送
+    elapsed = send_backlog(fake_rtasr, 25, catchup_bytes=FRAME_BYTES, catchup_speed=1.0)
+    assert 0.85 <= elapsed < 1.5
+
+
+def test_backlog_catches_up_faster_than_real_time(fake_rtasr):
+    # 积压超过 catchup_bytes 时 4 倍速发送：23 帧 10ms 一帧，其余按实时速率
+    elapsed = send_backlog(fake_rtasr, 25, catchup_bytes=FRAME_BYTES, catchup_speed=4.0)
+    assert elapsed < 0.45
+
+
+def test_unpaced_session_is_not_rate_limited(fake_rtasr):
+    assert send_backlog(fake_rtasr, 25, paced=False) < 0.3
+
+
+def test_write_audio_applies_backpressure_without_dropping(fake_rtasr):
+    # 缓冲只有 2 帧：写入 10 帧时等待发送腾出空间，推送背压开始/结束状态，不丢弃音频
+    returned_at = {}
+
+    async def drive(session, arrivals):
+        await session.write_audio(bytes(10 * FRAME_BYTES))
+        returned_at["write"] = time.monotonic()
+        session.finish()
+
+    messages, session, arrivals = run_with_server(
+        lambda: fake_rtasr.start_server(chunks_per_final=1000), drive,
+        frame_bytes=FRAME_BYTES, buffer_bytes=2 * FRAME_BYTES, catchup_bytes=FRAME_BYTES, catchup_speed=1.0
+    )
+    status = [text for text in messages if text.startswith("[STATUS] backpressure")]
+    assert status[0].startswith("[STATUS] backpressure=on")
+    assert status[-1].startswith("[STATUS] backpressure=off")
+    stats = session.get_stats()
+    assert stats["backpressure_events"] == 1
+    assert stats["backpressure_seconds"] >= 0.2
+    assert stats["bytes_sent"] == 10 * FRAME_BYTES and stats["bytes_dropped"] == 0
+    # 写入返回时大部分音频已经发出
+    assert sum(1 for seq, at in arrivals.items() if at <= returned_at["write"]) >= 5
+    assert max(arrivals) == 10
+
+
+def test_finish_sends_tail_and_end_flag_then_collects_final_result(fake_rtasr):
+    async def drive(session, arrivals):
+        # 2.5 帧：最后半帧作为尾部发送
+        await session.write_audio(bytes(FRAME_BYTES * 5 // 2))
+        session.finish()
+        await session.write_audio(bytes(FRAME_BYTES))
+
+    messages, session, _ = run_with_server(lambda: fake_rtasr.start_server(chunks_per_final=1000), drive,
+                                           frame_bytes=FRAME_BYTES)
+    assert messages[:2] == ["[WS_OPEN]", "[WS_READY]"]
+    assert messages[-1] == "[WS_CLOSED]"
+    # 结束标识后模拟服务返回剩余的最终结果
+    assert messages[-2] == "..." + "#000003"
+    stats = session.get_stats()
+    assert stats["frames_sent"] == 3 and stats["bytes_sent"] == FRAME_BYTES * 5 // 2
+    # finish 之后写入的音频被丢弃并计数
+    assert stats["bytes_dropped"] == FRAME_BYTES
+    assert session.closed
+
+
+def test_handshake_timeout():
+    async def never_started(ws, *args):
+        await ws.wait_closed()
+
+    async def drive(session, arrivals):
+        await session.write_audio(bytes(FRAME_BYTES))
+
+    started = time.monotonic()
+    messages, session, _ = run_with_server(lambda: websockets.serve(never_started, "127.0.0.1", 0), drive,
+                                           handshake_timeout=0.3)
+    assert time.monotonic() - started < 2.0
+    assert messages == ["[WS_OPEN]", "[ERROR] WebSocket握手超时", "[WS_CLOSED]"]
+    assert session.closed
+    assert session.get_stats()["bytes_dropped"] == FRAME_BYTES
+
+
+def test_final_timeout_closes_when_server_never_finishes():
+    ended = []
+
+    async def never_closes(ws, *args):
+        await ws.send(json.dumps({"action": "started", "code": "0"}))
+        async for message in ws:
+            if isinstance(message, str) and json.loads(message).get("end"):
+                ended.append(time.monotonic())
+
+    finished_at = {}
+
+    async def drive(session, arrivals):
+        await session.write_audio(bytes(FRAME_BYTES))
+        session.finish()
+        finished_at["finish"] = time.monotonic()
+
+    messages, session, _ = run_with_server(lambda: websockets.serve(never_closes, "127.0.0.1", 0), drive,
+                                           final_timeout=0.3)
+    waited = time.monotonic() - finished_at["finish"]
+    assert ended, "结束标识应已发送"
+    assert 0.25 <= waited < 1.5
+    assert messages[-1] == "[WS_CLOSED]"
+    assert session.get_stats()["bytes_sent"] == FRAME_BYTES
@@ -0,0 +1,90 @@
+"""实时转写推送协议：delta 增量在前端重建的文本与服务端一致，text 协议保持兼容"""
+import json
+
+import pytest
+
+from app.services.voice_service import RTASRTranscript
+
+
+def rtasr_result(text, final):
+    """构造讯飞 RTASR 的识别结果消息"""
+    inner = {"cn": {"st": {"type": "0" if final else "1", "rt": [{"ws": [{"cw": [{"w": w}]} for w in text]}]}}}
+    return json.dumps({"action": "result", "code": "0", "data": json.dumps(inner, ensure_ascii=False)},
+                      ensure_ascii=False)
+
+
+# 两句话：中间结果逐步变长、中途修正候选，最后确定
+RESULTS = [
+    ("我想", False), ("我想去", False), ("我想去成都", False), ("我想去成都玩", True),
+    ("三天", False), ("三天两", False), ("山田", False), ("三天两夜", False), ("三天两夜吧", True),
+]
+
+
+class DeltaClient:
+    """按 RTASRTranscript 文档实现的前端状态"""
+
+    def __init__(self):
+        self.final = ""
+        self.tail = ""
+        self.seq = 0
+
+    def apply(self, raw):
+        message = json.loads(raw)
+        assert message["seq"] == self.seq + 1
+        self.seq = message["seq"]
+        kind = message["type"]
+        if kind == "append":
+            self.tail += message["text"]
+        elif kind in ("replace_tail", "finalize"):
+            self.tail = self.tail[:message["keep"]] + message["text"]
+            if kind == "finalize":
+                self.final += self.tail
+                self.tail = ""
+        elif kind == "snapshot":
+            self.final, self.tail = message["final"], message["tail"]
+
+
+@pytest.mark.parametrize("snapshot_interval", [0, 3, 50])
+def test_delta_client_tracks_server_state(snapshot_interval):
+    transcript = RTASRTranscript("delta", snapshot_interval, verbose=False)
+    client = DeltaClient()
+    event, ready = transcript.handle(json.dumps({"action": "started", "code": "0"}))
+    assert event == "started"
+    client.apply(ready)
+    for text, final in RESULTS:
+        _, message = transcript.handle(rtasr_result(text, final))
+        if message is not None:
+            client.apply(message)
+        assert (client.final, client.tail) == (transcript.acc_text, transcript.tail)
+    assert client.final == "我想去成都玩三天两夜吧"
+
+
+def test_delta_messages_are_small():
+    transcript = RTASRTranscript("delta", 0, verbose=False)
+    transcript.handle(rtasr_result("我想去成都", False))
+    _, message = transcript.handle(rtasr_result("我想去成都玩", False))
+    assert json.loads(message) == {"seq": 2, "type": "append", "text": "玩"}
+    _, message = transcript.handle(rtasr_result("我想去重庆", False))
+    assert json.loads(message) == {"seq": 3, "type": "replace_tail", "keep": 3, "text": "重庆"}
+    # 候选没有变化时不推送
+    assert transcript.handle(rtasr_result("我想去重庆", False)) == (None, None)
+
+
+def test_text_protocol_pushes_growing_full_text():
+    transcript = RTASRTranscript("text", verbose=False)
+    pushed = [transcript.handle(rtasr_result(text, final))[1] for text, final in RESULTS]
+    assert pushed[3] == "我想去成都玩"
+    # 修正后的候选变短时不推送，前端不会回退
+    assert pushed[6] is None
+    assert pushed[-1] == "我想去成都玩三天两夜吧"
+    assert transcript.handle(json.dumps({"action": "error", "code": "10110", "desc": "超时"})) \
+        == ("error", "[ERROR] 超时")
+
+
+def test_delta_error_and_unknown_protocol():
+    transcript = RTASRTranscript("delta", verbose=False)
+    event, message = transcript.handle(json.dumps({"action": "error", "code": "10110", "desc": "超时"}))
+    assert event == "error"
+    assert json.loads(message) == {"seq": 1, "type": "error", "code": "ERROR", "message": "超时"}
+    with pytest.raises(ValueError):
+        RTASRTranscript("binary")